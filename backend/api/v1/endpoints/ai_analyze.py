@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Any, Optional, List, Dict
 from core.ai_client import ask_ai
+from core.cpu_executor import run_cpu
 
 router = APIRouter()
 
@@ -13,8 +14,7 @@ class AIAnalyzeRequest(BaseModel):
     history: Optional[List[Dict[str, str]]] = None  # List of {question, answer}
 
 
-@router.post("/ai_analyze")
-def ai_analyze(req: AIAnalyzeRequest):
+def _build_prompt(req: AIAnalyzeRequest) -> str:
     # Build chat history string
     history_str = ""
     if req.history:
@@ -42,6 +42,13 @@ def ai_analyze(req: AIAnalyzeRequest):
         prompt = f"{history_str}The user asked: '{req.question}'\n\nHere is the relevant article:\n\n{content[:2000]}\n\n{action_instruction}\nPlease answer using only this content."
     else:
         prompt = f"{history_str}The user asked: '{req.question}'\n\nHere is the relevant data:\n\n{str(req.block_data)[:2000]}\n\n{action_instruction}\nPlease answer using only this data."
+    return prompt
+
+
+@router.post("/ai_analyze")
+async def ai_analyze(req: AIAnalyzeRequest):
+    # Tables are turned into markdown with pandas; keep that off the event loop
+    prompt = await run_cpu(_build_prompt, req)
     # Call Groq LLM
-    answer = ask_ai(prompt)
+    answer = await ask_ai(prompt)
     return {"answer": answer}
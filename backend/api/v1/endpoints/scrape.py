@@ -1,24 +1,146 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from models.scrape import ScrapeRequest
-from services.universal_extractor import fetch_page_content
+from services.playwright_scraper import render_page_async
+from services.universal_extractor import (
+    fetch_page_auto_async,
+    fetch_page_content_async,
+    fetch_page_stream_async,
+)
+from core.cpu_executor import run_cpu
 from core.extractor_router import extract_structured_content
-import json
+from core.sections import resolve_sections
+from core.serialization import dumps_json
+from core.table_formats import JSON_MEDIA_TYPES, accepts, negotiate_table_format
+from typing import AsyncIterator, Optional
+import asyncio
 
 router = APIRouter()
 
+# Media types /scrape/stream answers with, besides plain JSON
+NDJSON_MEDIA_TYPES = JSON_MEDIA_TYPES | {"application/x-ndjson"}
+
+
+def _check_accept(accept: Optional[str], media_types) -> None:
+    # The response is JSON whatever the table format: Arrow tables are
+    # base64 strings in it, never a bare Arrow stream
+    if not accepts(accept, media_types):
+        raise HTTPException(
+            status_code=406,
+            detail="Responses are JSON; for Arrow tables send table_format "
+            "'arrow' or Accept: application/vnd.sift.arrow+json",
+        )
+
+
+async def _fetch(data: ScrapeRequest):
+    """The fetched page, and the RenderedPage when a browser rendered it."""
+    if data.method == "stream":
+        # Parse while downloading; the tree is ready when the body ends
+        return await fetch_page_stream_async(data.url), None
+    if data.method == "playwright":
+        rendered = await render_page_async(data.url)
+        return rendered.html, rendered
+    if data.method == "auto":
+        # Escalates to the browser only for client-rendered shells
+        return await fetch_page_auto_async(data.url)
+    page = await fetch_page_content_async(data.url, method=data.method or "httpx")
+    return page, None
+
 
 @router.post("/scrape")
-def scrape_and_extract(data: ScrapeRequest):
-    html = fetch_page_content(data.url, method=data.method or "httpx")
-    extracted = extract_structured_content(html, url=data.url)
-    # Debug: check which field is not JSON serializable
+async def scrape_and_extract(
+    data: ScrapeRequest, accept: Optional[str] = Header(None)
+):
+    _check_accept(accept, JSON_MEDIA_TYPES)
+    # Only compute (and serialize) what the client asked for
+    sections = resolve_sections(data.include, data.exclude)
+    table_format = data.table_format or negotiate_table_format(accept)
+    page, rendered = await _fetch(data)
+    # Extraction and encoding are CPU-bound: run them in the CPU executor
+    # so the event loop keeps serving other requests' fetches
+    extracted = await run_cpu(
+        extract_structured_content,
+        page,
+        url=data.url,
+        sections=sections,
+        table_format=table_format,
+    )
+    # Encode (and null out NaN/inf) in one pass; returning a Response skips
+    # FastAPI's jsonable_encoder. The table format may come from the Accept
+    # header, so caches must key on it.
+    headers = {"Vary": "Accept"}
+    if rendered is not None:
+        headers["Server-Timing"] = rendered.server_timing()
+    return Response(
+        content=await run_cpu(dumps_json, extracted),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def _ndjson_events(
+    data: ScrapeRequest, sections: frozenset, table_format: str
+) -> AsyncIterator[bytes]:
+    # Extraction reports progress through a callback from an executor
+    # thread; hand each event over to the event loop as one JSON line
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(kind: str, payload: dict) -> None:
+        line = dumps_json({"event": kind, **payload}) + b"\n"
+        loop.call_soon_threadsafe(events.put_nowait, line)
+
+    async def run() -> None:
+        try:
+            page, rendered = await _fetch(data)
+            html = page if isinstance(page, str) else page.html
+            fetched = {"event": "fetched", "url": data.url, "length": len(html)}
+            if rendered is not None:
+                fetched["render"] = rendered.timing
+            events.put_nowait(dumps_json(fetched) + b"\n")
+            await run_cpu(
+                extract_structured_content,
+                page,
+                url=data.url,
+                sections=sections,
+                table_format=table_format,
+                on_event=emit,
+            )
+        except Exception as e:
+            events.put_nowait(dumps_json({"event": "error", "detail": str(e)}) + b"\n")
+        finally:
+            # Queued after every event the executor thread scheduled
+            loop.call_soon(events.put_nowait, None)
+
+    task = asyncio.create_task(run())
     try:
-        json.dumps(extracted, allow_nan=False)
-    except Exception as e:
-        print("JSON serialization error:", e)
-        for k, v in extracted.items():
-            try:
-                json.dumps(v, allow_nan=False)
-            except Exception as e2:
-                print(f"Field {k} is not JSON serializable:", e2)
-    return extracted
+        while True:
+            line = await events.get()
+            if line is None:
+                return
+            yield line
+    finally:
+        # The client went away: stop fetching (extraction already handed to
+        # the executor finishes on its own)
+        task.cancel()
+
+
+@router.post("/scrape/stream")
+async def scrape_and_extract_stream(
+    data: ScrapeRequest, accept: Optional[str] = Header(None)
+):
+    """
+    Like /scrape, but sends newline-delimited JSON events as soon as each
+    part is ready: "fetched" (with the "render" timing of browser fetches),
+    "content_types", one "table" per table, "json_ld", "state_tables",
+    "article", one "grid_strategy" per grid strategy, and a final "done"
+    (or "error") event. Every line has an "event" field.
+    """
+    _check_accept(accept, NDJSON_MEDIA_TYPES)
+    sections = resolve_sections(data.include, data.exclude)
+    table_format = data.table_format or negotiate_table_format(accept)
+    return StreamingResponse(
+        _ndjson_events(data, sections, table_format),
+        media_type="application/x-ndjson",
+        headers={"Vary": "Accept"},
+    )
@@ -1,8 +1,9 @@
 import os
-import httpx
 
+from core.http_client import get_async_http_client
 
-def ask_ai(prompt: str):
+
+async def ask_ai(prompt: str):
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     if not GROQ_API_KEY:
         return "GROQ_API_KEY not set."
@@ -15,7 +16,8 @@ def ask_ai(prompt: str):
         "model": "llama3-70b-8192",
         "messages": [{"role": "user", "content": prompt}],
     }
-    response = httpx.post(
+    # Waiting for the model holds no thread
+    response = await get_async_http_client().post(
         "https://api.groq.com/openai/v1/chat/completions", json=payload, headers=headers
     )
     response.raise_for_status()
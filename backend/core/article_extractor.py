@@ -1,12 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 import trafilatura
 
+from core.document import ParsedDocument, parse_lxml
+
+# Article fields returned, as named by trafilatura
+ARTICLE_FIELDS = ("title", "author", "date", "description", "sitename", "url", "text")
+
+# Articles kept by page content hash; the same page is often scraped again
+ARTICLE_CACHE_SIZE = int(os.getenv("ARTICLE_CACHE_SIZE", "256"))
+
+_cache: "OrderedDict[Tuple[str, Optional[str], bool], dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(
+    html: str, url: Optional[str], from_tree: bool
+) -> Tuple[str, Optional[str], bool]:
+    digest = hashlib.blake2b(html.encode("utf-8", "replace"), digest_size=16)
+    # The parsed tree has unwanted blocks pruned, so it may read differently
+    return digest.hexdigest(), url, from_tree
+
 
-def extract_article(html: str, url: str = None) -> dict:
-    raw = trafilatura.extract(
-        html, include_comments=False, url=url, output_format="json"
+def clear_article_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def extract_article(source, url: str = None) -> dict:
+    """
+    Main text and metadata of an article page.
+
+    `source` is raw HTML or a ParsedDocument. trafilatura runs once, on the
+    document's tree as the router pruned it (it works on a copy, so
+    the shared tree is left alone), and on the raw HTML otherwise. A bs4
+    document's tree is handed over as lxml, so both backends give the same
+    article. Results are cached by page content and URL.
+
+    Returns:
+        A dict of ARTICLE_FIELDS; only "text" (None when nothing was found)
+        is set when the page has no recognizable article
+    """
+    if isinstance(source, ParsedDocument):
+        html, url = source.html, url or source.url
+    else:
+        html = source
+    from_tree = isinstance(source, ParsedDocument)
+    key = _cache_key(html, url, from_tree) if html is not None else None
+    if key is not None:
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return dict(_cache[key])
+
+    if not from_tree:
+        tree = None
+    elif source.is_lxml:
+        tree = source.tree
+    else:
+        # trafilatura reads lxml trees only; the pruned soup converts to the
+        # tree the lxml backend holds
+        tree = parse_lxml(str(source.soup))
+
+    extracted = trafilatura.bare_extraction(
+        tree if tree is not None else html,
+        url=url,
+        include_comments=False,
+        with_metadata=True,
     )
-    if raw:
-        return trafilatura.extract(
-            html, include_comments=False, url=url, output_format="json"
-        )
-    return {"text": trafilatura.extract(html)}
+    if extracted is None:
+        article = {"text": None}
+    else:
+        # trafilatura 2 returns a Document, older versions a dict
+        if not isinstance(extracted, dict):
+            extracted = extracted.as_dict()
+        article = {field: extracted.get(field) for field in ARTICLE_FIELDS}
+
+    if key is not None and ARTICLE_CACHE_SIZE > 0:
+        with _cache_lock:
+            _cache[key] = article
+            while len(_cache) > ARTICLE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return dict(article)
@@ -1,37 +1,51 @@
-from bs4 import BeautifulSoup
 from core.content_types import ContentType
-
-
-def classify_content_type(soup: BeautifulSoup) -> list[ContentType]:
+from core.document import ParsedDocument
+from core.dom_index import DomIndex
+from core.grid_extractor import GRID_SELECTORS
+from core.hydration import has_state_blob
+
+# (content type, `div[class*=...]` fragment, `.class` tokens, extra tags)
+LISTING_PATTERNS = [
+    (ContentType.PRODUCT_LISTING, "product", {"product-card", "product-item"}, []),
+    (ContentType.JOB_LISTING, "job", {"job-card", "job-listing"}, []),
+    (ContentType.REVIEW, "review", {"review-card"}, ["blockquote"]),
+    (ContentType.REAL_ESTATE, "property", {"real-estate", "listing"}, []),
+]
+
+
+def classify_content_type(source) -> list[ContentType]:
+    doc = ParsedDocument.coerce(source)
+    index = doc.index
     types = []
 
-    if soup.find("table"):
+    if index.by_tag.get("table"):
         types.append(ContentType.TABLE)
 
     # Enhanced grid detection
-    if _detect_grid_content(soup):
+    if _detect_grid_content(index):
         types.append(ContentType.DIV_GRID)
         types.append(ContentType.UNIVERSAL_GRID)
 
-    if soup.find("article") or soup.find("meta", property="og:article"):
+    if index.by_tag.get("article") or _any_attr(index, "meta", "property", "og:article"):
         types.append(ContentType.ARTICLE)
 
-    if soup.find("script", type="application/ld+json"):
+    if _any_attr(index, "script", "type", "application/ld+json"):
         types.append(ContentType.JSON_LD)
 
-    if soup.select("div[class*=product], .product-card, .product-item"):
-        types.append(ContentType.PRODUCT_LISTING)
-
-    if soup.select("div[class*=job], .job-card, .job-listing"):
-        types.append(ContentType.JOB_LISTING)
-
-    if soup.select("div[class*=review], .review-card, blockquote"):
-        types.append(ContentType.REVIEW)
+    if index.by_tag.get("script") and has_state_blob(doc):
+        types.append(ContentType.HYDRATION_STATE)
 
-    if soup.select("div[class*=property], .real-estate, .listing"):
-        types.append(ContentType.REAL_ESTATE)
+    for content_type, fragment, tokens, tags in LISTING_PATTERNS:
+        if (
+            index.class_contains("div", fragment)
+            or index.has_class_token(tokens)
+            or any(index.by_tag.get(tag) for tag in tags)
+        ):
+            types.append(content_type)
 
-    if soup.find("form") and soup.select("input, textarea, select"):
+    if index.by_tag.get("form") and any(
+        index.by_tag.get(tag) for tag in ("input", "textarea", "select")
+    ):
         types.append(ContentType.PROFILE)
 
     if not types:
@@ -40,56 +54,35 @@ def classify_content_type(soup: BeautifulSoup) -> list[ContentType]:
     return list(set(types))  # Ensure unique values
 
 
-def _detect_grid_content(soup: BeautifulSoup) -> bool:
+def _any_attr(index: DomIndex, tag: str, attr: str, value: str) -> bool:
+    return any(node.get(attr) == value for node in index.elements(index.by_tag.get(tag, [])))
+
+
+def _detect_grid_content(index: DomIndex) -> bool:
     """
     Enhanced grid detection that looks for repeated div structures.
     """
     # Look for divs with classes
-    divs_with_classes = soup.select("div[class]")
-    if len(divs_with_classes) < 3:
+    if len(index.with_class("div")) < 3:
         return False
 
-    # Group divs by their class patterns
-    class_groups = {}
-    for div in divs_with_classes:
-        class_name = " ".join(sorted(div.get("class", [])))
-        if class_name:
-            class_groups[class_name] = class_groups.get(class_name, 0) + 1
-
     # Check if we have repeated class patterns (indicating a grid)
+    class_groups = index.class_groups("div")
     if class_groups:
-        max_repetition = max(class_groups.values())
+        max_repetition = max(len(group) for group in class_groups.values())
         if max_repetition >= 3:
             return True
 
     # Look for common grid patterns
-    grid_patterns = [
-        "div[class*='row']",
-        "div[class*='item']",
-        "div[class*='card']",
-        "div[class*='listing']",
-        "div[class*='product']",
-        "div[class*='result']",
-        "li[class*='item']",
-        "div[class*='entry']",
-        "div[class*='post']",
-        "div[class*='article']",
-    ]
-
-    for pattern in grid_patterns:
-        elements = soup.select(pattern)
-        if len(elements) >= 3:
+    for tag, fragment in GRID_SELECTORS:
+        if fragment is not None and len(index.class_contains(tag, fragment)) >= 3:
             return True
 
     # Look for repeated structural patterns
-    all_elements = soup.find_all()
-    if len(all_elements) > 10:
-        # Check for repeated tag structures
+    if len(index) > 10:
         tag_counts = {}
-        for elem in all_elements:
-            tag_name = elem.name
-            classes = " ".join(sorted(elem.get("class", [])))
-            signature = f"{tag_name}.{classes}"
+        for i in range(len(index)):
+            signature = index.signature(i)
             tag_counts[signature] = tag_counts.get(signature, 0) + 1
 
         if tag_counts:
@@ -14,5 +14,6 @@ class ContentType(str, Enum):
     BLOG = "blog"
     FORUM = "forum"
     JSON_LD = "json_ld"
+    HYDRATION_STATE = "hydration_state"
     PROFILE = "profile"
     UNKNOWN = "unknown"
@@ -0,0 +1,56 @@
+import asyncio
+import atexit
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Threads for parsing, extraction and serialization called from async
+# endpoints. Kept apart from the threads that wait on I/O, so many slow
+# fetches cannot starve the CPU-bound work (and the other way round).
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0")) or os.cpu_count() or 1
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """
+    The executor shared by all requests, started on first use with
+    CPU_WORKERS threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=CPU_WORKERS, thread_name_prefix="cpu"
+            )
+        return _executor
+
+
+def shutdown_cpu_executor() -> None:
+    """
+    Stop the executor threads; the next `get_cpu_executor` starts afresh.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def run_cpu(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run `func(*args, **kwargs)` in the CPU executor and wait for it
+    without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_cpu_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+atexit.register(shutdown_cpu_executor)
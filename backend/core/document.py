@@ -0,0 +1,138 @@
+import os
+from bs4 import BeautifulSoup, Tag
+import lxml.html
+from lxml import etree
+from typing import Any, Callable, Optional, Union
+from core.dom_index import DomIndex
+from core.pruning import PruneRules, PruningTreeBuilder
+
+# Extraction backend used when a caller does not pick one: "bs4" walks
+# BeautifulSoup tags, "lxml" runs the same strategies on lxml elements.
+BACKENDS = ("bs4", "lxml")
+DEFAULT_BACKEND = os.getenv("EXTRACTION_BACKEND", "bs4")
+
+
+def parse_lxml(html: str, prune: Optional[PruneRules] = None) -> etree._Element:
+    """
+    Parse HTML into an lxml element tree rooted at <html>, dropping the
+    blocks matched by `prune` before any caller sees the tree.
+    """
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode input carrying an XML encoding declaration
+        root = lxml.html.document_fromstring(html.encode("utf-8"))
+    except etree.ParserError:
+        # Empty document
+        root = lxml.html.Element("html")
+    if prune:
+        prune.prune_lxml(root)
+    return root
+
+
+def parse_soup(html: str, prune: Optional[PruneRules] = None) -> BeautifulSoup:
+    """
+    Parse HTML with BeautifulSoup's lxml builder, skipping the blocks
+    matched by `prune` while the tree is built.
+    """
+    if prune:
+        return BeautifulSoup(html, builder=PruningTreeBuilder(prune))
+    return BeautifulSoup(html, "lxml")
+
+
+class ParsedDocument:
+    """
+    A page parsed once per request and shared by every extraction stage.
+
+    Extraction functions accept either raw HTML, an existing parsed tree or a
+    ParsedDocument and resolve it with `ParsedDocument.coerce`, so callers
+    that already hold a tree never pay for a second parse. Depending on
+    `backend` the tree lives in `soup` (BeautifulSoup) or `tree` (lxml).
+
+    With `prune`, unwanted blocks are dropped as the page is parsed (or
+    straight away from a tree handed in) and `pruned` records the rules, so
+    `remove_unwanted_blocks` has nothing left to do.
+    """
+
+    def __init__(
+        self,
+        html: str,
+        url: Optional[str] = None,
+        soup: Optional[BeautifulSoup] = None,
+        backend: Optional[str] = None,
+        tree: Optional[etree._Element] = None,
+        prune: Optional[PruneRules] = None,
+    ):
+        if backend is None:
+            backend = "lxml" if tree is not None else DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown extraction backend: {backend!r}")
+        self.html = html
+        self.url = url
+        self.backend = backend
+        self.soup = None
+        self.tree = None
+        self._index = None
+        self._cache = {}
+        self.pruned = prune or None
+        if backend == "lxml":
+            if tree is None:
+                self.tree = parse_lxml(html, prune)
+            else:
+                self.tree = prune.prune_lxml(tree) if prune else tree
+        else:
+            if soup is None:
+                self.soup = parse_soup(html, prune)
+            else:
+                self.soup = prune.prune_soup(soup) if prune else soup
+
+    @property
+    def is_lxml(self) -> bool:
+        return self.backend == "lxml"
+
+    @property
+    def root(self):
+        return self.tree if self.is_lxml else self.soup
+
+    @property
+    def index(self) -> DomIndex:
+        """
+        DOM feature index of the current tree, built on first use.
+        """
+        if self._index is None:
+            self._index = DomIndex.build(self.root)
+        return self._index
+
+    def cached(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Result of `compute()` for this tree, computed once per `key` so that
+        stages sharing an intermediate result (such as the grid rows) do not
+        each rebuild it. Callers must not modify the returned value.
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def invalidate(self) -> None:
+        """
+        Drop cached tree features after the tree has been modified.
+        """
+        self._index = None
+        self._cache.clear()
+
+    @classmethod
+    def coerce(
+        cls,
+        source: Union[str, "ParsedDocument", Tag, etree._Element],
+        url: Optional[str] = None,
+    ) -> "ParsedDocument":
+        """
+        Return `source` as a ParsedDocument, parsing only if it is raw HTML.
+        """
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, Tag):
+            return cls(html=None, url=url, soup=source, backend="bs4")
+        if isinstance(source, etree._Element):
+            return cls(html=None, url=url, tree=source, backend="lxml")
+        return cls(source, url=url)
@@ -0,0 +1,329 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from bs4 import CData, NavigableString, Tag
+from lxml import etree
+
+from core.lxml_engine import attribute_items
+
+# Tags whose strings are kept out of an ancestor's text (see lxml_engine.get_text)
+_STRING_CONTAINERS = {"script", "style", "template"}
+
+# String kinds that make up ordinary element text: bs4 string classes, or
+# None for lxml strings outside any script/style/template
+_PLAIN_KINDS = {NavigableString, CData, None}
+
+
+class DomIndex:
+    """
+    Per-element features collected in a single walk over a parsed page.
+
+    Elements are numbered in document order and every feature is a list
+    indexed by that number, so the classifier and the grid strategies can
+    group and filter elements without sweeping the tree again:
+
+      - `tags`, `class_keys` (sorted classes joined by spaces) and
+        `has_class` (class attribute present, even if empty)
+      - `depths` and `parents` (-1 for the top-level element)
+      - `children`: direct child element numbers
+      - `subtree_ends`: one past the last descendant, so the subtree of `i`
+        is the range `i..subtree_ends[i]`
+      - `text_lengths`: len(get_text(strip=True)) of each element
+      - `child_hashes`: hash of the sorted child "tag.class" signatures used
+        by the repeated-structure strategies
+
+    Texts are not stored per element. The walk records every stripped
+    string once, in document order, along with the span each element
+    covers; `text(i)` joins that span on first use and caches it. Building
+    the index and every query on it are therefore linear in the page size,
+    however deeply it is nested.
+    """
+
+    def __init__(self):
+        self.nodes: List = []
+        self.tags: List[str] = []
+        self.class_keys: List[str] = []
+        self.has_class: List[bool] = []
+        self.depths: List[int] = []
+        self.parents: List[int] = []
+        self.children: List[List[int]] = []
+        self.subtree_ends: List[int] = []
+        self.text_lengths: List[int] = []
+        self.child_hashes: List[int] = []
+        self.by_tag: Dict[str, List[int]] = defaultdict(list)
+        self._positions: Dict[int, int] = {}
+        # Stripped strings in document order: ordinary text and, separately,
+        # script/style/template text with its kind
+        self._plain: List[str] = []
+        self._other: List[str] = []
+        self._other_kinds: List = []
+        self._plain_spans: List[List[int]] = []
+        self._other_spans: List[List[int]] = []
+        self._wanted: List[Optional[tuple]] = []
+        self._plain_wanted: Dict[tuple, bool] = {}
+        self._texts: Dict[int, str] = {}
+        self._patterns: Dict[int, str] = {}
+
+    @classmethod
+    def build(cls, root) -> "DomIndex":
+        """
+        Index a BeautifulSoup tree or an lxml element tree.
+        """
+        index = cls()
+        if isinstance(root, Tag):
+            index._walk_soup(root)
+        else:
+            index._walk_lxml(root)
+        index._finish()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _add(self, node, tag: str, class_value, parent: int, wanted: tuple) -> int:
+        i = len(self.nodes)
+        self.nodes.append(node)
+        self._positions[id(node)] = i
+        self.tags.append(tag)
+        self.has_class.append(class_value is not None)
+        if isinstance(class_value, str):
+            class_value = class_value.split()
+        self.class_keys.append(" ".join(sorted(class_value or [])))
+        self.parents.append(parent)
+        self.depths.append(self.depths[parent] + 1 if parent >= 0 else 0)
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(i)
+        self.by_tag[tag].append(i)
+        # None marks the common case of an element made of ordinary text
+        plain = self._plain_wanted.get(wanted)
+        if plain is None:
+            plain = self._plain_wanted[wanted] = set(wanted) <= _PLAIN_KINDS
+        self._wanted.append(None if plain else wanted)
+        self._plain_spans.append([len(self._plain), len(self._plain)])
+        self._other_spans.append([len(self._other), len(self._other)])
+        return i
+
+    def _add_string(self, text: str, kind, parent: int) -> None:
+        text = text.strip()
+        if not text or parent < 0:
+            return
+        if kind in _PLAIN_KINDS:
+            self._plain.append(text)
+            self._plain_spans[parent][1] = len(self._plain)
+        else:
+            self._other.append(text)
+            self._other_kinds.append(kind)
+            self._other_spans[parent][1] = len(self._other)
+
+    def _walk_soup(self, soup: Tag) -> None:
+        # String kinds are bs4's string classes; an element's text is made of
+        # the kinds listed in its `interesting_string_types`
+        for node in soup.descendants:
+            parent = self._positions.get(id(node.parent), -1)
+            if isinstance(node, Tag):
+                wanted = node.interesting_string_types
+                if not isinstance(wanted, tuple):
+                    wanted = (wanted,)
+                self._add(node, node.name, node.get("class"), parent, wanted)
+            elif isinstance(node, NavigableString):
+                self._add_string(node, type(node), parent)
+
+    def _walk_lxml(self, root: etree._Element) -> None:
+        # String kinds are the innermost script/style/template around the
+        # string (None outside them), mirroring bs4's string classes
+        stack = []
+        contexts = []
+        for event, node in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+            parent = stack[-1] if stack else -1
+            if event == "start":
+                container = node.tag in _STRING_CONTAINERS
+                i = self._add(
+                    node,
+                    node.tag,
+                    node.get("class"),
+                    parent,
+                    (node.tag if container else None,),
+                )
+                contexts.append(node.tag if container else (contexts[parent] if parent >= 0 else None))
+                stack.append(i)
+                if node.text:
+                    self._add_string(node.text, contexts[i], i)
+            else:
+                if event == "end":
+                    stack.pop()
+                    parent = stack[-1] if stack else -1
+                if node.tail and parent >= 0:
+                    self._add_string(node.tail, contexts[parent], parent)
+
+    def _finish(self) -> None:
+        count = len(self.nodes)
+        self.subtree_ends = list(range(1, count + 1))
+        for i in range(count - 1, -1, -1):
+            parent = self.parents[i]
+            if parent >= 0:
+                if self.subtree_ends[i] > self.subtree_ends[parent]:
+                    self.subtree_ends[parent] = self.subtree_ends[i]
+                for spans in (self._plain_spans, self._other_spans):
+                    if spans[i][1] > spans[parent][1]:
+                        spans[parent][1] = spans[i][1]
+
+        # Cumulative string lengths give every element's text length in O(1)
+        offsets = [0]
+        for text in self._plain:
+            offsets.append(offsets[-1] + len(text))
+        self.text_lengths = [
+            offsets[end] - offsets[start]
+            if wanted is None
+            else len(self.text(i))
+            for i, ((start, end), wanted) in enumerate(
+                zip(self._plain_spans, self._wanted)
+            )
+        ]
+
+        dotted = [
+            f"{tag}.{key.replace(' ', '.')}"
+            for tag, key in zip(self.tags, self.class_keys)
+        ]
+        self.child_hashes = [
+            hash("|".join(sorted(dotted[c] for c in kids)) if kids else "no_children")
+            for kids in self.children
+        ]
+
+    # --- Queries ---
+
+    def position(self, node) -> Optional[int]:
+        """
+        Document-order number of an indexed element.
+        """
+        return self._positions.get(id(node))
+
+    def text(self, i: int) -> str:
+        """
+        Equivalent of get_text(strip=True) for element `i`, cached.
+        """
+        cached = self._texts.get(i)
+        if cached is None:
+            wanted = self._wanted[i]
+            if wanted is None:
+                start, end = self._plain_spans[i]
+                cached = "".join(self._plain[start:end])
+            else:
+                start, end = self._other_spans[i]
+                cached = "".join(
+                    s
+                    for s, kind in zip(self._other[start:end], self._other_kinds[start:end])
+                    if kind in wanted
+                )
+            self._texts[i] = cached
+        return cached
+
+    def text_of(self, node) -> str:
+        """
+        Cached text of an indexed element given the element itself.
+        """
+        return self.text(self._positions[id(node)])
+
+    def attributes(self, i: int) -> List[tuple]:
+        """
+        (name, value) attribute pairs of element `i`, with multi-valued
+        attributes such as class joined by single spaces on both backends.
+        """
+        node = self.nodes[i]
+        if isinstance(node, Tag):
+            return [
+                (attr, " ".join(value) if isinstance(value, list) else value)
+                for attr, value in node.attrs.items()
+            ]
+        return list(attribute_items(node))
+
+    def get(self, i: int, attr: str, default=None):
+        """
+        Single-valued attribute lookup on element `i`.
+        """
+        return self.nodes[i].get(attr, default)
+
+    def with_attribute(self, attr: str) -> List[int]:
+        """
+        Elements carrying the attribute `attr`, in document order.
+        """
+        if not self.nodes or isinstance(self.nodes[0], Tag):
+            return [i for i, node in enumerate(self.nodes) if attr in node.attrs]
+        return [i for i, node in enumerate(self.nodes) if attr in node.attrib]
+
+    def element_pattern(self, i: int) -> str:
+        """
+        "tag.classes.child-tags" pattern used to compare sibling elements.
+        """
+        pattern = self._patterns.get(i)
+        if pattern is None:
+            kids = sorted(self.tags[c] for c in self.children[i])
+            children_str = ".".join(kids) if kids else "no_children"
+            pattern = f"{self.tags[i]}.{self.class_keys[i]}.{children_str}"
+            self._patterns[i] = pattern
+        return pattern
+
+    def signature(self, i: int) -> str:
+        """
+        "tag.classes" signature of element `i`.
+        """
+        return f"{self.tags[i]}.{self.class_keys[i]}"
+
+    def structure_key(self, i: int) -> tuple:
+        """
+        Grouping key for elements with the same tag, classes and children.
+        """
+        return (self.tags[i], self.class_keys[i], self.child_hashes[i])
+
+    def descendants(self, i: int, tag: str) -> List[int]:
+        """
+        Descendants of `i` with the given tag, in document order.
+        """
+        positions = self.by_tag.get(tag, [])
+        start = bisect_right(positions, i)
+        end = bisect_left(positions, self.subtree_ends[i], lo=start)
+        return positions[start:end]
+
+    def child_elements(self, i: int, tag: Optional[str] = None) -> List[int]:
+        """
+        Direct children of `i`, optionally limited to one tag.
+        """
+        if tag is None:
+            return self.children[i]
+        return [c for c in self.children[i] if self.tags[c] == tag]
+
+    def with_class(self, tag: Optional[str] = None) -> List[int]:
+        """
+        Elements carrying a class attribute, optionally limited to one tag.
+        """
+        candidates = self.by_tag.get(tag, []) if tag else range(len(self.nodes))
+        return [i for i in candidates if self.has_class[i]]
+
+    def class_groups(self, tag: Optional[str] = None) -> Dict[str, List[int]]:
+        """
+        Elements grouped by non-empty class key, in document order.
+        """
+        groups = defaultdict(list)
+        candidates = self.by_tag.get(tag, []) if tag else range(len(self.nodes))
+        for i in candidates:
+            if self.class_keys[i]:
+                groups[self.class_keys[i]].append(i)
+        return groups
+
+    def class_contains(self, tag: str, fragment: str) -> List[int]:
+        """
+        Equivalent of the `tag[class*='fragment']` selector.
+        """
+        return [i for i in self.by_tag.get(tag, []) if fragment in self.class_keys[i]]
+
+    def has_class_token(self, tokens: set) -> bool:
+        """
+        Whether any element matches one of the `.token` class selectors.
+        """
+        return any(
+            tokens.intersection(key.split(" ")) for key in self.class_keys if key
+        )
+
+    def elements(self, indices) -> List:
+        return [self.nodes[i] for i in indices]
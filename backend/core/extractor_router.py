@@ -1,207 +1,359 @@
-from bs4 import BeautifulSoup
 from core.content_classifier import classify_content_type
 from core.content_types import ContentType
+from core.document import ParsedDocument
 from core.table_extractor import extract_tables
-from core.grid_extractor import (
-    extract_grid_items,
-    extract_advanced_grid,
-    extract_grid_rows,
-    extract_grid_with_mapping,
-    normalize_column_names,
-)
+from core.grid_planner import plan_grid_extraction
+from core.hydration import hydration_tables
 from core.article_extractor import extract_article
-from core.field_normalizer import normalize_fields
 from core.filter_engine import remove_unwanted_blocks
-import json
+from core.jsonld import jsonld_items, normalize_jsonld_items, parse_json_ld
+from core.pruning import DEFAULT_PRUNE_RULES
+from core.row_dedupe import dedupe_rows
+from core.sections import resolve_sections
+from core.table_formats import (
+    TABLE_FORMATS,
+    format_row_sections,
+    frame_to_table,
+    records_to_table,
+)
+from core.stage_pool import EXTRACTION_WORKERS, PARALLEL_MIN_BYTES, get_pool, shutdown_pool
+from core import lxml_engine
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import numpy as np
-import math
+from typing import Callable, Iterable, Optional, Union
+
 
+# Receives (kind, payload) progress events during extraction
+EventCallback = Callable[[str, dict], None]
 
-def extract_json_ld(soup: BeautifulSoup) -> list:
+
+def extract_json_ld(source) -> list:
+    doc = ParsedDocument.coerce(source)
+    if doc.is_lxml:
+        return lxml_engine.extract_json_ld(doc.tree)
     json_ld_blocks = []
-    for script in soup.find_all("script", type="application/ld+json"):
+    for script in doc.soup.find_all("script", type="application/ld+json"):
         try:
             if script.string:
-                data = json.loads(script.string)
+                data = parse_json_ld(script.string)
                 json_ld_blocks.append(data)
         except Exception:
             continue
     return json_ld_blocks
 
 
-def flatten_dict(d, parent_key="", sep="_"):
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        elif isinstance(v, list):
-            # If list of dicts, flatten each with index
-            if all(isinstance(i, dict) for i in v):
-                for idx, subdict in enumerate(v):
-                    items.extend(
-                        flatten_dict(subdict, f"{new_key}{sep}{idx}", sep=sep).items()
-                    )
-            else:
-                # Join list of primitives
-                items.append((new_key, ", ".join(str(i) for i in v)))
-        else:
-            items.append((new_key, v))
-    return dict(items)
-
-
-def normalize_jsonld_items(items: list) -> list:
-    records = []
-    for itm in items:
-        if not isinstance(itm, dict):
-            continue
-        flat = flatten_dict(itm)
-        records.append(flat)
-
-    # Remove rows where all values are None, empty string, or '-'
-    def is_not_empty(row):
-        return any(v not in (None, "", "-") for v in row.values())
-
-    filtered = [row for row in records if is_not_empty(row)]
-    return filtered
-
-
-def clean_for_json(obj):
-    if isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(v) for v in obj]
-    elif isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj):
-            return None
-        return obj
-    else:
-        return obj
+def _table_stage(
+    doc: ParsedDocument,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    tables = []
+    for index, df in enumerate(extract_tables(doc)):
+        tables.append(frame_to_table(df, table_format))
+        if on_event is not None:
+            on_event("table", {"index": index, "table": tables[-1]})
+    return {"tables": tables}
 
 
-def flatten_jsonld_blocks(blocks):
-    for block in blocks:
-        if isinstance(block, dict):
-            yield block
-        elif isinstance(block, list):
-            for subblock in block:
-                if isinstance(subblock, dict):
-                    yield subblock
+def _json_ld_stage(
+    doc: ParsedDocument,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    json_ld_blocks = extract_json_ld(doc)
+    if "normalized_jsonld" not in sections:
+        fields = {"json_ld": json_ld_blocks}
+        if on_event is not None:
+            on_event("json_ld", fields)
+        return fields
+    normalized_jsonld = normalize_jsonld_items(jsonld_items(json_ld_blocks))
+    fields = {
+        "json_ld": json_ld_blocks,
+        "normalized_jsonld": normalized_jsonld,
+    }
+    if on_event is not None:
+        # Only send the blocks when they were asked for as well
+        sent = {k: v for k, v in fields.items() if k in sections}
+        on_event("json_ld", format_row_sections(sent, table_format))
+    return fields
 
 
-def extract_structured_content(html: str, url: str = None) -> dict:
-    soup = BeautifulSoup(html, "lxml")
-    soup = remove_unwanted_blocks(soup)
-    types = classify_content_type(soup)
-    result = {}
+def _state_stage(
+    doc: ParsedDocument,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    # Data shipped in the page for client-side rendering, readable without
+    # running the page's scripts
+    tables = [
+        dict(table, rows=records_to_table(table["rows"], table_format))
+        for table in hydration_tables(doc)
+    ]
+    fields = {"state_tables": tables}
+    if on_event is not None:
+        on_event("state_tables", fields)
+    return fields
 
-    # Extract tables if present
-    if ContentType.TABLE in types:
-        tables = extract_tables(soup)
-        result["tables"] = [
-            normalize_fields(df.to_dict(orient="records")) for df in tables
-        ]
-        # Clean tables for JSON compliance
-        result["tables"] = clean_for_json(result["tables"])
-
-    # Extract JSON-LD data
-    json_ld_blocks = extract_json_ld(soup)
-    flat_json_ld_blocks = list(flatten_jsonld_blocks(json_ld_blocks))
-    result["json_ld"] = json_ld_blocks
-    result["normalized_jsonld"] = normalize_jsonld_items(
-        [
-            item
-            for block in flat_json_ld_blocks
-            for item in (
-                block.get("itemListElement", [])
-                if block.get("@type") == "ItemList"
-                else [block]
-            )
-            if isinstance(item, dict)
-            and (
-                item.get("@type") != "ListItem"
-                or "item" not in item
-                or isinstance(item["item"], dict)
-            )
-        ]
-        + [
-            item["item"]
-            for block in flat_json_ld_blocks
-            if block.get("@type") == "ItemList"
-            for item in block.get("itemListElement", [])
-            if isinstance(item, dict)
-            and "item" in item
-            and isinstance(item["item"], dict)
-        ]
-    )
-    result["normalized_jsonld"] = clean_for_json(result["normalized_jsonld"])
 
-    # Extract article content if present
-    if ContentType.ARTICLE in types:
-        result["article"] = extract_article(html, url)
+def _article_stage(
+    doc: ParsedDocument,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    fields = {"article": extract_article(doc)}
+    if on_event is not None:
+        on_event("article", fields)
+    return fields
 
-    # Extract grid data using multiple strategies
-    grid_data = _extract_comprehensive_grid_data(soup, html, types)
-    if grid_data:
-        result.update(grid_data)
-        # Clean all grid-related fields for JSON compliance
-        for key in [
+
+def _grid_stage(
+    doc: ParsedDocument,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    if on_event is None:
+        return _extract_comprehensive_grid_data(doc, types, sections)
+
+    def on_strategy(kind: str, payload: dict) -> None:
+        # Send each strategy's grids the way they appear in the result
+        fields = {k: v for k, v in payload["fields"].items() if k in sections}
+        on_event(kind, dict(payload, fields=format_row_sections(fields, table_format)))
+
+    return _extract_comprehensive_grid_data(doc, types, sections, on_strategy)
+
+
+class ExtractionStage:
+    """
+    One independent part of the extraction result.
+
+    `run(doc, types, sections, table_format, on_event)` returns the result
+    fields of the stage and reports partial results to `on_event` as they
+    are ready; it only runs when `applies(types)` holds for the detected
+    content types and the caller asked for at least one of the stage's
+    `sections`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[..., dict],
+        sections: Iterable[str],
+        applies: Callable[[list], bool] = lambda types: True,
+    ):
+        self.name = name
+        self.run = run
+        self.sections = frozenset(sections)
+        self.applies = applies
+
+
+# In result order
+EXTRACTION_STAGES = [
+    ExtractionStage(
+        "tables",
+        _table_stage,
+        ["tables"],
+        applies=lambda types: ContentType.TABLE in types,
+    ),
+    ExtractionStage("json_ld", _json_ld_stage, ["json_ld", "normalized_jsonld"]),
+    ExtractionStage(
+        "state",
+        _state_stage,
+        ["state_tables"],
+        applies=lambda types: ContentType.HYDRATION_STATE in types,
+    ),
+    ExtractionStage(
+        "article",
+        _article_stage,
+        ["article"],
+        applies=lambda types: ContentType.ARTICLE in types,
+    ),
+    ExtractionStage(
+        "grids",
+        _grid_stage,
+        [
             "listings",
             "universal_grid",
+            "column_mappings",
+            "normalized_grid",
             "advanced_grid",
             "lenient_grid",
-            "normalized_grid",
-        ]:
-            if key in result:
-                result[key] = clean_for_json(result[key])
+            "grid_strategies",
+        ],
+    ),
+]
 
-    result["raw_html"] = html
-    return result
+_STAGES_BY_NAME = {stage.name: stage for stage in EXTRACTION_STAGES}
 
+# Sections only known once every stage has finished; the others are sent
+# by the stages as they go
+FINAL_SECTIONS = ("listings", "grid_strategies", "raw_html")
 
-def _extract_comprehensive_grid_data(
-    soup: BeautifulSoup, html: str, types: list
+
+def run_stage(
+    name: str,
+    html: str,
+    url: str,
+    backend: str,
+    types: list,
+    sections: frozenset,
+    table_format: str = "records",
 ) -> dict:
     """
-    Extract grid data using multiple strategies for maximum coverage.
+    Run one extraction stage on its own copy of the page.
+
+    Entry point of the parallel workers: trees cannot be pickled, so each
+    worker gets the raw HTML and parses (and prunes) it again. The result
+    is made of plain lists and dicts and goes back to the request process.
     """
-    grid_data = {}
-
-    # Strategy 1: Use the legacy grid extractor for backward compatibility
-    if ContentType.DIV_GRID in types or ContentType.GRID in types:
-        legacy_grids = extract_grid_items(soup)
-        if legacy_grids:
-            grid_data["listings"] = normalize_fields(legacy_grids)
-
-    # Strategy 2: Use the new universal grid extractor with mapping
-    grid_with_mapping = extract_grid_with_mapping(html)
-    if not grid_with_mapping["data"].empty and len(grid_with_mapping["data"]) >= 3:
-        grid_data["universal_grid"] = normalize_fields(
-            grid_with_mapping["data"].to_dict(orient="records")
-        )
-        grid_data["column_mappings"] = grid_with_mapping["suggestions"]
-        grid_data["normalized_grid"] = normalize_fields(
-            grid_with_mapping["normalized_data"].to_dict(orient="records")
-        )
+    doc = ParsedDocument(html, url=url, backend=backend, prune=DEFAULT_PRUNE_RULES)
+    return _STAGES_BY_NAME[name].run(doc, types, sections, table_format)
 
-    # Strategy 3: Use the advanced grid extractor with different thresholds
-    advanced_df = extract_advanced_grid(html, min_rows=2, min_columns=1)
-    if not advanced_df.empty and len(advanced_df) >= 2:
-        # Normalize column names for better UX
-        normalized_advanced_df = normalize_column_names(advanced_df)
-        grid_data["advanced_grid"] = normalize_fields(
-            normalized_advanced_df.to_dict(orient="records")
+
+def _run_stages_in_pool(
+    doc: ParsedDocument,
+    stages: list,
+    types: list,
+    sections: frozenset,
+    table_format: str,
+) -> list:
+    pool = get_pool()
+    futures = [
+        pool.submit(
+            run_stage,
+            stage.name,
+            doc.html,
+            doc.url,
+            doc.backend,
+            types,
+            sections,
+            table_format,
         )
+        for stage in stages
+    ]
+    return [future.result() for future in futures]
+
+
+def extract_structured_content(
+    html: Union[str, ParsedDocument],
+    url: str = None,
+    backend: str = None,
+    parallel: Optional[bool] = None,
+    sections: Optional[Iterable[str]] = None,
+    table_format: str = "records",
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    """
+    Extract tables, JSON-LD, article text and grids from a page.
+
+    Only the result `sections` asked for (see core.sections; all of them by
+    default) are computed and returned; stages and grid strategies whose
+    output nobody asked for are skipped.
+
+    With `parallel`, the independent stages run in the shared process pool
+    (see core.stage_pool) and take about as long as the slowest of them.
+    By default that happens when EXTRACTION_WORKERS is set and the page is
+    at least PARALLEL_MIN_BYTES long. The result is the same either way.
+
+    Tables, normalized JSON-LD and grids are laid out in `table_format` (see
+    core.table_formats): row dicts by default, or columnar arrays or Arrow
+    IPC streams. Missing numbers are left as NaN; encode the result with
+    core.serialization.dumps_json, which writes them as null.
+
+    Progress goes to `on_event` while the stages run: a "content_types"
+    event, then a "table" event per table, "json_ld" and "article" events
+    and a "grid_strategy" event per grid strategy, each as soon as it is
+    ready, and finally a "done" event with the sections only known at the
+    end (see FINAL_SECTIONS). Events come from the stages themselves, so
+    with `on_event` they always run in-process.
+    """
+    # Parse once; every stage below works on this (filtered) tree. Streamed
+    # fetches hand over the tree they already built.
+    if isinstance(html, ParsedDocument):
+        doc = html
+        html, url = doc.html, url or doc.url
+        doc.url = url
+    else:
+        doc = ParsedDocument(html, url=url, backend=backend, prune=DEFAULT_PRUNE_RULES)
+    if parallel is None:
+        parallel = EXTRACTION_WORKERS > 0 and len(html) >= PARALLEL_MIN_BYTES
+    # Workers re-parse with the default rules, which only gives the same
+    # tree when no other rules were applied
+    parallel = (
+        parallel and doc.pruned in (None, DEFAULT_PRUNE_RULES) and on_event is None
+    )
+
+    sections = resolve_sections(sections)
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: {table_format}")
 
-    # Strategy 4: Try with even more lenient thresholds for edge cases
-    if not grid_data:  # Only if we haven't found anything yet
-        lenient_df = extract_advanced_grid(html, min_rows=1, min_columns=1)
-        if not lenient_df.empty:
-            normalized_lenient_df = normalize_column_names(lenient_df)
-            grid_data["lenient_grid"] = normalize_fields(
-                normalized_lenient_df.to_dict(orient="records")
+    remove_unwanted_blocks(doc)
+    types = classify_content_type(doc)
+    if on_event is not None:
+        on_event("content_types", {"types": [t.value for t in types]})
+    stages = [
+        stage
+        for stage in EXTRACTION_STAGES
+        if not stage.sections.isdisjoint(sections) and stage.applies(types)
+    ]
+
+    if parallel:
+        try:
+            stage_results = _run_stages_in_pool(
+                doc, stages, types, sections, table_format
             )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start over in-process
+            shutdown_pool()
+            stage_results = [
+                stage.run(doc, types, sections, table_format) for stage in stages
+            ]
+    else:
+        stage_results = [
+            stage.run(doc, types, sections, table_format, on_event)
+            for stage in stages
+        ]
+
+    # Merge in stage order so the result does not depend on which worker
+    # finished first
+    result = {}
+    for fields in stage_results:
+        result.update(fields)
+    result["raw_html"] = html
+    # Stages also return the fields they need internally (such as the grids
+    # that make up "listings"); keep only what was asked for
+    result = {key: value for key, value in result.items() if key in sections}
+    result = format_row_sections(result, table_format)
+    if on_event is not None:
+        on_event("done", {k: v for k, v in result.items() if k in FINAL_SECTIONS})
+    return result
+
+
+def _extract_comprehensive_grid_data(
+    doc: ParsedDocument,
+    types: list,
+    sections: Optional[Iterable[str]] = None,
+    on_event: Optional[EventCallback] = None,
+) -> dict:
+    """
+    Extract grid data using multiple strategies for maximum coverage.
+    Strategies are planned by `plan_grid_extraction`; its report is
+    returned under "grid_strategies".
+    """
+    # Run the strategies cheapest first until one grid is good enough
+    grid_data, report = plan_grid_extraction(
+        doc, types, sections=sections, on_event=on_event
+    )
 
     # Combine all grid data into a single listings field if multiple sources found
     all_listings = []
@@ -211,17 +363,13 @@ def _extract_comprehensive_grid_data(
         ):
             all_listings.extend(data)
 
-    if all_listings:
-        # Remove duplicates based on text content
-        seen = set()
-        unique_listings = []
-        for item in all_listings:
-            # Create a signature based on text content
-            text_signature = " ".join(str(v) for v in item.values() if v)
-            if text_signature not in seen:
-                seen.add(text_signature)
-                unique_listings.append(item)
-
-        grid_data["listings"] = unique_listings
+    if all_listings and (sections is None or "listings" in sections):
+        # Strategies often find the same items; drop exact and near-duplicate rows
+        grid_data["listings"], report["dedupe"] = dedupe_rows(all_listings)
+    if "listings" in grid_data:
+        # First, whether or not the legacy strategy that also fills it ran
+        grid_data = {"listings": grid_data.pop("listings"), **grid_data}
 
+    if grid_data:
+        grid_data["grid_strategies"] = report
     return grid_data
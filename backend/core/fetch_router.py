@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from bs4 import NavigableString
+
+from core.content_classifier import classify_content_type
+from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.hydration import hydration_tables
+from core.network_utils import host_key
+
+# A page with less visible text than this, and nothing structured to
+# extract, may be an empty shell that scripts fill in
+SHELL_MAX_TEXT_CHARS = int(os.getenv("SHELL_MAX_TEXT_CHARS", "200"))
+
+# How long the fetcher chosen for a host by method "auto" is remembered,
+# and for how many hosts at most
+AUTO_FETCH_TTL = float(os.getenv("AUTO_FETCH_TTL", "3600"))
+AUTO_FETCH_MAX_HOSTS = int(os.getenv("AUTO_FETCH_MAX_HOSTS", "1024"))
+
+# Mount points of client-side frameworks (React, Next.js, Nuxt, Vue,
+# Gatsby, Angular)
+FRAMEWORK_ROOT_IDS = ("root", "app", "__next", "__nuxt", "___gatsby")
+FRAMEWORK_ROOT_ATTRIBUTES = ("data-reactroot", "data-v-app", "ng-version")
+
+# Content worth extracting without a browser
+STRUCTURED_TYPES = {
+    ContentType.TABLE,
+    ContentType.DIV_GRID,
+    ContentType.UNIVERSAL_GRID,
+    ContentType.JSON_LD,
+}
+
+_HIDDEN_TAGS = ("script", "style", "noscript", "template")
+_VISIBLE_TEXT = "//body//text()[not({})]".format(
+    " or ".join(f"ancestor::{tag}" for tag in _HIDDEN_TAGS)
+)
+
+
+def visible_text_length(doc: ParsedDocument) -> int:
+    """Characters of text in the body outside scripts, styles and templates."""
+    if doc.is_lxml:
+        texts = doc.tree.xpath(_VISIBLE_TEXT)
+    else:
+        body = doc.soup.body
+        texts = (
+            []
+            if body is None
+            else [
+                s
+                for s in body.find_all(string=True)
+                # Only plain text, as with XPath text(): no comments,
+                # doctypes, CDATA or other string subclasses
+                if type(s) is NavigableString
+                and not any(p.name in _HIDDEN_TAGS for p in s.parents)
+            ]
+        )
+    return sum(len(text.strip()) for text in texts)
+
+
+def _framework_root(doc: ParsedDocument) -> Optional[str]:
+    if doc.is_lxml:
+        for root_id in FRAMEWORK_ROOT_IDS:
+            if doc.tree.xpath("//*[@id=$id]", id=root_id):
+                return f"#{root_id}"
+        for attribute in FRAMEWORK_ROOT_ATTRIBUTES:
+            if doc.tree.xpath(f"//*[@{attribute}]"):
+                return f"[{attribute}]"
+        return None
+    for root_id in FRAMEWORK_ROOT_IDS:
+        if doc.soup.find(id=root_id) is not None:
+            return f"#{root_id}"
+    for attribute in FRAMEWORK_ROOT_ATTRIBUTES:
+        if doc.soup.find(attrs={attribute: True}) is not None:
+            return f"[{attribute}]"
+    return None
+
+
+def detect_client_rendered(doc: ParsedDocument) -> Optional[str]:
+    """
+    Why the fetched page looks like a shell that is rendered in the
+    browser, or None when it can be extracted as it is.
+
+    A shell has nothing structured to extract (no tables, grids, JSON-LD
+    or record collections in its embedded state), less than
+    SHELL_MAX_TEXT_CHARS of visible text, and either a framework mount
+    point or scripts to fill it in.
+    """
+    types = classify_content_type(doc)
+    if STRUCTURED_TYPES.intersection(types):
+        return None
+    if ContentType.HYDRATION_STATE in types and hydration_tables(doc):
+        return None
+    text_length = visible_text_length(doc)
+    if text_length >= SHELL_MAX_TEXT_CHARS:
+        return None
+    root = _framework_root(doc)
+    if root is not None:
+        return f"{text_length} characters of text in a {root} app root"
+    if doc.is_lxml:
+        has_scripts = doc.tree.xpath("boolean(//script)")
+    else:
+        has_scripts = doc.soup.find("script") is not None
+    if has_scripts:
+        return f"{text_length} characters of text and scripts to render it"
+    return None
+
+
+class FetcherMemory:
+    """
+    The fetcher ("httpx" or "playwright") that worked for each host, kept
+    for `ttl` seconds for at most `max_hosts` hosts (the least recently
+    used are forgotten first).
+    """
+
+    def __init__(
+        self, ttl: float = AUTO_FETCH_TTL, max_hosts: int = AUTO_FETCH_MAX_HOSTS
+    ):
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+        self.lock = threading.Lock()
+        self._choices: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[str]:
+        host = host_key(url)
+        with self.lock:
+            choice = self._choices.get(host)
+            if choice is None:
+                return None
+            if choice[1] <= time.monotonic():
+                del self._choices[host]
+                return None
+            self._choices.move_to_end(host)
+            return choice[0]
+
+    def remember(self, url: str, fetcher: str) -> None:
+        if self.max_hosts <= 0:
+            return
+        host = host_key(url)
+        with self.lock:
+            self._choices[host] = (fetcher, time.monotonic() + self.ttl)
+            self._choices.move_to_end(host)
+            while len(self._choices) > self.max_hosts:
+                self._choices.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._choices.clear()
+
+
+fetcher_memory = FetcherMemory()
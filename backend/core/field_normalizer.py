@@ -1,19 +1,106 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Normalized field name -> substrings of column names that map to it; the
+# first name with a matching substring wins
+DEFAULT_FIELD_SYNONYMS = {
+    "title": ["title", "name", "product", "headline", "job", "movie", "item name"],
+    "price": ["price", "cost", "$", "amount"],
+    "rating": ["rating", "score", "stars", "review", "avg score"],
+    "date": ["date", "year", "posted", "published", "release", "released"],
+    "location": ["location", "city", "address", "region"],
+    "beds": ["bedrooms", "beds"],
+    "bath": ["bathrooms", "bath"],
+}
+
+# Distinct column layouts whose mapping is kept
+SCHEMA_CACHE_SIZE = int(os.getenv("FIELD_SCHEMA_CACHE_SIZE", "1024"))
+
+
+def load_synonyms(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Field synonyms from the JSON file at `path` (or FIELD_SYNONYMS_FILE),
+    an object of normalized name -> list of substrings. Without a file, the
+    built-in DEFAULT_FIELD_SYNONYMS.
+    """
+    path = path or os.getenv("FIELD_SYNONYMS_FILE")
+    if not path:
+        return DEFAULT_FIELD_SYNONYMS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SynonymMatcher:
+    """
+    All synonyms compiled into one pattern, so a column name is scanned
+    once instead of once per synonym.
+
+    The pattern is tried at every position of the name; alternatives are
+    ordered by the priority of their field, so overlapping matches resolve
+    the same way as checking the fields one after another.
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        self.fields = list(synonyms)
+        self._field_of = {}
+        alternatives = []
+        for field in self.fields:
+            # Longer synonyms first, so each one can be told apart
+            for variant in sorted(synonyms[field], key=len, reverse=True):
+                variant = variant.lower()
+                if variant and variant not in self._field_of:
+                    self._field_of[variant] = field
+                    alternatives.append(re.escape(variant))
+        self._priority = {field: i for i, field in enumerate(self.fields)}
+        self._pattern = (
+            re.compile("(?=(" + "|".join(alternatives) + "))") if alternatives else None
+        )
+
+    def match(self, name: str) -> Optional[str]:
+        """The first field with a synonym inside `name` (lowercased)."""
+        if self._pattern is None:
+            return None
+        best = None
+        for m in self._pattern.finditer(name):
+            field = self._field_of[m.group(1)]
+            if best is None or self._priority[field] < self._priority[best]:
+                best = field
+                if self._priority[best] == 0:
+                    break
+        return best
+
+
+_matcher = SynonymMatcher(load_synonyms())
+
+
+def set_synonyms(synonyms: Dict[str, List[str]]) -> None:
+    """Replace the field synonyms and forget the cached column mappings."""
+    global _matcher
+    _matcher = SynonymMatcher(synonyms)
+    _schema_mapping.cache_clear()
+
+
+def normalize_field_name(k: str) -> str:
+    k = k.lower()
+    return _matcher.match(k) or k
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _schema_mapping(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(normalize_field_name(k) for k in keys)
+
+
 def normalize_fields(records: list[dict]) -> list[dict]:
-    key_map = {
-        "title": ["title", "name", "product", "headline", "job", "movie", "item name"],
-        "price": ["price", "cost", "$", "amount"],
-        "rating": ["rating", "score", "stars", "review", "avg score"],
-        "date": ["date", "year", "posted", "published", "release", "released"],
-        "location": ["location", "city", "address", "region"],
-        "beds": ["bedrooms", "beds"],
-        "bath": ["bathrooms", "bath"],
-    }
-
-    def map_key(k):
-        k = k.lower()
-        for norm, variants in key_map.items():
-            if any(v in k for v in variants):
-                return norm
-        return k
-
-    return [{map_key(k): v for k, v in row.items()} for row in records]
+    # Rows of one table share their keys: map each layout once and rename
+    # the rows in bulk
+    normalized = []
+    keys = names = None
+    for row in records:
+        row_keys = tuple(row)
+        if row_keys != keys:
+            keys, names = row_keys, _schema_mapping(row_keys)
+        normalized.append(dict(zip(names, row.values())))
+    return normalized
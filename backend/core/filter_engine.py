@@ -1,20 +1,13 @@
-from bs4 import BeautifulSoup
+from core.document import ParsedDocument
+from core.pruning import DEFAULT_PRUNE_RULES, PruneRules
 
-UNWANTED_CLASSES = [
-    "footer",
-    "header",
-    "nav",
-    "advertisement",
-    "ad",
-    "popup",
-    "modal",
-    "subscribe",
-    "newsletter",
-]
 
-
-def remove_unwanted_blocks(soup: BeautifulSoup) -> BeautifulSoup:
-    for cls in UNWANTED_CLASSES:
-        for tag in soup.select(f".{cls}"):
-            tag.decompose()
-    return soup
+def remove_unwanted_blocks(source, rules: PruneRules = DEFAULT_PRUNE_RULES):
+    doc = ParsedDocument.coerce(source)
+    if doc.pruned is rules:
+        # Already dropped while the page was parsed
+        return doc.root
+    doc.invalidate()
+    if doc.is_lxml:
+        return rules.prune_lxml(doc.tree)
+    return rules.prune_soup(doc.soup)
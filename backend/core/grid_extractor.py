@@ -1,31 +1,46 @@
-from bs4 import BeautifulSoup, Tag
 import pandas as pd
-from typing import List, Dict, Tuple, Optional
+from typing import Dict
 import re
 from collections import defaultdict, Counter
-
-
-def extract_grid_rows(html: str) -> pd.DataFrame:
+from core.document import ParsedDocument
+from core.dom_index import DomIndex
+
+# (tag, class fragment) pairs equivalent to the `tag[class*='fragment']`
+# selectors of common grid layouts; a None fragment matches every tag
+GRID_SELECTORS = [
+    ("div", "row"),
+    ("div", "item"),
+    ("div", "card"),
+    ("div", "listing"),
+    ("div", "product"),
+    ("div", "result"),
+    ("li", "item"),
+    ("tr", None),  # Table rows
+    ("div", "entry"),
+    ("div", "post"),
+    ("div", "article"),
+]
+
+
+def extract_grid_rows(source) -> pd.DataFrame:
     """
     Universal grid extractor that finds the most repeated div structure
     and extracts it as tabular data.
 
     Args:
-        html: Raw HTML string
+        source: Raw HTML string, parsed tree (bs4 or lxml) or ParsedDocument
 
     Returns:
         DataFrame with extracted grid data
     """
-    soup = BeautifulSoup(html, "lxml")
+    doc = ParsedDocument.coerce(source)
+    # Several strategies start from these rows; build them once per tree
+    return doc.cached("grid_rows", lambda: _extract_grid_rows(doc.index)).copy()
 
-    # Find all divs and group by class name
-    divs = soup.find_all("div")
-    class_groups = defaultdict(list)
 
-    for div in divs:
-        class_name = " ".join(sorted(div.get("class", [])))
-        if class_name:
-            class_groups[class_name].append(div)
+def _extract_grid_rows(index: DomIndex) -> pd.DataFrame:
+    # Group divs by class name
+    class_groups = index.class_groups("div")
 
     # Find the most repeated class group (likely the "row" structure)
     if not class_groups:
@@ -35,14 +50,14 @@ def extract_grid_rows(html: str) -> pd.DataFrame:
 
     # If we don't have enough repeated structures, try alternative approaches
     if len(main_group) < 3:
-        return _extract_alternative_grid(soup)
+        return _extract_alternative_grid(index)
 
     rows = []
     for div in main_group:
         row_data = {}
-        for child in div.find_all(recursive=False):
-            key = " ".join(sorted(child.get("class", []))) or child.name
-            val = child.get_text(strip=True)
+        for child in index.children[div]:
+            key = index.class_keys[child] or index.tags[child]
+            val = index.text(child)
             if val:
                 row_data[key] = val
         if row_data:
@@ -51,43 +66,40 @@ def extract_grid_rows(html: str) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
-def _extract_alternative_grid(soup: BeautifulSoup) -> pd.DataFrame:
+def _extract_alternative_grid(index: DomIndex) -> pd.DataFrame:
     """
     Alternative grid extraction methods when the main approach fails.
     """
     # Method 1: Look for repeated structures by tag patterns
-    rows = _extract_by_tag_patterns(soup)
+    rows = _extract_by_tag_patterns(index)
     if not rows.empty:
         return rows
 
     # Method 2: Look for common parent-child relationships
-    rows = _extract_by_parent_child_patterns(soup)
+    rows = _extract_by_parent_child_patterns(index)
     if not rows.empty:
         return rows
 
     # Method 3: Look for data attributes or specific patterns
-    rows = _extract_by_data_attributes(soup)
+    rows = _extract_by_data_attributes(index)
     if not rows.empty:
         return rows
 
     return pd.DataFrame()
 
 
-def _extract_by_tag_patterns(soup: BeautifulSoup) -> pd.DataFrame:
+def _extract_by_tag_patterns(index: DomIndex) -> pd.DataFrame:
     """
     Extract grid data by looking for repeated tag patterns.
     """
-    # Find all elements with classes
-    elements_with_classes = soup.find_all(attrs={"class": True})
-
-    # Group by tag name and class pattern
+    # Group elements with classes by tag name and class pattern
     pattern_groups = defaultdict(list)
 
-    for elem in elements_with_classes:
-        tag_name = elem.name
-        classes = " ".join(sorted(elem.get("class", [])))
+    for i in index.with_class():
+        tag_name = index.tags[i]
+        classes = index.class_keys[i]
         pattern = f"{tag_name}.{classes}" if classes else tag_name
-        pattern_groups[pattern].append(elem)
+        pattern_groups[pattern].append(i)
 
     # Find the most common pattern with multiple instances
     common_patterns = [
@@ -107,24 +119,23 @@ def _extract_by_tag_patterns(soup: BeautifulSoup) -> pd.DataFrame:
             row_data = {}
 
             # Get text from the element itself
-            text = elem.get_text(strip=True)
+            text = index.text(elem)
             if text:
                 row_data["text"] = text
 
             # Get attributes
-            for attr, value in elem.attrs.items():
-                if attr != "class" and isinstance(value, (str, list)):
-                    if isinstance(value, list):
-                        value = " ".join(value)
+            for attr, value in index.attributes(elem):
+                if attr != "class":
                     row_data[f"attr_{attr}"] = value
 
             # Get text from direct children
-            for child in elem.find_all(recursive=False):
-                child_text = child.get_text(strip=True)
+            for child in index.children[elem]:
+                child_text = index.text(child)
                 if child_text:
-                    child_key = f"child_{child.name}"
+                    child_name = index.tags[child]
+                    child_key = f"child_{child_name}"
                     if child_key in row_data:
-                        child_key = f"child_{child.name}_{len([k for k in row_data.keys() if k.startswith(child_key)])}"
+                        child_key = f"child_{child_name}_{len([k for k in row_data.keys() if k.startswith(child_key)])}"
                     row_data[child_key] = child_text
 
             if row_data:
@@ -136,30 +147,24 @@ def _extract_by_tag_patterns(soup: BeautifulSoup) -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def _extract_by_parent_child_patterns(soup: BeautifulSoup) -> pd.DataFrame:
+def _extract_by_parent_child_patterns(index: DomIndex) -> pd.DataFrame:
     """
     Extract grid data by looking for common parent-child relationships.
     """
     # Find containers that have multiple similar children
-    containers = soup.find_all("div", recursive=True)
-
-    for container in containers:
-        children = container.find_all(recursive=False)
+    for container in index.by_tag.get("div", []):
+        children = index.children[container]
         if len(children) < 3:
             continue
 
         # Check if children have similar structures
-        child_patterns = []
-        for child in children:
-            pattern = _get_element_pattern(child)
-            child_patterns.append(pattern)
+        pattern_counts = Counter(index.element_pattern(child) for child in children)
 
         # If we have repeated patterns, extract data
-        pattern_counts = Counter(child_patterns)
         if max(pattern_counts.values()) >= 3:
             rows = []
             for child in children:
-                row_data = _extract_element_data(child)
+                row_data = _extract_element_data(index, child)
                 if row_data:
                     rows.append(row_data)
 
@@ -169,12 +174,12 @@ def _extract_by_parent_child_patterns(soup: BeautifulSoup) -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def _extract_by_data_attributes(soup: BeautifulSoup) -> pd.DataFrame:
+def _extract_by_data_attributes(index: DomIndex) -> pd.DataFrame:
     """
     Extract grid data by looking for data attributes or specific patterns.
     """
     # Look for elements with data attributes
-    data_elements = soup.find_all(attrs={"data-": True})
+    data_elements = index.with_attribute("data-")
 
     if len(data_elements) >= 3:
         rows = []
@@ -182,13 +187,13 @@ def _extract_by_data_attributes(soup: BeautifulSoup) -> pd.DataFrame:
             row_data = {}
 
             # Extract data attributes
-            for attr, value in elem.attrs.items():
+            for attr, value in index.attributes(elem):
                 if attr.startswith("data-"):
                     key = attr.replace("data-", "")
                     row_data[key] = value
 
             # Extract text
-            text = elem.get_text(strip=True)
+            text = index.text(elem)
             if text:
                 row_data["text"] = text
 
@@ -201,56 +206,41 @@ def _extract_by_data_attributes(soup: BeautifulSoup) -> pd.DataFrame:
     return pd.DataFrame()
 
 
-def _get_element_pattern(elem: Tag) -> str:
-    """
-    Get a pattern representation of an element for comparison.
-    """
-    tag_name = elem.name
-    classes = " ".join(sorted(elem.get("class", [])))
-    children = [child.name for child in elem.find_all(recursive=False)]
-    children_str = ".".join(sorted(children)) if children else "no_children"
-
-    return f"{tag_name}.{classes}.{children_str}"
-
-
-def _extract_element_data(elem: Tag) -> Dict[str, str]:
+def _extract_element_data(index: DomIndex, elem: int) -> Dict[str, str]:
     """
     Extract all relevant data from an element.
     """
     data = {}
 
     # Get text content
-    text = elem.get_text(strip=True)
+    text = index.text(elem)
     if text:
         data["text"] = text
 
     # Get attributes
-    for attr, value in elem.attrs.items():
-        if isinstance(value, (str, list)):
-            if isinstance(value, list):
-                value = " ".join(value)
-            data[attr] = value
+    for attr, value in index.attributes(elem):
+        data[attr] = value
 
     # Get text from direct children
-    for child in elem.find_all(recursive=False):
-        child_text = child.get_text(strip=True)
+    for child in index.children[elem]:
+        child_text = index.text(child)
         if child_text:
-            child_key = f"{child.name}_text"
+            child_name = index.tags[child]
+            child_key = f"{child_name}_text"
             if child_key in data:
-                child_key = f"{child.name}_text_{len([k for k in data.keys() if k.startswith(f'{child.name}_text')])}"
+                child_key = f"{child_name}_text_{len([k for k in data.keys() if k.startswith(f'{child_name}_text')])}"
             data[child_key] = child_text
 
     return data
 
 
-def extract_grid_items(soup: BeautifulSoup) -> list[dict]:
+def extract_grid_items(source) -> list[dict]:
     """
     Legacy function for backward compatibility.
     Now uses the robust universal grid extractor.
     """
-    # Convert soup to HTML string and use the new extractor
-    html = str(soup)
-    df = extract_grid_rows(html)
+    # Reuse the caller's tree rather than serializing and re-parsing it
+    df = extract_grid_rows(source)
 
     if df.empty:
         return []
@@ -260,33 +250,34 @@ def extract_grid_items(soup: BeautifulSoup) -> list[dict]:
 
 
 def extract_advanced_grid(
-    html: str, min_rows: int = 3, min_columns: int = 2
+    source, min_rows: int = 3, min_columns: int = 2
 ) -> pd.DataFrame:
     """
     Advanced grid extractor with configurable thresholds and multiple strategies.
 
     Args:
-        html: Raw HTML string
+        source: Raw HTML string, parsed tree (bs4 or lxml) or ParsedDocument
         min_rows: Minimum number of rows to consider it a valid grid
         min_columns: Minimum number of columns to consider it a valid grid
 
     Returns:
         DataFrame with extracted grid data
     """
-    soup = BeautifulSoup(html, "lxml")
+    doc = ParsedDocument.coerce(source)
+    index = doc.index
 
     # Strategy 1: Universal div structure extraction
-    df = extract_grid_rows(html)
+    df = extract_grid_rows(doc)
     if len(df) >= min_rows and len(df.columns) >= min_columns:
         return df
 
     # Strategy 2: Look for specific grid patterns
-    df = _extract_specific_grid_patterns(soup, min_rows, min_columns)
+    df = _extract_specific_grid_patterns(index, min_rows, min_columns)
     if not df.empty:
         return df
 
     # Strategy 3: Extract from any repeated structure
-    df = _extract_any_repeated_structure(soup, min_rows, min_columns)
+    df = _extract_any_repeated_structure(index, min_rows, min_columns)
     if not df.empty:
         return df
 
@@ -294,32 +285,20 @@ def extract_advanced_grid(
 
 
 def _extract_specific_grid_patterns(
-    soup: BeautifulSoup, min_rows: int, min_columns: int
+    index: DomIndex, min_rows: int, min_columns: int
 ) -> pd.DataFrame:
     """
     Extract from common grid patterns found on various websites.
     """
-    # Common grid selectors
-    grid_selectors = [
-        "div[class*='row']",
-        "div[class*='item']",
-        "div[class*='card']",
-        "div[class*='listing']",
-        "div[class*='product']",
-        "div[class*='result']",
-        "li[class*='item']",
-        "tr",  # Table rows
-        "div[class*='entry']",
-        "div[class*='post']",
-        "div[class*='article']",
-    ]
-
-    for selector in grid_selectors:
-        elements = soup.select(selector)
+    for tag, fragment in GRID_SELECTORS:
+        if fragment is None:
+            elements = index.by_tag.get(tag, [])
+        else:
+            elements = index.class_contains(tag, fragment)
         if len(elements) >= min_rows:
             rows = []
             for elem in elements:
-                row_data = _extract_comprehensive_element_data(elem)
+                row_data = _extract_comprehensive_element_data(index, elem)
                 if row_data:
                     rows.append(row_data)
 
@@ -332,25 +311,17 @@ def _extract_specific_grid_patterns(
 
 
 def _extract_any_repeated_structure(
-    soup: BeautifulSoup, min_rows: int, min_columns: int
+    index: DomIndex, min_rows: int, min_columns: int
 ) -> pd.DataFrame:
     """
     Extract from any repeated structure by analyzing the DOM tree.
     """
-    # Find all elements with text content
-    text_elements = []
-    for elem in soup.find_all():
-        text = elem.get_text(strip=True)
-        if text and len(text) > 3:  # Filter out very short text
-            text_elements.append(elem)
-
-    # Group elements by their structural similarity
+    # Group elements with text content by their structural similarity
     structure_groups = defaultdict(list)
 
-    for elem in text_elements:
-        # Create a structural signature
-        signature = _create_structural_signature(elem)
-        structure_groups[signature].append(elem)
+    for i in range(len(index)):
+        if index.text_lengths[i] > 3:  # Filter out very short text
+            structure_groups[index.structure_key(i)].append(i)
 
     # Find the most common structure
     if structure_groups:
@@ -362,7 +333,7 @@ def _extract_any_repeated_structure(
         if len(elements) >= min_rows:
             rows = []
             for elem in elements:
-                row_data = _extract_comprehensive_element_data(elem)
+                row_data = _extract_comprehensive_element_data(index, elem)
                 if row_data:
                     rows.append(row_data)
 
@@ -374,66 +345,45 @@ def _extract_any_repeated_structure(
     return pd.DataFrame()
 
 
-def _create_structural_signature(elem: Tag) -> str:
-    """
-    Create a signature that represents the structure of an element.
-    """
-    tag_name = elem.name
-    classes = " ".join(sorted(elem.get("class", [])))
-
-    # Get direct children structure
-    children = []
-    for child in elem.find_all(recursive=False):
-        child_signature = f"{child.name}.{'.'.join(sorted(child.get('class', [])))}"
-        children.append(child_signature)
-
-    children_str = "|".join(sorted(children)) if children else "no_children"
-
-    return f"{tag_name}.{classes}.{children_str}"
-
-
-def _extract_comprehensive_element_data(elem: Tag) -> Dict[str, str]:
+def _extract_comprehensive_element_data(index: DomIndex, elem: int) -> Dict[str, str]:
     """
     Extract comprehensive data from an element including nested content.
     """
     data = {}
 
     # Get main text
-    text = elem.get_text(strip=True)
+    text = index.text(elem)
     if text:
         data["text"] = text
 
     # Get attributes
-    for attr, value in elem.attrs.items():
-        if isinstance(value, (str, list)):
-            if isinstance(value, list):
-                value = " ".join(value)
-            data[attr] = value
+    for attr, value in index.attributes(elem):
+        data[attr] = value
 
     # Get text from specific child elements
     for tag_name in ["h1", "h2", "h3", "h4", "h5", "h6", "p", "span", "a", "div"]:
-        children = elem.find_all(tag_name, recursive=False)
+        children = index.child_elements(elem, tag_name)
         for i, child in enumerate(children):
-            child_text = child.get_text(strip=True)
+            child_text = index.text(child)
             if child_text:
                 key = f"{tag_name}_{i + 1}" if len(children) > 1 else tag_name
                 data[key] = child_text
 
     # Get links
-    links = elem.find_all("a", href=True)
+    links = [a for a in index.descendants(elem, "a") if index.get(a, "href") is not None]
     for i, link in enumerate(links):
-        href = link.get("href", "")
-        text = link.get_text(strip=True)
+        href = index.get(link, "href", "")
+        text = index.text(link)
         if href:
             data[f"link_{i + 1}_url"] = href
         if text:
             data[f"link_{i + 1}_text"] = text
 
     # Get images
-    images = elem.find_all("img")
+    images = index.descendants(elem, "img")
     for i, img in enumerate(images):
-        src = img.get("src", "")
-        alt = img.get("alt", "")
+        src = index.get(img, "src", "")
+        alt = index.get(img, "alt", "")
         if src:
             data[f"image_{i + 1}_src"] = src
         if alt:
@@ -546,17 +496,17 @@ def suggest_column_mappings(df: pd.DataFrame) -> dict:
     return suggestions
 
 
-def extract_grid_with_mapping(html: str) -> dict:
+def extract_grid_with_mapping(source) -> dict:
     """
     Extract grid data with column mapping suggestions.
 
     Args:
-        html: Raw HTML string
+        source: Raw HTML string, parsed tree (bs4 or lxml) or ParsedDocument
 
     Returns:
         Dictionary containing DataFrame and column mapping suggestions
     """
-    df = extract_grid_rows(html)
+    df = extract_grid_rows(source)
 
     if df.empty:
         return {"data": df, "suggestions": {}, "normalized_data": df}
@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.field_normalizer import normalize_fields
+from core.grid_extractor import (
+    extract_advanced_grid,
+    extract_grid_rows,
+    extract_grid_with_mapping,
+    normalize_column_names,
+)
+
+# Stop running further strategies once a grid scores at least this much
+QUALITY_THRESHOLD = float(os.getenv("GRID_QUALITY_THRESHOLD", "0.8"))
+
+# Grids with this many rows get the full row-count part of the score
+FULL_SCORE_ROWS = 10
+
+
+def score_grid(df: pd.DataFrame) -> float:
+    """
+    Quality of an extracted grid between 0 and 1.
+
+    Weighs the row count (up to FULL_SCORE_ROWS), column consistency (share
+    of columns filled in at least half of the rows) and the overall fill
+    ratio of the cells.
+    """
+    if df is None or df.empty or len(df.columns) == 0:
+        return 0.0
+    filled = df.notna().to_numpy()
+    rows = min(len(df) / FULL_SCORE_ROWS, 1.0)
+    consistency = float((filled.mean(axis=0) >= 0.5).mean())
+    fill_ratio = float(filled.mean())
+    return round(0.4 * rows + 0.3 * consistency + 0.3 * fill_ratio, 3)
+
+
+class GridStrategy:
+    """
+    One way of pulling a grid out of a page.
+
+    `run(doc)` returns the extracted DataFrame (used for scoring) and the
+    result fields it contributes, which are empty when the grid is not
+    usable. `applies(types)` filters by detected content type, and a
+    `fallback` strategy only runs when no other strategy produced a grid.
+    `sections` are the result sections its output ends up in; `own_sections`
+    leaves out the combined "listings" that every strategy feeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[ParsedDocument], Tuple[pd.DataFrame, dict]],
+        applies: Callable[[list], bool] = lambda types: True,
+        fallback: bool = False,
+        sections: Iterable[str] = (),
+    ):
+        self.name = name
+        self.run = run
+        self.applies = applies
+        self.fallback = fallback
+        self.own_sections = frozenset(sections) - {"listings"}
+        # Every grid is merged into the combined "listings"
+        self.sections = self.own_sections | {"listings"}
+
+
+class StrategyCosts:
+    """
+    Exponential moving average of each strategy's run time in this process.
+    Strategies that have not been measured yet have no estimate.
+    """
+
+    def __init__(self, weight: float = 0.2):
+        self.weight = weight
+        self._averages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, name: str) -> Optional[float]:
+        return self._averages.get(name)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._averages.clear()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            previous = self._averages.get(name)
+            if previous is None:
+                self._averages[name] = seconds
+            else:
+                self._averages[name] = previous + self.weight * (seconds - previous)
+
+
+def _legacy_listings(doc: ParsedDocument):
+    df = extract_grid_rows(doc)
+    if df.empty:
+        return df, {}
+    return df, {"listings": normalize_fields(df.to_dict(orient="records"))}
+
+
+def _universal_grid(doc: ParsedDocument):
+    grid_with_mapping = extract_grid_with_mapping(doc)
+    df = grid_with_mapping["data"]
+    if df.empty or len(df) < 3:
+        return df, {}
+    return df, {
+        "universal_grid": normalize_fields(df.to_dict(orient="records")),
+        "column_mappings": grid_with_mapping["suggestions"],
+        "normalized_grid": normalize_fields(
+            grid_with_mapping["normalized_data"].to_dict(orient="records")
+        ),
+    }
+
+
+def _advanced_grid(doc: ParsedDocument):
+    df = extract_advanced_grid(doc, min_rows=2, min_columns=1)
+    if df.empty or len(df) < 2:
+        return df, {}
+    # Normalize column names for better UX
+    records = normalize_column_names(df).to_dict(orient="records")
+    return df, {"advanced_grid": normalize_fields(records)}
+
+
+def _lenient_grid(doc: ParsedDocument):
+    df = extract_advanced_grid(doc, min_rows=1, min_columns=1)
+    if df.empty:
+        return df, {}
+    records = normalize_column_names(df).to_dict(orient="records")
+    return df, {"lenient_grid": normalize_fields(records)}
+
+
+# In order of preference while run times are still unknown
+GRID_STRATEGIES = [
+    GridStrategy(
+        "legacy", _legacy_listings, applies=lambda types: ContentType.DIV_GRID in types
+    ),
+    GridStrategy(
+        "universal",
+        _universal_grid,
+        sections=["universal_grid", "column_mappings", "normalized_grid"],
+    ),
+    GridStrategy("advanced", _advanced_grid, sections=["advanced_grid"]),
+    GridStrategy("lenient", _lenient_grid, fallback=True, sections=["lenient_grid"]),
+]
+
+STRATEGY_COSTS = StrategyCosts()
+
+
+def _or_inf(value: Optional[float]) -> float:
+    return float("inf") if value is None else value
+
+
+def plan_grid_extraction(
+    doc: ParsedDocument,
+    types: list,
+    threshold: Optional[float] = None,
+    strategies: Optional[List[GridStrategy]] = None,
+    costs: Optional[StrategyCosts] = None,
+    sections: Optional[Iterable[str]] = None,
+    on_event: Optional[Callable[[str, dict], None]] = None,
+) -> Tuple[dict, dict]:
+    """
+    Run grid strategies cheapest first until one result is good enough.
+
+    Strategies are ordered by their measured average run time and each
+    result is scored with `score_grid`; once a usable grid reaches
+    `threshold`, the remaining strategies that only feed "listings" are
+    skipped. Strategies with sections of their own (of those in `sections`,
+    when given) always run, so which sections come back does not depend on
+    earlier run times. With `sections`, strategies whose output ends up in
+    none of them are skipped as well.
+    Each strategy that ran is reported to `on_event` as soon as it is done,
+    as a ("grid_strategy", report entry plus its "fields") event.
+
+    Returns:
+        The merged result fields of every strategy that ran, and a report
+        with the score, row count and run time of each strategy that ran
+        and the names of those that were skipped
+    """
+    threshold = QUALITY_THRESHOLD if threshold is None else threshold
+    strategies = GRID_STRATEGIES if strategies is None else strategies
+    costs = STRATEGY_COSTS if costs is None else costs
+
+    # Unmeasured strategies go last, in declaration order (the sort is stable)
+    candidates = [s for s in strategies if s.applies(types)]
+    primary = sorted(
+        (s for s in candidates if not s.fallback),
+        key=lambda s: _or_inf(costs.estimate(s.name)),
+    )
+    fallbacks = [s for s in candidates if s.fallback]
+
+    def needed(strategy: GridStrategy) -> bool:
+        # Whether the strategy fills a section nothing else does
+        if sections is None:
+            return bool(strategy.own_sections)
+        return not strategy.own_sections.isdisjoint(sections)
+
+    results = {}
+    ran = []
+    skipped = []
+    best = 0.0
+    for strategy in primary + fallbacks:
+        if (
+            (best >= threshold and not needed(strategy))
+            or (strategy.fallback and any(results.values()))
+            or (sections is not None and strategy.sections.isdisjoint(sections))
+        ):
+            skipped.append(strategy.name)
+            continue
+        if not ran:
+            # Every strategy starts from the shared grid rows; build them
+            # outside the timings so the first one to run is not charged
+            # for work the others reuse
+            extract_grid_rows(doc)
+        start = time.perf_counter()
+        df, fields = strategy.run(doc)
+        elapsed = time.perf_counter() - start
+        costs.record(strategy.name, elapsed)
+
+        score = score_grid(df) if fields else 0.0
+        best = max(best, score)
+        results[strategy.name] = fields
+        entry = {
+            "strategy": strategy.name,
+            "seconds": round(elapsed, 4),
+            "rows": len(df),
+            "score": score,
+        }
+        ran.append(entry)
+        if on_event is not None:
+            on_event("grid_strategy", dict(entry, fields=fields))
+
+    # Merge in declaration order, not run order, so the same strategies give
+    # the same fields whichever of them was measured faster
+    grid_data = {}
+    for strategy in candidates:
+        grid_data.update(results.get(strategy.name, {}))
+
+    report = {
+        "threshold": threshold,
+        "best_score": best,
+        "ran": ran,
+        "skipped": skipped,
+    }
+    return grid_data, report
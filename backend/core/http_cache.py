@@ -0,0 +1,383 @@
+import email.utils
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+import orjson
+
+# Where fetched pages are kept between requests (and restarts)
+HTTP_CACHE_DIR = os.getenv(
+    "HTTP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sift-http-cache")
+)
+
+# Total size of the cached bodies; the least recently used pages are evicted
+# beyond it. 0 turns the cache off
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Pages without an explicit lifetime but with a Last-Modified date stay fresh
+# for a tenth of their age, up to this many seconds (RFC 9111, section 4.2.2)
+HTTP_CACHE_HEURISTIC_MAX_AGE = float(os.getenv("HTTP_CACHE_HEURISTIC_MAX_AGE", "86400"))
+
+# Response headers kept with a cached body; Age counts towards how long a
+# page stays fresh (RFC 9111, section 4.2.3)
+_KEPT_HEADERS = (
+    "age",
+    "cache-control",
+    "content-type",
+    "date",
+    "etag",
+    "expires",
+    "last-modified",
+    "vary",
+)
+
+# The User-Agent is rotated on every request, so a page that varies on it
+# is still cached once for all of them
+_IGNORED_VARY = {"user-agent"}
+
+_cache: Optional["HttpCache"] = None
+_cache_lock = threading.Lock()
+
+
+def _cache_control(headers: Mapping[str, str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in (headers.get("cache-control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _vary(headers: Mapping[str, str]) -> list:
+    names = (headers.get("vary") or "").split(",")
+    return sorted({n.strip().lower() for n in names if n.strip()} - _IGNORED_VARY)
+
+
+def _variant(names: list, request_headers: Mapping[str, str]) -> Dict[str, str]:
+    lowered = {k.lower(): v for k, v in request_headers.items()}
+    return {name: lowered.get(name, "") for name in names}
+
+
+@dataclass
+class CachedResponse:
+    """A cached page: its body, the headers kept with it, and when it was stored."""
+
+    key: str
+    url: str
+    headers: Dict[str, str]
+    encoding: str
+    stored_at: float
+    size: int
+    variant: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def freshness_lifetime(self) -> float:
+        """Seconds the page may be served without asking the origin again."""
+        directives = _cache_control(self.headers)
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            lifetime = _seconds(directives.get(name))
+            if lifetime is not None:
+                return lifetime
+        date = _http_date(self.headers.get("date")) or self.stored_at
+        if "expires" in self.headers:
+            # An invalid date means already expired
+            expires = _http_date(self.headers.get("expires"))
+            return max(expires - date, 0.0) if expires is not None else 0.0
+        last_modified = _http_date(self.headers.get("last-modified"))
+        if last_modified is not None:
+            age = max(date - last_modified, 0.0)
+            return min(age / 10, HTTP_CACHE_HEURISTIC_MAX_AGE)
+        return 0.0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        age = _seconds(self.headers.get("age")) or 0.0
+        age += max(now - self.stored_at, 0.0)
+        return age < self.freshness_lifetime()
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Request headers asking the origin whether the body is still current."""
+        headers = {}
+        if self.headers.get("etag"):
+            headers["If-None-Match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+    def text(self) -> str:
+        return self.body.decode(self.encoding, errors="replace")
+
+
+class HttpCache:
+    """
+    Fetched pages on local disk, keyed by URL and variant (the request
+    headers named by the response's Vary), following the storage and
+    freshness rules of RFC 9111 for a shared cache.
+
+    Each page is a body file and a small JSON file of metadata, named
+    "<URL hash>-<variant hash>", so every variant of a URL is kept side by
+    side. The cache holds at most `max_bytes` of bodies and evicts the least
+    recently used pages first; the order of use survives restarts through
+    the metadata files' modification times.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        # Variants kept per URL hash, and the Vary header names last seen
+        # for it (read from one of its entries on first use)
+        self._variants: Dict[str, int] = {}
+        self._vary_names: Dict[str, list] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            meta_path, body_path = self._paths(key)
+            try:
+                entries.append(
+                    (os.stat(meta_path).st_mtime, key, os.stat(body_path).st_size)
+                )
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total += size
+            base = key.partition("-")[0]
+            self._variants[base] = self._variants.get(base, 0) + 1
+
+    @staticmethod
+    def _url_hash(url: str) -> str:
+        return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def key_for(cls, url: str, variant: Optional[Mapping[str, str]] = None) -> str:
+        """Entry name for `url` and the request header values it varies on."""
+        base = cls._url_hash(url)
+        lines = "\n".join(f"{k}:{v}" for k, v in sorted((variant or {}).items()))
+        digest = hashlib.blake2b(lines.encode("utf-8"), digest_size=8).hexdigest()
+        return f"{base}-{digest}"
+
+    def _names(self, base: str) -> Optional[list]:
+        # The Vary names of a URL, from any of its entries
+        with self.lock:
+            names = self._vary_names.get(base)
+            if names is not None or not self._variants.get(base):
+                return names
+            key = next((k for k in self._sizes if k.startswith(base + "-")), None)
+        if key is None:
+            return None
+        try:
+            with open(self._paths(key)[0], "rb") as f:
+                names = list(orjson.loads(f.read()).get("variant", {}))
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        with self.lock:
+            self._vary_names.setdefault(base, names)
+        return names
+
+    def lookup(
+        self, url: str, request_headers: Mapping[str, str]
+    ) -> Optional[CachedResponse]:
+        """
+        The cached page for `url`, body included, if its variant matches
+        `request_headers`. Stale pages are returned too: they can still be
+        revalidated (see `CachedResponse.conditional_headers`).
+        """
+        names = self._names(self._url_hash(url))
+        if names is None:
+            return None
+        key = self.key_for(url, _variant(names, request_headers))
+        meta_path, body_path = self._paths(key)
+        with self.lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(meta_path, "rb") as f:
+                entry = CachedResponse(**orjson.loads(f.read()))
+            if entry.url != url:
+                return None
+            with open(body_path, "rb") as f:
+                entry.body = f.read()
+            os.utime(meta_path)
+        except (OSError, TypeError, orjson.JSONDecodeError):
+            # Evicted meanwhile (possibly by another worker process) or torn
+            self._forget(key)
+            return None
+        return entry
+
+    def store(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        status: int,
+        headers: Mapping[str, str],
+        body: bytes,
+        encoding: str,
+    ) -> Optional[CachedResponse]:
+        """
+        Keep a response to a GET of `url` if it may be cached and can be
+        reused: a complete 200 that is not marked no-store or private and
+        has a lifetime or a validator to revalidate with. Returns the new
+        entry, or None when the response was not kept.
+        """
+        headers = {k.lower(): v for k, v in headers.items()}
+        directives = _cache_control(headers)
+        names = (headers.get("vary") or "").split(",")
+        if (
+            status != 200
+            or "no-store" in directives
+            or "private" in directives
+            or any(n.strip() == "*" for n in names)
+            or len(body) > self.max_bytes
+        ):
+            return None
+        variant = _variant(_vary(headers), request_headers)
+        entry = CachedResponse(
+            key=self.key_for(url, variant),
+            url=url,
+            headers={k: headers[k] for k in _KEPT_HEADERS if k in headers},
+            encoding=encoding,
+            stored_at=time.time(),
+            size=len(body),
+            variant=variant,
+            body=body,
+        )
+        if not entry.conditional_headers() and entry.freshness_lifetime() <= 0:
+            return None
+        meta_path, body_path = self._paths(entry.key)
+        self._write(body_path, body)
+        self._write_meta(meta_path, entry)
+        base = entry.key.partition("-")[0]
+        with self.lock:
+            if entry.key not in self._sizes:
+                self._variants[base] = self._variants.get(base, 0) + 1
+            self._total += entry.size - self._sizes.pop(entry.key, 0)
+            self._sizes[entry.key] = entry.size
+            # Lookups follow the latest Vary of the URL
+            self._vary_names[base] = list(variant)
+        self._evict()
+        return entry
+
+    def revalidated(
+        self, entry: CachedResponse, headers: Mapping[str, str]
+    ) -> CachedResponse:
+        """
+        The entry after the origin answered 304 Not Modified: the body is
+        kept and the new headers (and its age) replace the stored ones.
+        """
+        headers = {k.lower(): v for k, v in headers.items()}
+        entry.headers.update({k: headers[k] for k in _KEPT_HEADERS if k in headers})
+        if "age" not in headers:
+            entry.headers.pop("age", None)
+        entry.stored_at = time.time()
+        try:
+            self._write_meta(self._paths(entry.key)[0], entry)
+        except OSError:
+            pass
+        return entry
+
+    def _write(self, path: str, data: bytes) -> None:
+        # Written aside and moved in place, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _write_meta(self, path: str, entry: CachedResponse) -> None:
+        meta = {
+            "key": entry.key,
+            "url": entry.url,
+            "headers": entry.headers,
+            "encoding": entry.encoding,
+            "stored_at": entry.stored_at,
+            "size": entry.size,
+            "variant": entry.variant,
+        }
+        self._write(path, orjson.dumps(meta))
+
+    def _forget(self, key: str) -> None:
+        base = key.partition("-")[0]
+        with self.lock:
+            if key in self._sizes:
+                self._total -= self._sizes.pop(key)
+                self._variants[base] -= 1
+                if not self._variants[base]:
+                    del self._variants[base]
+                    self._vary_names.pop(base, None)
+        for path in self._paths(key):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        while True:
+            with self.lock:
+                if self._total <= self.max_bytes or not self._sizes:
+                    return
+                key = next(iter(self._sizes))
+            self._forget(key)
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return self._total
+
+    def clear(self) -> None:
+        with self.lock:
+            keys = list(self._sizes)
+        for key in keys:
+            self._forget(key)
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """
+    The page cache shared by all requests, opened on first use; None when
+    HTTP_CACHE_MAX_BYTES is 0.
+    """
+    global _cache
+    if HTTP_CACHE_MAX_BYTES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES)
+        return _cache
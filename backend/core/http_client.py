@@ -0,0 +1,158 @@
+import asyncio
+import importlib.util
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# Connections kept by the shared client across all hosts, and how many of
+# them may sit idle (keep-alive) waiting for the next request
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Requests in flight to one host at a time; 0 means no per-host limit
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "6"))
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# HTTP/2 needs the optional `h2` package (pip install httpx[http2]); without
+# it the client speaks HTTP/1.1
+HTTP2 = os.getenv("HTTP2", "0").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+# Host slots as [semaphore, users]: only hosts with a request in flight or
+# waiting have one, so the tables do not grow with every host ever fetched
+_host_slots: Dict[str, list] = {}
+_host_slots_lock = threading.Lock()
+
+# The async client and its host slots belong to the event loop that
+# created them
+_async_client: Optional[httpx.AsyncClient] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_host_slots: Dict[str, list] = {}
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> dict:
+    return dict(
+        follow_redirects=True,
+        http2=HTTP2 and http2_available(),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """
+    The HTTP client shared by all requests, created on first use.
+
+    Connections are pooled and kept alive between requests, so repeated
+    fetches from one host skip the TCP and TLS handshakes.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(**_client_options())
+        return _client
+
+
+def close_http_client() -> None:
+    """
+    Close the pooled connections; the next `get_http_client` starts a
+    fresh client.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+@contextmanager
+def host_slot(url: str):
+    """
+    Hold one of the HTTP_MAX_CONNECTIONS_PER_HOST request slots of the
+    host of `url` for the duration of the block.
+    """
+    if HTTP_MAX_CONNECTIONS_PER_HOST <= 0:
+        yield
+        return
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = [
+                threading.BoundedSemaphore(HTTP_MAX_CONNECTIONS_PER_HOST),
+                0,
+            ]
+        slot[1] += 1
+    try:
+        with slot[0]:
+            yield
+    finally:
+        with _host_slots_lock:
+            _release_slot(_host_slots, host, slot)
+
+
+def _release_slot(slots: Dict[str, list], host: str, slot: list) -> None:
+    # The last user of a host's slot drops it; a new one starts out free
+    slot[1] -= 1
+    if slot[1] == 0 and slots.get(host) is slot:
+        del slots[host]
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    The async counterpart of `get_http_client`, shared by the requests of
+    the running event loop. Async endpoints fetch through it, so a slow
+    page holds no thread while it downloads.
+    """
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_loop is not loop:
+        # A client left over from another (finished) loop cannot be reused
+        _async_client, _async_loop = httpx.AsyncClient(**_client_options()), loop
+        _async_host_slots.clear()
+    return _async_client
+
+
+async def aclose_http_client() -> None:
+    """Close the async client; the next `get_async_http_client` starts anew."""
+    global _async_client, _async_loop
+    client, _async_client, _async_loop = _async_client, None, None
+    _async_host_slots.clear()
+    if client is not None:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def async_host_slot(url: str):
+    """`host_slot` for coroutines: waits without blocking the event loop."""
+    if HTTP_MAX_CONNECTIONS_PER_HOST <= 0:
+        yield
+        return
+    host = urlsplit(url).netloc.lower()
+    # Only touched from the client's event loop, so no lock is needed
+    slots = _async_host_slots
+    slot = slots.get(host)
+    if slot is None:
+        slot = slots[host] = [asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST), 0]
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            yield
+    finally:
+        _release_slot(slots, host, slot)
@@ -0,0 +1,183 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+from core.document import ParsedDocument
+from core.jsonld import normalize_jsonld_items, parse_json_ld
+
+# JSON state larger than this is not decoded
+HYDRATION_MAX_BYTES = int(os.getenv("HYDRATION_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Record collections returned per page, largest first
+HYDRATION_MAX_TABLES = int(os.getenv("HYDRATION_MAX_TABLES", "5"))
+
+# Fewest records that make a collection a table
+HYDRATION_MIN_ROWS = int(os.getenv("HYDRATION_MIN_ROWS", "3"))
+
+# Share of a collection's records a key must appear in to count as one of
+# its columns, and the share of a list's items that must be records
+_COMMON_KEY_SHARE = 0.5
+_RECORD_SHARE = 0.8
+
+# `window.__INITIAL_STATE__ = {`, `self["__APOLLO_STATE__"] = [`, and the
+# same with `JSON.parse("...")` around the payload
+_ASSIGNMENT = re.compile(
+    r"""(?:window|self|globalThis)\s*
+        (?:\.\s*(?P<attr>[A-Za-z_$][\w$]*)|\[\s*["'](?P<key>[^"']+)["']\s*\])
+        \s*=\s*(?P<parse>JSON\.parse\(\s*)?(?=[\[{"])""",
+    re.VERBOSE,
+)
+
+_decoder = json.JSONDecoder()
+
+
+def _scripts(doc: ParsedDocument) -> Iterator[Tuple[dict, str]]:
+    """(attributes, text) of every <script> of the page."""
+    # Looked up in the page's index, which the classifier has already built,
+    # instead of another walk over the whole tree
+    index = doc.index
+    for script in index.elements(index.by_tag.get("script", [])):
+        if doc.is_lxml:
+            if script.text:
+                yield dict(script.attrib), script.text
+        elif script.string:
+            yield script.attrs, str(script.string)
+
+
+def _state_assignments(text: str) -> Iterator[Tuple[str, object]]:
+    for match in _ASSIGNMENT.finditer(text):
+        try:
+            data, _ = _decoder.raw_decode(text, match.end())
+            if match.group("parse"):
+                # JSON.parse takes the payload as a string literal
+                if not isinstance(data, str):
+                    continue
+                data = json.loads(data)
+        except ValueError:
+            # Not JSON: a JavaScript object literal or expression
+            continue
+        if isinstance(data, (dict, list)):
+            yield match.group("attr") or match.group("key"), data
+
+
+def find_state_blobs(source) -> List[Tuple[str, object]]:
+    """
+    Embedded application state of a page, as (source name, decoded data):
+    JSON <script> elements (Next.js __NEXT_DATA__ and the like, named by
+    their id) and JSON assigned to globals such as
+    `window.__INITIAL_STATE__`, `window.__APOLLO_STATE__` or
+    `window.__NUXT__`. Payloads that are not plain JSON are skipped.
+    """
+    doc = ParsedDocument.coerce(source)
+    blobs = []
+    for attrs, text in _scripts(doc):
+        if len(text) > HYDRATION_MAX_BYTES:
+            continue
+        script_type = (attrs.get("type") or "").lower()
+        if script_type == "application/json":
+            try:
+                data = parse_json_ld(text)
+            except ValueError:
+                continue
+            if isinstance(data, (dict, list)):
+                blobs.append((attrs.get("id") or "application/json", data))
+        elif script_type in ("", "text/javascript", "application/javascript"):
+            blobs.extend(_state_assignments(text))
+    return blobs
+
+
+def has_state_blob(source) -> bool:
+    """Whether the page may embed state for `find_state_blobs` (a cheap check)."""
+    for attrs, text in _scripts(ParsedDocument.coerce(source)):
+        script_type = (attrs.get("type") or "").lower()
+        if script_type == "application/json" or (
+            script_type in ("", "text/javascript", "application/javascript")
+            and _ASSIGNMENT.search(text)
+        ):
+            return True
+    return False
+
+
+def _collection(records: list) -> Optional[int]:
+    """Columns shared by most of `records`, or None when they are too few."""
+    if len(records) < HYDRATION_MIN_ROWS:
+        return None
+    counts = Counter(key for record in records for key in record)
+    common = sum(1 for n in counts.values() if n >= len(records) * _COMMON_KEY_SHARE)
+    return common if common >= 2 else None
+
+
+def _candidates(data) -> Iterator[Tuple[str, list, int]]:
+    """
+    (path, records, score) of every collection of similar records in
+    `data`: lists of objects, and objects whose values are objects (such
+    as normalized stores keyed by id, split by their "__typename"). Walks
+    with an explicit stack, so deep state cannot hit the recursion limit.
+    """
+    stack = [("", data)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, list):
+            records = [item for item in value if isinstance(item, dict)]
+            children = enumerate(value)
+            if records and len(records) >= len(value) * _RECORD_SHARE:
+                groups = {path: records}
+            else:
+                groups = {}
+            child_path = "{}[{}]"
+        elif isinstance(value, dict):
+            records = [item for item in value.values() if isinstance(item, dict)]
+            children = value.items()
+            groups = {}
+            if records and len(records) >= len(value) * _RECORD_SHARE:
+                for record in records:
+                    typename = record.get("__typename")
+                    name = f"{path}[{typename}]" if isinstance(typename, str) else path
+                    groups.setdefault(name, []).append(record)
+            child_path = "{}.{}" if path else "{1}"
+        else:
+            continue
+        for name, group in groups.items():
+            columns = _collection(group)
+            if columns is not None:
+                yield name, group, len(group) * columns
+        for key, child in children:
+            if isinstance(child, (dict, list)):
+                stack.append((child_path.format(path, key), child))
+
+
+def _within(path: str, parent: str) -> bool:
+    return path.startswith(parent + ".") or path.startswith(parent + "[")
+
+
+def hydration_tables(source, max_tables: Optional[int] = None) -> List[dict]:
+    """
+    The largest collections of similar records in a page's embedded state
+    (see `find_state_blobs`), as {"source", "path", "rows"} with one flat
+    row per record (see core.jsonld.normalize_jsonld_items). Collections
+    inside a record of a larger one are left out.
+    """
+    max_tables = HYDRATION_MAX_TABLES if max_tables is None else max_tables
+    doc = ParsedDocument.coerce(source)
+
+    def compute():
+        candidates = [
+            (score, name, path, records)
+            for name, data in find_state_blobs(doc)
+            for path, records, score in _candidates(data)
+        ]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        return candidates
+
+    tables = []
+    for _, name, path, records in doc.cached("hydration_candidates", compute):
+        if len(tables) >= max_tables:
+            break
+        if any(t["source"] == name and _within(path, t["path"]) for t in tables):
+            continue
+        rows = normalize_jsonld_items(records)
+        if len(rows) >= HYDRATION_MIN_ROWS:
+            tables.append({"source": name, "path": path, "rows": rows})
+    return tables
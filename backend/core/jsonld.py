@@ -0,0 +1,171 @@
+import json
+import os
+from typing import Iterable, List, Optional
+
+import orjson
+
+# Nested objects deeper than this are kept as one JSON string column
+# instead of being flattened further
+MAX_DEPTH = int(os.getenv("JSONLD_MAX_DEPTH", "6"))
+
+# Columns kept per normalized item; wider items keep their most useful
+# schema.org properties first (see SCHEMA_ORG_PRIORITY)
+MAX_COLUMNS = int(os.getenv("JSONLD_MAX_COLUMNS", "200"))
+
+# schema.org properties in the order they are kept when an item is too wide;
+# any other property comes after these
+SCHEMA_ORG_PRIORITY = (
+    "@type",
+    "name",
+    "url",
+    "item",
+    "position",
+    "sku",
+    "gtin13",
+    "brand",
+    "offers",
+    "aggregateRating",
+    "image",
+    "description",
+    "author",
+    "datePublished",
+    "address",
+)
+_PRIORITY = {name: rank for rank, name in enumerate(SCHEMA_ORG_PRIORITY)}
+
+
+def parse_json_ld(text: str):
+    """
+    Decode one JSON-LD payload with orjson, falling back to the standard
+    library for what orjson rejects but json accepts (such as NaN).
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+
+def flatten_dict(
+    d: dict, parent_key: str = "", sep: str = "_", max_depth: Optional[int] = None
+) -> dict:
+    """
+    Flatten nested objects into one level of `sep`-joined keys.
+
+    Lists of objects are flattened with their index in the key and other
+    lists are joined into one string. Objects nested more than `max_depth`
+    levels deep (MAX_DEPTH by default) are kept as their JSON text. Works
+    with an explicit stack, so deep payloads cannot hit the recursion limit.
+    """
+    max_depth = MAX_DEPTH if max_depth is None else max_depth
+    flat = {}
+    # Iterators over (key, value) pairs still to visit, with their depth
+    stack = [(iter(d.items()), parent_key, 0)]
+    while stack:
+        items, prefix, depth = stack[-1]
+        entry = next(items, None)
+        if entry is None:
+            stack.pop()
+            continue
+        k, v = entry
+        key = f"{prefix}{sep}{k}" if prefix else k
+        nested = isinstance(v, dict) or (
+            isinstance(v, list) and all(isinstance(i, dict) for i in v)
+        )
+        if nested and depth >= max_depth:
+            if v:
+                flat[key] = _json_text(v)
+        elif isinstance(v, dict):
+            stack.append((iter(v.items()), key, depth + 1))
+        elif nested:
+            # Each object of the list under its index
+            stack.append((iter(enumerate(v)), key, depth))
+        elif isinstance(v, list):
+            # Join list of primitives
+            flat[key] = ", ".join(str(i) for i in v)
+        else:
+            flat[key] = v
+    return flat
+
+
+def _json_text(value) -> Optional[str]:
+    try:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    except orjson.JSONEncodeError:
+        # Nested beyond what the encoder allows
+        return None
+
+
+def select_columns(
+    row: dict, max_columns: Optional[int] = None, sep: str = "_"
+) -> dict:
+    """
+    At most `max_columns` (MAX_COLUMNS by default) columns of a flattened
+    item: columns of the schema.org properties in SCHEMA_ORG_PRIORITY come
+    first, then shallower columns before deeper ones. Kept columns stay in
+    their original order.
+    """
+    max_columns = MAX_COLUMNS if max_columns is None else max_columns
+    if len(row) <= max_columns:
+        return row
+
+    def rank(entry):
+        position, key = entry
+        root = str(key).split(sep, 1)[0]
+        return (_PRIORITY.get(root, len(_PRIORITY)), str(key).count(sep), position)
+
+    keep = {key for _, key in sorted(enumerate(row), key=rank)[:max_columns]}
+    return {k: v for k, v in row.items() if k in keep}
+
+
+def flatten_jsonld_blocks(blocks):
+    for block in blocks:
+        if isinstance(block, dict):
+            yield block
+        elif isinstance(block, list):
+            for subblock in block:
+                if isinstance(subblock, dict):
+                    yield subblock
+
+
+def jsonld_items(blocks: Iterable) -> List[dict]:
+    """
+    The items of JSON-LD blocks, in one pass over them.
+
+    Every block stands for itself except ItemLists, which stand for their
+    list elements; the objects wrapped by ListItems follow after all of
+    those, in block order.
+    """
+    items = []
+    wrapped = []
+    for block in flatten_jsonld_blocks(blocks):
+        if block.get("@type") != "ItemList":
+            items.append(block)
+            continue
+        for item in block.get("itemListElement") or []:
+            if not isinstance(item, dict):
+                continue
+            inner = item.get("item") if "item" in item else None
+            if isinstance(inner, dict):
+                items.append(item)
+                wrapped.append(inner)
+            elif item.get("@type") != "ListItem" or "item" not in item:
+                items.append(item)
+    return items + wrapped
+
+
+def normalize_jsonld_items(
+    items: list, max_depth: Optional[int] = None, max_columns: Optional[int] = None
+) -> list:
+    """
+    One flat row per item (see `flatten_dict` and `select_columns`), leaving
+    out rows where every value is None, empty or '-'.
+    """
+    records = []
+    for itm in items:
+        if not isinstance(itm, dict):
+            continue
+        flat = select_columns(flatten_dict(itm, max_depth=max_depth), max_columns)
+        # Remove rows where all values are None, empty string, or '-'
+        if any(v not in (None, "", "-") for v in flat.values()):
+            records.append(flat)
+    return records
@@ -0,0 +1,155 @@
+"""
+lxml-native implementation of the tree-level extraction steps.
+
+Only the steps that touch the tree itself need an lxml variant: text and
+attribute access, subtree removal for pruning, and finding tables and
+JSON-LD with precompiled XPath expressions. Content classification and the
+grid strategies run on the backend-neutral `DomIndex`, tables on
+`core.table_parser`. Output is kept identical to the bs4 path:
+attribute values, text extraction and element order follow BeautifulSoup's
+rules so both backends can be swapped freely.
+"""
+
+from core.jsonld import parse_json_ld
+from typing import Iterable, List
+
+from lxml import etree
+
+# Attributes BeautifulSoup splits on whitespace (and the grid code re-joins)
+_LIST_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+
+# Tags whose strings BeautifulSoup keeps out of an ancestor's get_text()
+_STRING_CONTAINERS = {"script", "style", "template"}
+
+_X_TABLES = etree.XPath("//table")
+_X_JSON_LD = etree.XPath("//script[@type='application/ld+json']")
+
+
+# --- Element helpers ---
+
+
+def tables(root: etree._Element) -> List[etree._Element]:
+    """
+    Every <table> under `root`, nested ones included, in document order.
+    """
+    return _X_TABLES(root)
+
+
+def attribute_items(elem: etree._Element):
+    """
+    Attributes as BeautifulSoup exposes them once multi-valued ones are
+    joined back with single spaces.
+    """
+    list_attrs = _LIST_ATTRIBUTES["*"] | _LIST_ATTRIBUTES.get(elem.tag, set())
+    for attr, value in elem.attrib.items():
+        if attr in list_attrs:
+            value = " ".join(value.split())
+        yield attr, value
+
+
+def get_text(elem: etree._Element, strip: bool = True) -> str:
+    """
+    Equivalent of BeautifulSoup's `get_text(strip=strip)`.
+
+    Strings are stripped individually (if `strip`) and concatenated;
+    comments are skipped and text inside <script>/<style>/<template> only
+    counts when `elem` is that container itself.
+    """
+    context = None
+    for ancestor in elem.iterancestors(*_STRING_CONTAINERS):
+        context = ancestor.tag
+        break
+    target = elem.tag if elem.tag in _STRING_CONTAINERS else None
+
+    # Fast path: no container anywhere in play, let libxml2 walk the text
+    if (
+        context is None
+        and target is None
+        and next(elem.iterdescendants(*_STRING_CONTAINERS), None) is None
+    ):
+        if not strip:
+            return "".join(elem.itertext())
+        return "".join(part.strip() for part in elem.itertext())
+
+    parts = []
+    stack = [(elem, context)]
+    while stack:
+        node, context = stack.pop()
+        if isinstance(node, str):
+            if context == target:
+                parts.append(node.strip() if strip else node)
+            continue
+        if not isinstance(node.tag, str):
+            continue  # comments and processing instructions
+        if node.tag in _STRING_CONTAINERS:
+            context = node.tag
+        if node.text and context == target:
+            parts.append(node.text.strip() if strip else node.text)
+        for child in reversed(node):
+            if child.tail:
+                stack.append((child.tail, context))
+            stack.append((child, context))
+    return "".join(parts)
+
+
+def drop_element(elem: etree._Element) -> None:
+    """
+    Remove `elem` and its subtree, keeping the text that follows it.
+
+    The surrounding strings are glued so that stripping the merged string
+    gives the same result as stripping the two halves separately, which is
+    how BeautifulSoup sees them after `decompose()`.
+    """
+    parent = elem.getparent()
+    if parent is None:
+        return
+    tail = elem.tail
+    if tail:
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = _join_text(previous.tail, tail)
+        else:
+            parent.text = _join_text(parent.text, tail)
+    parent.remove(elem)
+
+
+def _join_text(left, right: str) -> str:
+    if not left:
+        return right
+    return left.rstrip() + right.lstrip()
+
+
+# --- JSON-LD and tables ---
+
+
+def extract_json_ld(root: etree._Element) -> list:
+    return json_ld_blocks(_X_JSON_LD(root))
+
+
+def json_ld_blocks(scripts: Iterable[etree._Element]) -> list:
+    """
+    Decoded payloads of JSON-LD <script> elements, skipping invalid ones.
+    """
+    blocks = []
+    for script in scripts:
+        # `.string` in bs4 is only set when the script holds a single string
+        if len(script):
+            continue
+        try:
+            if script.text:
+                blocks.append(parse_json_ld(script.text))
+        except Exception:
+            continue
+    return blocks
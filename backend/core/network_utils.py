@@ -1,8 +1,14 @@
+import asyncio
+import os
 import random
 import time
 import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from typing import Callable, Optional
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
 
 # --- User-Agent Spoofing ---
 
@@ -30,32 +36,84 @@ def get_random_user_agent(user_agents: Optional[list[str]] = None) -> str:
 
 # --- Rate Limiting ---
 
+# Requests per second to one host, and how many may go out in a burst
+HOST_RATE_LIMIT = float(os.getenv("HOST_RATE_LIMIT", "5"))
+HOST_RATE_BURST = float(os.getenv("HOST_RATE_BURST", "5"))
+
+# Hosts whose buckets are kept; the least recently used idle ones go first
+HOST_RATE_MAX_HOSTS = int(os.getenv("HOST_RATE_MAX_HOSTS", "1024"))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`.
+
+    `reserve()` takes a token and returns how long the caller must wait
+    before using it; the bucket may go into debt, so waiting happens after
+    the lock is released and later callers queue up behind earlier ones.
+    Bookkeeping is O(1) per call. `block_for(seconds)` holds every
+    reservation back until then (e.g. for a server's Retry-After): nothing
+    refills meanwhile and the refill restarts at the end of the block with
+    at most one token, so queued callers go out one by one again.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        # Time the tokens were counted at; in the future while blocked
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if now > self.updated:
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+            self.tokens -= 1
+            debt = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(self.updated - now + debt, 0.0)
+
+    def idle(self) -> bool:
+        """Whether the bucket is full and not blocked, like a new one."""
+        with self.lock:
+            elapsed = time.monotonic() - self.updated
+            return elapsed >= 0 and self.tokens + elapsed * self.rate >= self.capacity
+
+    def block_for(self, seconds: float) -> None:
+        with self.lock:
+            until = time.monotonic() + seconds
+            if until > self.updated:
+                self.tokens = min(self.tokens, 1.0)
+                self.updated = until
+
 
 class SimpleRateLimiter:
     """
-    Thread-safe, in-memory rate limiter (per process).
+    Thread-safe, in-memory rate limiter (per process): at most `max_calls`
+    per `period` on average, in bursts of up to `max_calls`.
     Usage: limiter = SimpleRateLimiter(max_calls=5, period=1.0)
-           limiter.acquire()
+           limiter.acquire()  # or: await limiter.acquire_async()
     """
 
     def __init__(self, max_calls: int, period: float):
         self.max_calls = max_calls
         self.period = period
-        self.lock = threading.Lock()
-        self.calls = []  # timestamps
+        self.bucket = TokenBucket(max_calls / period, max_calls)
 
     def acquire(self):
-        with self.lock:
-            now = time.monotonic()
-            # Remove old calls
-            self.calls = [t for t in self.calls if now - t < self.period]
-            if len(self.calls) >= self.max_calls:
-                sleep_time = self.period - (now - self.calls[0])
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                now = time.monotonic()
-                self.calls = [t for t in self.calls if now - t < self.period]
-            self.calls.append(time.monotonic())
+        # Sleep outside the lock, so other callers can take their turn
+        wait = self.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
 
     def __call__(self, func: Callable):
         @wraps(func)
@@ -66,6 +124,122 @@ class SimpleRateLimiter:
         return wrapper
 
 
+def host_key(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header (delay in seconds or an HTTP
+    date), or None when it is missing or unreadable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class HostRateLimiter:
+    """
+    A token bucket per host: at most `rate` requests per second to each
+    host, in bursts of up to `burst`, so throttling one site never slows
+    down requests to the others.
+
+    Call `acquire(url)` (or `await acquire_async(url)`) before a request
+    and `observe(url, status, retry_after)` with its response: a 429 or 503
+    holds that host back for its Retry-After, or for a backoff that doubles
+    with every throttled response in a row (from `backoff`); either way for
+    at most `max_backoff` seconds.
+
+    Buckets of up to `max_hosts` hosts are kept. Beyond that the least
+    recently used ones are dropped, but only once they are idle (see
+    `TokenBucket.idle`), so no host loses its place in the queue or its
+    backoff.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_hosts: int = HOST_RATE_MAX_HOSTS,
+    ):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_hosts = max_hosts
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._throttled: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = host_key(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+                self._evict()
+            else:
+                self._buckets.move_to_end(host)
+            return bucket
+
+    def _evict(self) -> None:
+        # Called with the lock held, right after a bucket was added at the
+        # back. Busy buckets met on the way are moved behind it, so they are
+        # not looked at again by the next calls; the new one never is.
+        excess = len(self._buckets) - self.max_hosts
+        for _ in range(len(self._buckets) - 1):
+            if excess <= 0:
+                return
+            host, bucket = next(iter(self._buckets.items()))
+            if bucket.idle():
+                del self._buckets[host]
+                self._throttled.pop(host, None)
+                excess -= 1
+            else:
+                self._buckets.move_to_end(host)
+
+    def acquire(self, url: str) -> None:
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str) -> None:
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, url: str, status: int, retry_after: Optional[str] = None) -> None:
+        host = host_key(url)
+        if status not in (429, 503):
+            if self._throttled:
+                with self._lock:
+                    self._throttled.pop(host, None)
+            return
+        with self._lock:
+            streak = self._throttled.get(host, 0)
+            self._throttled[host] = streak + 1
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.backoff * 2**streak
+        self.bucket(url).block_for(min(delay, self.max_backoff))
+
+
+# Shared by every fetcher, plain HTTP and the browser alike, so each host
+# sees one request rate whichever way its pages are fetched
+host_rate_limiter = HostRateLimiter(HOST_RATE_LIMIT, HOST_RATE_BURST)
+
+
 # --- Decorator for FastAPI endpoints (optional, for future expansion) ---
 # Example usage:
 # @rate_limit_endpoint(max_calls=10, period=60)
@@ -78,7 +252,8 @@ def rate_limit_endpoint(max_calls: int, period: float):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            limiter.acquire()
+            # Wait without blocking the event loop
+            await limiter.acquire_async()
             return await func(*args, **kwargs)
 
         return wrapper
@@ -0,0 +1,181 @@
+import os
+from typing import Iterable, Optional
+
+import soupsieve
+from bs4 import BeautifulSoup
+from bs4.builder import LXMLTreeBuilder
+from lxml import etree
+
+from core import lxml_engine
+
+# Blocks that never hold the content we extract
+UNWANTED_CLASSES = [
+    "footer",
+    "header",
+    "nav",
+    "advertisement",
+    "ad",
+    "popup",
+    "modal",
+    "subscribe",
+    "newsletter",
+]
+
+
+class PruneRules:
+    """
+    Precompiled set of blocks to drop from a page: elements carrying one of
+    `classes` as a class token, one of the `tags` or one of the `ids`.
+
+    The rules are compiled once into a CSS selector list for BeautifulSoup
+    trees and an XPath pre-filter for lxml trees, and are checked per start
+    tag by `PruningTreeBuilder` so matching subtrees are never built.
+    """
+
+    def __init__(
+        self,
+        classes: Iterable[str] = (),
+        tags: Iterable[str] = (),
+        ids: Iterable[str] = (),
+    ):
+        self.classes = frozenset(c for c in classes if c)
+        self.tags = frozenset(t.lower() for t in tags if t)
+        self.ids = frozenset(i for i in ids if i)
+
+        selectors = (
+            [f".{soupsieve.escape(c)}" for c in sorted(self.classes)]
+            + sorted(self.tags)
+            + [f"#{soupsieve.escape(i)}" for i in sorted(self.ids)]
+        )
+        self._selector = soupsieve.compile(", ".join(selectors)) if selectors else None
+
+        # Substring tests only narrow the candidates; tokens are checked in
+        # Python. Values are bound as XPath variables so no quoting is needed,
+        # and the [@class]/[@id] steps keep libxml2 from testing every element.
+        self._variables = {}
+        paths = []
+        conditions = []
+        for n, name in enumerate(sorted(self.classes)):
+            self._variables[f"c{n}"] = name
+            conditions.append(f"contains(@class, $c{n})")
+        if conditions:
+            paths.append(f"//*[@class][{' or '.join(conditions)}]")
+        conditions = []
+        for n, name in enumerate(sorted(self.ids)):
+            self._variables[f"i{n}"] = name
+            conditions.append(f"@id = $i{n}")
+        if conditions:
+            paths.append(f"//*[@id][{' or '.join(conditions)}]")
+        paths += [f"//{tag}" for tag in sorted(self.tags)]
+        self._xpath = etree.XPath(" | ".join(paths)) if paths else None
+
+    def __bool__(self) -> bool:
+        return self._selector is not None
+
+    def matches(self, tag: str, class_value: Optional[str], id_value: Optional[str]) -> bool:
+        """
+        Whether an element with this tag and raw class/id attributes is pruned.
+        """
+        if tag in self.tags or (id_value is not None and id_value in self.ids):
+            return True
+        return bool(class_value) and not self.classes.isdisjoint(class_value.split())
+
+    def covers(self, elem: etree._Element) -> bool:
+        """
+        Whether an lxml element or one of its ancestors is pruned.
+        """
+        for node in elem.iterancestors():
+            if self.matches(node.tag, node.get("class"), node.get("id")):
+                return True
+        return self.matches(elem.tag, elem.get("class"), elem.get("id"))
+
+    def prune_soup(self, soup: BeautifulSoup) -> BeautifulSoup:
+        """
+        Drop matching subtrees from an already-built BeautifulSoup tree.
+        """
+        if self._selector is not None:
+            for tag in self._selector.select(soup):
+                if not tag.decomposed:
+                    tag.decompose()
+        return soup
+
+    def prune_lxml(self, root: etree._Element) -> etree._Element:
+        """
+        Drop matching subtrees from an lxml tree in one precompiled pass.
+        """
+        if self._xpath is None:
+            return root
+        removed = set()
+        for elem in self._xpath(root, **self._variables):
+            if not self.matches(elem.tag, elem.get("class"), elem.get("id")):
+                continue
+            # Skip matches nested in a subtree that is already gone
+            if any(id(ancestor) in removed for ancestor in elem.iterancestors()):
+                continue
+            removed.add(id(elem))
+            lxml_engine.drop_element(elem)
+        return root
+
+
+class PruningTreeBuilder(LXMLTreeBuilder):
+    """
+    BeautifulSoup's lxml HTML builder, minus the subtrees matched by `rules`.
+
+    Matching start tags and everything up to their end tag are dropped
+    before BeautifulSoup sees them, so those nodes are never allocated. The
+    text around a dropped subtree is kept as two separate strings, exactly
+    as if the subtree had been built and decomposed.
+    """
+
+    def __init__(self, rules: PruneRules, **kwargs):
+        super().__init__(**kwargs)
+        self.rules = rules
+        self._skipping = 0
+
+    def feed(self, markup):
+        self._skipping = 0
+        super().feed(markup)
+
+    def start(self, name, attrs, nsmap={}):
+        if self._skipping:
+            self._skipping += 1
+            return
+        if self.rules.matches(name, attrs.get("class"), attrs.get("id")):
+            self.soup.endData()
+            self._skipping = 1
+            return
+        super().start(name, attrs, nsmap)
+
+    def end(self, name):
+        if self._skipping:
+            self._skipping -= 1
+            return
+        super().end(name)
+
+    def data(self, content):
+        if not self._skipping:
+            super().data(content)
+
+    def comment(self, content):
+        if not self._skipping:
+            super().comment(content)
+
+    def pi(self, target, data):
+        if not self._skipping:
+            super().pi(target, data)
+
+
+def _env_list(name: str, default: list) -> list:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Rules used by the extraction pipeline; PRUNE_CLASSES, PRUNE_TAGS and
+# PRUNE_IDS (comma-separated) replace the defaults
+DEFAULT_PRUNE_RULES = PruneRules(
+    classes=_env_list("PRUNE_CLASSES", UNWANTED_CLASSES),
+    tags=_env_list("PRUNE_TAGS", []),
+    ids=_env_list("PRUNE_IDS", []),
+)
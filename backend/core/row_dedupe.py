@@ -0,0 +1,132 @@
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Rows whose SimHash fingerprints agree on at least this share of their
+# bits are near-duplicates. Off by default (1 keeps every row that is not
+# an exact duplicate): rows differing only in a price are that similar
+SIMILARITY_THRESHOLD = float(os.getenv("ROW_SIMILARITY_THRESHOLD", "1"))
+
+FINGERPRINT_BITS = 64
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def row_tokens(row: dict) -> List[str]:
+    """
+    Normalized words of the filled-in values of a row.
+
+    Column names are left out, so the same item extracted by two
+    strategies with different column naming or spacing gives the same
+    tokens. Values keep their order.
+    """
+    return [
+        word
+        for value in row.values()
+        if value
+        for word in str(value).casefold().split()
+    ]
+
+
+def exact_fingerprint(tokens: List[str]) -> int:
+    """
+    64-bit hash of a row's tokens in order, so rows whose values are
+    permutations of each other ("Arsenal", "Chelsea" and "Chelsea",
+    "Arsenal") stay apart.
+    """
+    return _hash64("\x1f".join(tokens))
+
+
+def simhash(tokens: List[str]) -> int:
+    """
+    64-bit SimHash of a row's tokens: rows that share most of their tokens
+    get fingerprints that differ in few bits.
+    """
+    weights = [0] * FINGERPRINT_BITS
+    for token in tokens:
+        h = _hash64(token)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+class _NearDuplicateIndex:
+    """
+    SimHash fingerprints of the rows kept so far, bucketed by bands.
+
+    Two fingerprints at most `max_distance` bits apart agree exactly on at
+    least one of `max_distance + 1` bands, so only rows sharing a band are
+    compared.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [
+            (i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+            for i in range(bands)
+        ]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+
+    def _keys(self, fingerprint: int):
+        for start, end in self._bands:
+            yield fingerprint >> start & ((1 << (end - start)) - 1)
+
+    def find(self, fingerprint: int) -> bool:
+        for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+            for other in buckets.get(key, ()):
+                if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, fingerprint: int) -> None:
+        for buckets, key in zip(self._buckets, self._keys(fingerprint)):
+            buckets.setdefault(key, []).append(fingerprint)
+
+
+def dedupe_rows(
+    rows: List[dict], threshold: Optional[float] = None
+) -> Tuple[List[dict], dict]:
+    """
+    Drop repeated rows, keeping the first of each.
+
+    Rows with the same normalized values (see `row_tokens`) are exact
+    duplicates. With a `threshold` below 1, rows whose SimHash similarity
+    reaches it are dropped as near-duplicates as well. Only fixed-size
+    fingerprints of the kept rows are held, not their text.
+
+    Returns:
+        The kept rows, and a report with the threshold and the number of
+        exact and near duplicates dropped
+    """
+    threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+    max_distance = int((1 - threshold) * FINGERPRINT_BITS)
+    near = _NearDuplicateIndex(max_distance) if max_distance > 0 else None
+
+    seen = set()
+    kept = []
+    exact_duplicates = near_duplicates = 0
+    for row in rows:
+        tokens = row_tokens(row)
+        fingerprint = exact_fingerprint(tokens)
+        if fingerprint in seen:
+            exact_duplicates += 1
+            continue
+        if near is not None and tokens:
+            sim = simhash(tokens)
+            if near.find(sim):
+                near_duplicates += 1
+                continue
+            near.add(sim)
+        seen.add(fingerprint)
+        kept.append(row)
+
+    report = {
+        "threshold": threshold,
+        "exact_duplicates": exact_duplicates,
+        "near_duplicates": near_duplicates,
+    }
+    return kept, report
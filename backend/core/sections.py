@@ -0,0 +1,33 @@
+from typing import Iterable, Optional
+
+# Top-level fields of the extraction result, in response order
+RESULT_SECTIONS = (
+    "tables",
+    "json_ld",
+    "normalized_jsonld",
+    "state_tables",
+    "article",
+    "listings",
+    "universal_grid",
+    "column_mappings",
+    "normalized_grid",
+    "advanced_grid",
+    "lenient_grid",
+    "grid_strategies",
+    "raw_html",
+)
+
+
+def resolve_sections(
+    include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None
+) -> frozenset:
+    """
+    Sections a caller asked for: `include` (every section when None) minus
+    `exclude`. Raises ValueError on unknown section names.
+    """
+    include = set(RESULT_SECTIONS if include is None else include)
+    exclude = set(exclude or ())
+    unknown = (include | exclude).difference(RESULT_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown result sections: {', '.join(sorted(unknown))}")
+    return frozenset(include - exclude)
@@ -0,0 +1,24 @@
+import orjson
+import pandas as pd
+
+# numpy arrays and scalars are encoded natively; NaN and infinite floats
+# become null
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    # Whatever orjson cannot encode on its own: pandas missing values (NaT,
+    # NA) become null like NaN does, anything else its string form
+    if pd.isna(obj) is True:
+        return None
+    return str(obj)
+
+
+def dumps_json(obj) -> bytes:
+    """
+    Encode an extraction result as JSON in a single pass.
+
+    NaN and infinities are written as null on the way, so results need no
+    separate cleaning walk before they are sent.
+    """
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
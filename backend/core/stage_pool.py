@@ -0,0 +1,49 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Worker processes for running extraction stages in parallel; 0 keeps every
+# stage in the request thread
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0"))
+
+# Smaller pages are extracted in-process: shipping the page to the workers
+# and re-parsing it there costs more than the stages themselves
+PARALLEL_MIN_BYTES = int(os.getenv("PARALLEL_MIN_BYTES", str(256 * 1024)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    The process pool shared by all requests, started on first use with
+    `workers` processes (EXTRACTION_WORKERS, or one per CPU when unset).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = workers or EXTRACTION_WORKERS or os.cpu_count() or 1
+            # Workers are spawned rather than forked: the server's threads
+            # may hold locks at fork time
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """
+    Stop the worker processes; the next `get_pool` starts a fresh pool.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,111 @@
+import codecs
+import os
+from typing import Callable, List, Optional, Tuple
+
+import lxml.html
+from lxml import etree
+
+from core import lxml_engine
+from core.document import ParsedDocument
+from core.pruning import PruneRules
+from core.table_parser import parse_table
+
+# Largest response body read in streaming mode; the rest is dropped
+DEFAULT_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(10 * 1024 * 1024)))
+
+JSON_LD_TYPE = "application/ld+json"
+
+
+class StreamingParser:
+    """
+    Incremental lxml parse of a page while its body is still downloading.
+
+    Chunks are decoded and fed to an `HTMLPullParser` as they arrive, so the
+    tree is ready as soon as the last byte is in. Structured content is
+    reported early through `on_event`: a ("json_ld", block) event when a
+    JSON-LD <script> closes and a ("table", DataFrame) event when a <table>
+    closes, long before the page is complete; elements inside blocks matched
+    by `prune` are not reported, and those blocks are dropped from the
+    finished tree. Without `on_event` nothing is parsed early, so the
+    tables are only read once, by the extraction that follows. Bodies
+    larger than `max_bytes` are cut off and the page is marked `truncated`.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        encoding: str = "utf-8",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        on_event: Optional[Callable[[str, object], None]] = None,
+        prune: Optional[PruneRules] = None,
+    ):
+        self.url = url
+        self.max_bytes = max_bytes
+        self.on_event = on_event
+        self.prune = prune
+        self.bytes_read = 0
+        self.truncated = False
+        self.events: List[Tuple[str, object]] = []
+        self._chunks: List[str] = []
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        if on_event is not None:
+            self._parser = etree.HTMLPullParser(
+                events=("end",), tag=("script", "table")
+            )
+        else:
+            self._parser = etree.HTMLPullParser(events=())
+        # Same element classes as lxml.html.document_fromstring
+        self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Parse the next chunk of the response body.
+        """
+        if self.truncated:
+            return
+        room = self.max_bytes - self.bytes_read
+        if len(chunk) >= room:
+            chunk = chunk[:room]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        self._push(self._decoder.decode(chunk))
+
+    def close(self) -> ParsedDocument:
+        """
+        Finish parsing and return the page as an lxml ParsedDocument.
+        """
+        self._push(self._decoder.decode(b"", final=True))
+        try:
+            root = self._parser.close()
+        except etree.XMLSyntaxError:
+            root = None  # Empty document
+        self._collect()
+        if root is None:
+            root = lxml.html.Element("html")
+        return ParsedDocument(
+            "".join(self._chunks), url=self.url, tree=root, prune=self.prune
+        )
+
+    def _push(self, text: str) -> None:
+        if text:
+            self._chunks.append(text)
+            self._parser.feed(text)
+            self._collect()
+
+    def _collect(self) -> None:
+        if self.on_event is None:
+            return
+        for _, elem in self._parser.read_events():
+            if self.prune and self.prune.covers(elem):
+                continue
+            if elem.tag == "table":
+                df = parse_table(elem)
+                if df is not None:
+                    self._emit("table", df)
+            elif elem.get("type") == JSON_LD_TYPE:
+                for block in lxml_engine.json_ld_blocks([elem]):
+                    self._emit("json_ld", block)
+
+    def _emit(self, kind: str, payload) -> None:
+        self.events.append((kind, payload))
+        self.on_event(kind, payload)
@@ -1,6 +1,8 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 import numpy as np
+from core.document import ParsedDocument
+from core import lxml_engine
+from core.table_parser import parse_table
 
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -9,33 +11,16 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def extract_tables(soup: BeautifulSoup) -> list[pd.DataFrame]:
-    tables = soup.find_all("table")
+def extract_tables(source) -> list[pd.DataFrame]:
+    doc = ParsedDocument.coerce(source)
+    if doc.is_lxml:
+        tables = lxml_engine.tables(doc.tree)
+    else:
+        tables = doc.soup.find_all("table")
     dfs = []
     for table in tables:
-        # Try pandas.read_html first
-        try:
-            df = pd.read_html(str(table))[0]
-            df = clean_dataframe(df)
-            dfs.append(df)
-            continue
-        except Exception:
-            pass  # Fallback to manual extraction below
-
-        # Fallback: manual extraction if read_html fails
-        rows = []
-        for tr in table.find_all("tr"):
-            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
-            if cells:
-                rows.append(cells)
-        if rows:
-            # Use first row as header if it looks like a header (all th or first row only)
-            headers = [cell for cell in rows[0]]
-            data_rows = rows[1:] if len(rows) > 1 else []
-            try:
-                df = pd.DataFrame(data_rows, columns=headers)
-            except Exception:
-                df = pd.DataFrame(rows)
-            df = clean_dataframe(df)
-            dfs.append(df)
+        # Read the parsed table directly instead of re-parsing it with pd.read_html
+        df = parse_table(table)
+        if df is not None:
+            dfs.append(clean_dataframe(df))
     return dfs
@@ -0,0 +1,151 @@
+import base64
+import io
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from core.field_normalizer import normalize_field_name, normalize_fields
+
+# How tables and grids are laid out in the result:
+#   records   list of row dicts (the default)
+#   columnar  {"columns": [names], "data": [one value array per column]}
+#   arrow     base64-encoded Apache Arrow IPC stream, one per table
+TABLE_FORMATS = ("records", "columnar", "arrow")
+
+# Media types a client can list in its Accept header instead of naming the
+# format in the request body. Responses stay JSON either way, so Arrow
+# tables are asked for as JSON too: a bare Arrow stream is not offered
+ACCEPT_TABLE_FORMATS = {
+    "application/vnd.sift.arrow+json": "arrow",
+    "application/vnd.sift.columnar+json": "columnar",
+}
+
+# Accept media ranges a JSON response satisfies
+JSON_MEDIA_TYPES = frozenset(
+    {"application/json", "application/*", "*/*", *ACCEPT_TABLE_FORMATS}
+)
+
+# Result sections made of row lists, which follow the table format
+ROW_SECTIONS = (
+    "normalized_jsonld",
+    "listings",
+    "universal_grid",
+    "normalized_grid",
+    "advanced_grid",
+    "lenient_grid",
+)
+
+
+def _accepted(accept: Optional[str]) -> list:
+    """Media ranges of an Accept header, in order, without those with q=0."""
+    media_types = []
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if not media_type:
+            continue
+        q = next((p[2:] for p in params if p.lower().startswith("q=")), "1")
+        try:
+            if float(q) <= 0:
+                continue
+        except ValueError:
+            pass
+        media_types.append(media_type.lower())
+    return media_types
+
+
+def negotiate_table_format(accept: Optional[str]) -> str:
+    """
+    Table format for an Accept header: the first listed media type that
+    maps to one, and records otherwise.
+    """
+    for media_type in _accepted(accept):
+        if media_type in ACCEPT_TABLE_FORMATS:
+            return ACCEPT_TABLE_FORMATS[media_type]
+    return "records"
+
+
+def accepts(accept: Optional[str], media_types: Iterable[str]) -> bool:
+    """
+    Whether a response of one of `media_types` satisfies an Accept header;
+    a missing or empty header accepts anything.
+    """
+    if not (accept or "").strip():
+        return True
+    return not set(_accepted(accept)).isdisjoint(media_types)
+
+
+def frame_to_table(df: pd.DataFrame, table_format: str = "records"):
+    """
+    An extracted DataFrame in `table_format`, with field names normalized.
+
+    Columnar and Arrow output read the columns straight from the frame
+    instead of building a dict per row.
+    """
+    if table_format == "records":
+        return normalize_fields(df.to_dict(orient="records"))
+    # Like in a row dict, a name seen twice keeps its first position and
+    # the values of its last column
+    positions = {}
+    arrays = []
+    for i, column in enumerate(df.columns):
+        name = normalize_field_name(column)
+        values = df.iloc[:, i].tolist()
+        if name in positions:
+            arrays[positions[name]] = values
+        else:
+            positions[name] = len(arrays)
+            arrays.append(values)
+    return _pack(list(positions), arrays, len(df), table_format)
+
+
+def records_to_table(records: list, table_format: str = "records"):
+    """
+    Row dicts in `table_format`. Columns are every key in order of first
+    appearance; rows without a key get None for it.
+    """
+    if table_format == "records":
+        return records
+    names = list(dict.fromkeys(key for row in records for key in row))
+    arrays = [[row.get(name) for row in records] for name in names]
+    return _pack(names, arrays, len(records), table_format)
+
+
+def format_row_sections(result: dict, table_format: str) -> dict:
+    """Lay out the row-list sections of `result` in `table_format`."""
+    if table_format != "records":
+        for key in ROW_SECTIONS:
+            if key in result:
+                result[key] = records_to_table(result[key], table_format)
+    return result
+
+
+def _pack(names: list, arrays: list, rows: int, table_format: str):
+    if table_format == "columnar":
+        return {"columns": names, "rows": rows, "data": arrays}
+    if table_format == "arrow":
+        return base64.b64encode(_arrow_stream(names, arrays)).decode("ascii")
+    raise ValueError(f"Unknown table format: {table_format}")
+
+
+def _arrow_array(values: Iterable):
+    import pyarrow as pa
+
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed value types: keep every cell as text
+        return pa.array(
+            [None if pd.isna(v) is True else str(v) for v in values], pa.string()
+        )
+
+
+def _arrow_stream(names: list, arrays: list) -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_arrays(
+        [_arrow_array(values) for values in arrays], names=[str(n) for n in names]
+    )
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
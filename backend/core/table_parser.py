@@ -0,0 +1,305 @@
+"""
+Native HTML table parser.
+
+Reads an already-parsed <table> element (BeautifulSoup or lxml) straight
+into column arrays, instead of serializing every table and handing it to
+`pd.read_html`, which re-parses the markup and builds a throwaway list of
+DataFrames per table. Only one DataFrame is built per table, at the end.
+
+The layout follows `pd.read_html`: rows come from the table's own
+<thead>/<tbody>/<tfoot> sections (never from nested tables), rowspan and
+colspan cells are repeated across the cells they cover, leading all-<th>
+rows act as the header when there is no <thead>, and numeric columns are
+inferred with "," as the thousands separator. Multi-row headers are
+flattened into "Group Column" strings so columns are always plain strings.
+"""
+
+import re
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from bs4 import CData, NavigableString, Tag
+from lxml import etree
+
+from core import lxml_engine
+
+# Spans beyond these are clamped, as browsers do
+_MAX_COLSPAN = 1000
+_MAX_ROWSPAN = 65534
+
+_LEADING_INT = re.compile(r"\s*(\d+)")
+_HIDDEN = re.compile(r"display:\s*none", re.IGNORECASE)
+_INTEGER = re.compile(r"[+-]?(?:\d+|\d{1,3}(?:,\d{3})+)")
+_FLOAT = re.compile(
+    r"[+-]?(?:(?:\d+|\d{1,3}(?:,\d{3})+)(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?"
+    r"|[+-]?(?:inf|Infinity)",
+    re.IGNORECASE,
+)
+
+# Cell texts read as missing values, as in pandas' default na_values
+NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+_TRUE_VALUES = {"True", "TRUE", "true"}
+_FALSE_VALUES = {"False", "FALSE", "false"}
+
+# String kinds get_text() keeps, and tags whose text it leaves out
+_PLAIN_STRINGS = (NavigableString, CData)
+_STRING_CONTAINERS = {"script", "style", "template"}
+
+
+# --- Element access, for both tree types ---
+
+
+def _name(elem) -> str:
+    return elem.name if isinstance(elem, Tag) else elem.tag
+
+
+def _children(elem) -> list:
+    if isinstance(elem, Tag):
+        return [child for child in elem.children if isinstance(child, Tag)]
+    return list(elem.iterchildren(etree.Element))
+
+
+def _is_hidden(elem) -> bool:
+    style = elem.get("style")
+    return style is not None and _HIDDEN.search(style) is not None
+
+
+def _span(elem, attr: str, limit: int) -> int:
+    value = elem.get(attr)
+    if value is None:
+        return 1
+    match = _LEADING_INT.match(value)
+    if not match:
+        return 1
+    return min(max(int(match.group(1)), 1), limit)
+
+
+def _cell_text(cell) -> str:
+    # A <br> separates words, as in pd.read_html ("line1<br>line2" reads
+    # "line1 line2"); otherwise the text is get_text()'s
+    if isinstance(cell, Tag):
+        text = "".join(
+            node
+            if type(node) in _PLAIN_STRINGS
+            else " " if isinstance(node, Tag) and node.name == "br" else ""
+            for node in cell.descendants
+        )
+    elif next(cell.iter("br"), None) is None:
+        text = lxml_engine.get_text(cell, strip=False)
+    else:
+        text = _lxml_text_with_breaks(cell)
+    return " ".join(text.split())
+
+
+def _lxml_text_with_breaks(cell) -> str:
+    parts = []
+    stack = [cell]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if node.tag == "br":
+            parts.append(" ")
+        elif node.text:
+            parts.append(node.text)
+        for child in reversed(node):
+            if child.tail:
+                stack.append(child.tail)
+            # Comments and script/style/template text are left out
+            if isinstance(child.tag, str) and child.tag not in _STRING_CONTAINERS:
+                stack.append(child)
+    return "".join(parts)
+
+
+# --- Layout ---
+
+
+def _section_rows(table) -> tuple:
+    """
+    Visible <tr> elements of `table` split into header and body rows.
+    """
+    head, body, foot = [], [], []
+    for child in _children(table):
+        name = _name(child)
+        if name == "tr":
+            body.append(child)
+        elif name in ("thead", "tbody", "tfoot") and not _is_hidden(child):
+            target = head if name == "thead" else foot if name == "tfoot" else body
+            target.extend(row for row in _children(child) if _name(row) == "tr")
+
+    head = [row for row in head if not _is_hidden(row)]
+    body = [row for row in body + foot if not _is_hidden(row)]
+    if not head:
+        # Without a <thead>, leading rows made only of <th> cells are the header
+        while body:
+            cells = _row_cells(body[0])
+            if not cells or any(_name(cell) != "th" for cell in cells):
+                break
+            head.append(body.pop(0))
+    return head, body
+
+
+def _row_cells(row) -> list:
+    return [
+        cell
+        for cell in _children(row)
+        if _name(cell) in ("td", "th") and not _is_hidden(cell)
+    ]
+
+
+def _expand_spans(rows: list) -> List[List[str]]:
+    """
+    Lay out the cells of `rows` on a grid, repeating each cell's text over
+    every slot its rowspan/colspan covers. Rows left without any cell are
+    skipped, except those that only exist to hold an earlier rowspan.
+    """
+    grid = []
+    pending = {}  # column -> (text, rows still covered)
+    for row in rows:
+        cells = _row_cells(row)
+        if not cells and not pending:
+            continue
+        texts = []
+        carried = {}
+
+        def fill_pending():
+            while len(texts) in pending:
+                text, remaining = pending.pop(len(texts))
+                if remaining > 1:
+                    carried[len(texts)] = (text, remaining - 1)
+                texts.append(text)
+
+        for cell in cells:
+            fill_pending()
+            text = _cell_text(cell)
+            rowspan = _span(cell, "rowspan", _MAX_ROWSPAN)
+            for _ in range(_span(cell, "colspan", _MAX_COLSPAN)):
+                if rowspan > 1:
+                    carried[len(texts)] = (text, rowspan - 1)
+                texts.append(text)
+        fill_pending()
+
+        # Cells still spanning from above beyond the end of this row
+        for column in sorted(pending):
+            text, remaining = pending[column]
+            if remaining > 1:
+                carried[len(texts)] = (text, remaining - 1)
+            texts.append(text)
+        pending = carried
+        grid.append(texts)
+
+    # Rows that only exist because of a rowspan reaching past the last <tr>
+    while pending:
+        texts = []
+        carried = {}
+        for column in sorted(pending):
+            text, remaining = pending[column]
+            if remaining > 1:
+                carried[len(texts)] = (text, remaining - 1)
+            texts.append(text)
+        pending = carried
+        grid.append(texts)
+    return grid
+
+
+def _column_names(header: List[List[str]], width: int) -> List[str]:
+    """
+    One flat, unique name per column. Multi-row headers are joined with
+    spaces (repeated group labels collapse), blank headers become
+    "Unnamed: i" and duplicates get ".1", ".2" suffixes.
+    """
+    if not header:
+        return [str(i) for i in range(width)]
+
+    names = []
+    for i in range(width):
+        parts = []
+        for row in header:
+            text = row[i] if i < len(row) else ""
+            if text and (not parts or parts[-1] != text):
+                parts.append(text)
+        names.append(" ".join(parts) or f"Unnamed: {i}")
+
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        candidate = name
+        while candidate in seen:
+            count += 1
+            candidate = f"{name}.{count}"
+        seen[name] = count
+        seen[candidate] = 0
+        unique.append(candidate)
+    return unique
+
+
+def _convert_column(values: List[Optional[str]]):
+    """
+    Turn a column of cell texts into integers, floats or booleans when every
+    non-missing value parses as one, keeping strings otherwise.
+    """
+    present = [value for value in values if value is not None]
+    if not present:
+        return np.full(len(values), np.nan)
+
+    if all(_INTEGER.fullmatch(value) for value in present):
+        numbers = [None if v is None else int(v.replace(",", "")) for v in values]
+        if len(present) == len(values):
+            try:
+                return np.array(numbers, dtype=np.int64)
+            except OverflowError:
+                return np.array(numbers, dtype=object)
+        return np.array(
+            [np.nan if n is None else float(n) for n in numbers], dtype=np.float64
+        )
+
+    if all(_FLOAT.fullmatch(value) for value in present):
+        return np.array(
+            [np.nan if v is None else float(v.replace(",", "")) for v in values],
+            dtype=np.float64,
+        )
+
+    booleans = _TRUE_VALUES | _FALSE_VALUES
+    if all(value in booleans for value in present):
+        flags = [None if v is None else v in _TRUE_VALUES for v in values]
+        return np.array(flags, dtype=bool if len(present) == len(values) else object)
+
+    return np.array(values, dtype=object)
+
+
+def parse_table(table) -> Optional[pd.DataFrame]:
+    """
+    Parse one <table> element into a DataFrame.
+
+    Args:
+        table: A BeautifulSoup Tag or lxml element for the <table>
+
+    Returns:
+        DataFrame with string column names, or None when the table holds
+        no cells at all
+    """
+    head_rows, body_rows = _section_rows(table)
+    header = _expand_spans(head_rows)
+    body = _expand_spans(body_rows)
+    if not header and not body:
+        return None
+
+    width = max(len(row) for row in header + body)
+    columns = [[] for _ in range(width)]
+    for row in body:
+        for i in range(width):
+            text = row[i] if i < len(row) else None
+            columns[i].append(None if text in NA_VALUES else text)
+
+    names = _column_names(header, width)
+    return pd.DataFrame(
+        {name: _convert_column(values) for name, values in zip(names, columns)},
+        columns=names,
+    )
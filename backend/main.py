@@ -5,6 +5,9 @@ load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.v1.endpoints import scrape, ai_analyze
+from core.cpu_executor import shutdown_cpu_executor
+from core.http_client import aclose_http_client, close_http_client
+from services.browser_pool import close_browser_pool, get_browser_pool
 
 app = FastAPI()
 
@@ -16,5 +19,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await aclose_http_client()
+    close_http_client()
+    shutdown_cpu_executor()
+    close_browser_pool()
+
+
+@app.get("/health")
+async def health():
+    # The browser is only launched by the first browser fetch
+    return {"status": "ok", "browser": get_browser_pool().health()}
+
+
 app.include_router(scrape.router, prefix="/api/v1")
 app.include_router(ai_analyze.router, prefix="/api/v1")
@@ -1,8 +1,21 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
+
+from core.sections import RESULT_SECTIONS
+from core.table_formats import TABLE_FORMATS
+
+ResultSection = Literal[RESULT_SECTIONS]
+TableFormat = Literal[TABLE_FORMATS]
 
 
 class ScrapeRequest(BaseModel):
     url: str
     question: Optional[str] = None
-    method: Optional[str] = "httpx"  # 'httpx' (default) or 'playwright'
+    # 'httpx' (default), 'stream', 'playwright' or 'auto' (httpx, then the browser
+    # for pages rendered client-side)
+    method: Optional[str] = "httpx"
+    include: Optional[List[ResultSection]] = None  # response sections to compute (default: all)
+    exclude: Optional[List[ResultSection]] = None  # response sections to leave out
+    # Layout of tables and grids: 'records', 'columnar' or 'arrow' (default: from
+    # the Accept header, else 'records')
+    table_format: Optional[TableFormat] = None
@@ -0,0 +1,270 @@
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from core.network_utils import get_random_user_agent
+
+T = TypeVar("T")
+
+# Pages rendered at the same time; further browser fetches wait their turn
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+
+# Pages a browser context renders before it is closed and replaced. Between
+# uses its cookies are cleared; 1 gives every page a brand new context
+BROWSER_CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", "20"))
+
+# Seconds `close` waits for the browser to shut down before killing it
+BROWSER_CLOSE_TIMEOUT = float(os.getenv("BROWSER_CLOSE_TIMEOUT", "10"))
+
+_pool: Optional["BrowserPool"] = None
+_pool_lock = threading.Lock()
+
+
+async def _launch_chromium(playwright):
+    return await playwright.chromium.launch(headless=True)
+
+
+async def _start_playwright():
+    from playwright.async_api import async_playwright
+
+    return await async_playwright().start()
+
+
+def _kill_browser(playwright, browser) -> None:
+    # Playwright has no public handle on the processes it starts. Killing
+    # its driver closes the pipe Chromium is controlled through, and
+    # Chromium exits with it.
+    transport = getattr(getattr(playwright, "_connection", None), "_transport", None)
+    process = getattr(transport, "_proc", None)
+    if process is not None and process.returncode is None:
+        process.kill()
+
+
+class _PooledContext:
+    def __init__(self, context, browser, host):
+        self.context = context
+        self.browser = browser
+        self.host = host
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    One long-lived headless Chromium, shared by all browser fetches.
+
+    The browser runs on an event loop of its own in a background thread, so
+    sync code and any event loop can use it (see `run` and `run_async`).
+    Pages open in pooled browser contexts that stay warm between fetches
+    of the same host: a context only ever renders pages of the host it was
+    opened for, so storage, cache and cookies never carry over from one
+    site to another. Cookies are cleared between pages anyway and service
+    workers are blocked. Contexts are replaced after `context_max_uses`
+    pages or when their page crashed, and at most `size` idle ones are
+    kept. At most `size` pages are open at once. A browser that died is
+    relaunched on the next fetch, and one that does not shut down within
+    `close_timeout` seconds is killed.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        context_max_uses: int = BROWSER_CONTEXT_MAX_USES,
+        launch: Callable[[object], Awaitable] = _launch_chromium,
+        start_playwright: Callable[[], Awaitable] = _start_playwright,
+        close_timeout: float = BROWSER_CLOSE_TIMEOUT,
+        kill: Callable[[object, object], None] = _kill_browser,
+    ):
+        self.size = max(size, 1)
+        self.context_max_uses = max(context_max_uses, 1)
+        self.close_timeout = close_timeout
+        self._launch = launch
+        self._start_playwright = start_playwright
+        self._kill = kill
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        # Owned by the pool's loop
+        self._playwright = None
+        self._browser = None
+        self._idle: List[_PooledContext] = []
+        self._in_use = 0
+        # Created on the pool's loop by the first page
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self.launches = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=loop.run_forever, name="browser-pool", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run `coro` on the pool's loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def run_async(self, coro: Awaitable[T]) -> T:
+        """`run` for coroutines: waits without blocking the caller's loop."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            # Health check: a browser that crashed or was killed is replaced,
+            # along with the contexts it had
+            if self._browser is None or not self._browser.is_connected():
+                self._idle.clear()
+                if self._playwright is None:
+                    self._playwright = await self._start_playwright()
+                self._browser = await self._launch(self._playwright)
+                self.launches += 1
+            return self._browser
+
+    async def _checkout(self, host: Optional[str]) -> _PooledContext:
+        browser = await self._ensure_browser()
+        # Contexts of a browser that was replaced are gone with it
+        self._idle = [p for p in self._idle if p.browser is browser]
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].host == host:
+                return self._idle.pop(i)
+        context = await browser.new_context(
+            user_agent=get_random_user_agent(), service_workers="block"
+        )
+        return _PooledContext(context, browser, host)
+
+    async def _checkin(self, pooled: _PooledContext, healthy: bool) -> None:
+        pooled.uses += 1
+        if healthy and pooled.uses < self.context_max_uses:
+            try:
+                await pooled.context.clear_cookies()
+                self._idle.append(pooled)
+                pooled = None
+            except Exception:
+                pass
+        if pooled is not None:
+            await self._close_context(pooled)
+        # Keep the most recently used contexts
+        while len(self._idle) > self.size:
+            await self._close_context(self._idle.pop(0))
+
+    async def _close_context(self, pooled: _PooledContext) -> None:
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self, host: Optional[str] = None):
+        """
+        A fresh page in a pooled context kept for `host` (see
+        core.network_utils.host_key), for the duration of the block. Must
+        be entered on the pool's loop (from a coroutine given to `run` or
+        `run_async`).
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+            self._launch_lock = asyncio.Lock()
+        async with self._slots:
+            pooled = await self._checkout(host)
+            self._in_use += 1
+            crashed = []
+            page = None
+            try:
+                page = await pooled.context.new_page()
+                page.on("crash", lambda _: crashed.append(True))
+                yield page
+            finally:
+                self._in_use -= 1
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        crashed.append(True)
+                healthy = page is not None and not crashed
+                await self._checkin(pooled, healthy and pooled.browser.is_connected())
+
+    def health(self) -> dict:
+        """Whether the browser is up, and how many pages and contexts it has."""
+        browser = self._browser
+        return {
+            "connected": browser is not None and browser.is_connected(),
+            "launches": self.launches,
+            "pages_in_use": self._in_use,
+            "idle_contexts": len(self._idle),
+            "size": self.size,
+        }
+
+    async def _close(self) -> None:
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._close_context(pooled)
+        browser, self._browser = self._browser, None
+        playwright, self._playwright = self._playwright, None
+        try:
+            if browser is not None:
+                await browser.close()
+        finally:
+            if playwright is not None:
+                await playwright.stop()
+
+    def close(self) -> None:
+        """
+        Close the browser and stop the pool's loop and thread, killing the
+        browser when it has not closed after `close_timeout` seconds.
+        """
+        with self._thread_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        playwright, browser = self._playwright, self._browser
+        closing = asyncio.run_coroutine_threadsafe(self._close(), loop)
+        try:
+            closing.result(timeout=self.close_timeout)
+        except FutureTimeoutError:
+            # A hung browser must not hold up the shutdown of the server
+            closing.cancel()
+            self._kill(playwright, browser)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(self.close_timeout)
+            if not thread.is_alive():
+                loop.close()
+            # A pool used again starts on a new loop
+            self._slots = self._launch_lock = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    The browser pool shared by all requests; the browser itself is
+    launched by the first fetch.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def close_browser_pool() -> None:
+    """
+    Close the shared browser; the next `get_browser_pool` starts a new
+    pool.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(close_browser_pool)
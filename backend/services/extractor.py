@@ -1,28 +1,14 @@
-import httpx
 from bs4 import BeautifulSoup
 import pandas as pd
 import trafilatura
 from core.table_indexer import profile_table
 from core.block_classifier import classify_table
-from core.network_utils import get_random_user_agent, SimpleRateLimiter
-from services.playwright_scraper import fetch_page_content_playwright
 import numpy as np
 from bs4 import Tag
 
-# Global rate limiter for all outgoing requests (configurable)
-http_rate_limiter = SimpleRateLimiter(max_calls=5, period=1.0)  # 5 requests per second
-
-
-def fetch_page_content(url: str, method: str = "httpx") -> str:
-    if method == "playwright":
-        return fetch_page_content_playwright(url)
-    # Default: httpx
-    http_rate_limiter.acquire()
-    headers = {"User-Agent": get_random_user_agent()}
-    with httpx.Client(follow_redirects=True, timeout=30, headers=headers) as client:
-        resp = client.get(url)
-        resp.raise_for_status()
-        return resp.text
+# Same fetcher as the universal extractor: HTTP cache, per-host rate
+# limiting and the shared client
+from services.universal_extractor import fetch_page_content  # noqa: F401
 
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -1,25 +1,212 @@
-from playwright.sync_api import sync_playwright
-from core.network_utils import get_random_user_agent, SimpleRateLimiter
+import os
+import re
 import time
+from typing import Iterable, Optional
 
-# Separate rate limiter for browser-based scraping
-playwright_rate_limiter = SimpleRateLimiter(
-    max_calls=2, period=1.0
-)  # 2 browser launches/sec
+from core.network_utils import host_key, host_rate_limiter
+from services.browser_pool import get_browser_pool
+
+# Requests a rendered page rarely needs for its content
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+# Analytics and ad hosts, matched as substrings of request URLs
+BLOCKED_URL_PATTERNS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+    "scorecardresearch.com",
+]
+
+# Resolves once the DOM has gone `quietMs` without a mutation, or after
+# `maxMs` at the latest, with whether it settled and how long it took
+_WAIT_FOR_QUIET_DOM = """
+([quietMs, maxMs]) => new Promise((resolve) => {
+  const start = performance.now();
+  let quiet, cap;
+  const observer = new MutationObserver(() => {
+    clearTimeout(quiet);
+    quiet = setTimeout(() => finish(true), quietMs);
+  });
+  const finish = (settled) => {
+    observer.disconnect();
+    clearTimeout(quiet);
+    clearTimeout(cap);
+    resolve({ settled, ms: performance.now() - start });
+  };
+  observer.observe(document.documentElement || document, {
+    childList: true, subtree: true, attributes: true, characterData: true,
+  });
+  quiet = setTimeout(() => finish(true), quietMs);
+  cap = setTimeout(() => finish(false), maxMs);
+})
+"""
+
+
+class RenderProfile:
+    """
+    How a page is rendered: requests of the `blocked_resource_types` or
+    whose URL contains one of the `blocked_url_patterns` are aborted, the
+    page loads up to `wait_until`, is scrolled to the bottom (`scroll`) and
+    then given until its DOM stops changing for `quiet_ms`, but no longer
+    than `max_wait_ms`.
+
+    The quiet DOM only says that nothing is being drawn, not that nothing
+    is on its way: client-rendered pages often sit on an empty shell for
+    seconds while their data loads, which is why `wait_until` defaults to
+    "networkidle".
+    """
+
+    def __init__(
+        self,
+        blocked_resource_types: Iterable[str] = (),
+        blocked_url_patterns: Iterable[str] = (),
+        wait_until: str = "networkidle",
+        quiet_ms: int = 500,
+        max_wait_ms: int = 5000,
+        scroll: bool = True,
+    ):
+        self.blocked_resource_types = frozenset(
+            t for t in blocked_resource_types if t
+        )
+        self.blocked_url_patterns = tuple(p for p in blocked_url_patterns if p)
+        self._url_pattern = (
+            re.compile("|".join(re.escape(p) for p in self.blocked_url_patterns))
+            if self.blocked_url_patterns
+            else None
+        )
+        self.wait_until = wait_until
+        self.quiet_ms = quiet_ms
+        self.max_wait_ms = max_wait_ms
+        self.scroll = scroll
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        return resource_type in self.blocked_resource_types or bool(
+            self._url_pattern and self._url_pattern.search(url)
+        )
+
+
+def _env_list(name: str, default: list) -> list:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Profile used for browser fetches; RENDER_BLOCK_RESOURCES and
+# RENDER_BLOCK_URLS (comma-separated) replace the defaults
+DEFAULT_RENDER_PROFILE = RenderProfile(
+    blocked_resource_types=_env_list(
+        "RENDER_BLOCK_RESOURCES", BLOCKED_RESOURCE_TYPES
+    ),
+    blocked_url_patterns=_env_list("RENDER_BLOCK_URLS", BLOCKED_URL_PATTERNS),
+    wait_until=os.getenv("RENDER_WAIT_UNTIL", "networkidle"),
+    quiet_ms=int(os.getenv("RENDER_QUIET_MS", "500")),
+    max_wait_ms=int(os.getenv("RENDER_MAX_WAIT_MS", "5000")),
+)
+
+
+class RenderedPage:
+    """
+    The HTML of a rendered page and how its rendering went: `timing` has
+    the milliseconds spent loading ("navigate_ms") and waiting for the DOM
+    to settle ("settle_ms") and in all ("total_ms"), whether it settled
+    before the time limit ("settled"), and how many requests were aborted
+    ("blocked_requests").
+    """
+
+    def __init__(self, html: str, timing: dict):
+        self.html = html
+        self.timing = timing
+
+    def server_timing(self) -> str:
+        """`timing` as a Server-Timing header value."""
+        return ", ".join(
+            f"{name};dur={self.timing[f'{name}_ms']:.0f}"
+            for name in ("navigate", "settle", "total")
+        )
+
+
+async def _render(url: str, timeout: int, profile: RenderProfile) -> RenderedPage:
+    blocked = 0
+
+    async def route(route):
+        nonlocal blocked
+        request = route.request
+        # The page itself is never blocked, whatever its URL
+        if not request.is_navigation_request() and profile.blocks(
+            request.resource_type, request.url
+        ):
+            blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    # Same per-host limit as plain HTTP fetches; waited for before taking a
+    # page, so throttled hosts do not hold browser slots
+    await host_rate_limiter.acquire_async(url)
+    async with get_browser_pool().page(host_key(url)) as page:
+        start = time.perf_counter()
+        if profile.blocked_resource_types or profile.blocked_url_patterns:
+            await page.route("**/*", route)
+        response = await page.goto(
+            url, timeout=timeout, wait_until=profile.wait_until
+        )
+        if response is not None:
+            host_rate_limiter.observe(
+                url, response.status, response.headers.get("retry-after")
+            )
+        loaded = time.perf_counter()
+        if profile.scroll:
+            # Scroll to bottom to trigger lazy loading
+            await page.evaluate(
+                "document.body && window.scrollTo(0, document.body.scrollHeight)"
+            )
+        settled = await page.evaluate(
+            _WAIT_FOR_QUIET_DOM, [profile.quiet_ms, profile.max_wait_ms]
+        )
+        html = await page.content()
+        done = time.perf_counter()
+    return RenderedPage(
+        html,
+        {
+            "navigate_ms": round((loaded - start) * 1000, 1),
+            "settle_ms": round((done - loaded) * 1000, 1),
+            "total_ms": round((done - start) * 1000, 1),
+            "settled": bool(settled and settled.get("settled")),
+            "blocked_requests": blocked,
+        },
+    )
+
+
+def render_page(
+    url: str, timeout: int = 30000, profile: Optional[RenderProfile] = None
+) -> RenderedPage:
+    """
+    Render a page in the shared browser (see services.browser_pool) with
+    `profile` (DEFAULT_RENDER_PROFILE by default).
+    """
+    profile = profile or DEFAULT_RENDER_PROFILE
+    return get_browser_pool().run(_render(url, timeout, profile))
+
+
+async def render_page_async(
+    url: str, timeout: int = 30000, profile: Optional[RenderProfile] = None
+) -> RenderedPage:
+    """`render_page` for async endpoints."""
+    return await get_browser_pool().run_async(
+        _render(url, timeout, profile or DEFAULT_RENDER_PROFILE)
+    )
 
 
 def fetch_page_content_playwright(url: str, timeout: int = 30000) -> str:
-    playwright_rate_limiter.acquire()
-    user_agent = get_random_user_agent()
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=user_agent)
-        page = context.new_page()
-        page.goto(url, timeout=timeout)
-        page.wait_for_load_state("networkidle")
-        # Scroll to bottom to trigger lazy loading
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        page.wait_for_timeout(1500)  # wait 1.5s for any JS-rendered content
-        html = page.content()
-        browser.close()
-        return html
+    """The HTML of `url` rendered in the shared browser."""
+    return render_page(url, timeout).html
+
+
+async def fetch_page_content_playwright_async(url: str, timeout: int = 30000) -> str:
+    """`fetch_page_content_playwright` for async endpoints."""
+    return (await render_page_async(url, timeout)).html
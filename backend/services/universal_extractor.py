@@ -1,28 +1,296 @@
-import httpx
+import asyncio
+import codecs
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup, Tag
 import trafilatura
+from typing import Callable, Optional, Tuple
 
 from core.table_indexer import profile_table
 from core.block_classifier import classify_table
-from core.network_utils import get_random_user_agent, SimpleRateLimiter
-from services.playwright_scraper import fetch_page_content_playwright
+from core.cpu_executor import run_cpu
+from core.http_cache import get_http_cache
+from core.http_client import (
+    async_host_slot,
+    get_async_http_client,
+    get_http_client,
+    host_slot,
+)
+from core.network_utils import get_random_user_agent, host_rate_limiter
+from services.playwright_scraper import (
+    RenderedPage,
+    fetch_page_content_playwright,
+    fetch_page_content_playwright_async,
+    render_page,
+    render_page_async,
+)
 from core.content_classifier import classify_content_type
 from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.fetch_router import detect_client_rendered, fetcher_memory
+from core.pruning import DEFAULT_PRUNE_RULES, PruneRules
+from core.stream_parser import DEFAULT_MAX_BYTES, StreamingParser
+from core.table_extractor import extract_tables
 
-http_rate_limiter = SimpleRateLimiter(max_calls=5, period=1.0)
+# Per-host limits, shared with browser fetches (HOST_RATE_LIMIT/HOST_RATE_BURST)
+http_rate_limiter = host_rate_limiter
 
 
 def fetch_page_content(url: str, method: str = "httpx") -> str:
     if method == "playwright":
         return fetch_page_content_playwright(url)
-    http_rate_limiter.acquire()
+    if method == "auto":
+        return fetch_page_auto(url)[0].html
     headers = {"User-Agent": get_random_user_agent()}
-    with httpx.Client(follow_redirects=True, timeout=30, headers=headers) as client:
-        resp = client.get(url)
-        resp.raise_for_status()
-        return resp.text
+    cache = get_http_cache()
+    cached = cache.lookup(url, headers) if cache is not None else None
+    if cached is not None and cached.is_fresh():
+        return cached.text()
+    http_rate_limiter.acquire(url)
+    # Pooled keep-alive connections, shared with every other request
+    with host_slot(url):
+        resp = get_http_client().get(url, headers=_request_headers(headers, cached))
+    http_rate_limiter.observe(url, resp.status_code, resp.headers.get("Retry-After"))
+    if cached is not None and resp.status_code == 304:
+        # Not modified: the body comes from disk
+        return cache.revalidated(cached, resp.headers).text()
+    resp.raise_for_status()
+    if cache is not None:
+        cache.store(
+            url, headers, resp.status_code, resp.headers, resp.content, resp.encoding
+        )
+    return resp.text
+
+
+def _request_headers(headers: dict, cached) -> dict:
+    # A cached page is revalidated instead of downloaded again
+    if cached is None:
+        return headers
+    return {**headers, **cached.conditional_headers()}
+
+
+def fetch_page_stream(
+    url: str,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    on_event: Optional[Callable[[str, object], None]] = None,
+    prune: Optional[PruneRules] = DEFAULT_PRUNE_RULES,
+) -> ParsedDocument:
+    """
+    Download a page and parse it incrementally while it arrives.
+
+    JSON-LD blocks and tables are passed to `on_event` as soon as their
+    elements close; bodies over `max_bytes` are cut off and blocks matched
+    by `prune` are dropped (see `StreamingParser`). Returns the parsed lxml
+    document. Pages in the HTTP cache are parsed from disk.
+    """
+    headers = {"User-Agent": get_random_user_agent()}
+    cache = get_http_cache()
+    cached = cache.lookup(url, headers) if cache is not None else None
+    if cached is None or not cached.is_fresh():
+        http_rate_limiter.acquire(url)
+        with host_slot(url):
+            with get_http_client().stream(
+                "GET", url, headers=_request_headers(headers, cached)
+            ) as resp:
+                http_rate_limiter.observe(
+                    url, resp.status_code, resp.headers.get("Retry-After")
+                )
+                if cached is not None and resp.status_code == 304:
+                    cached = cache.revalidated(cached, resp.headers)
+                else:
+                    resp.raise_for_status()
+                    parser = _stream_parser(url, resp, max_bytes, on_event, prune)
+                    chunks = [] if cache is not None else None
+                    for chunk in resp.iter_bytes():
+                        parser.feed(chunk)
+                        if parser.truncated:
+                            break
+                        if chunks is not None:
+                            chunks.append(chunk)
+                    # Downloaded afresh: replaces any stale copy
+                    cached = None
+        if cached is None:
+            _store_streamed(cache, url, headers, resp, parser, chunks)
+            return parser.close()
+    parser = _stream_parser(url, cached, max_bytes, on_event, prune)
+    parser.feed(cached.body)
+    return parser.close()
+
+
+def _encoding(source) -> str:
+    # `source` is the response being downloaded or the cached page; like
+    # httpx, unknown or bogus charsets fall back to utf-8
+    try:
+        return codecs.lookup(source.encoding or "utf-8").name
+    except LookupError:
+        return "utf-8"
+
+
+def _stream_parser(url, source, max_bytes, on_event, prune) -> StreamingParser:
+    return StreamingParser(
+        url=url,
+        encoding=_encoding(source),
+        max_bytes=max_bytes,
+        on_event=on_event,
+        prune=prune,
+    )
+
+
+def _store_streamed(cache, url, headers, resp, parser, chunks) -> None:
+    # Only complete bodies are cached
+    if cache is not None and not parser.truncated:
+        cache.store(
+            url,
+            headers,
+            resp.status_code,
+            resp.headers,
+            b"".join(chunks),
+            _encoding(resp),
+        )
+
+
+async def fetch_page_content_async(url: str, method: str = "httpx") -> str:
+    """
+    `fetch_page_content` for async endpoints: downloads through the shared
+    async client, so no thread waits on the network. Browser fetches are
+    rendered by the shared browser pool.
+    """
+    if method == "playwright":
+        return await fetch_page_content_playwright_async(url)
+    if method == "auto":
+        return (await fetch_page_auto_async(url))[0].html
+    headers = {"User-Agent": get_random_user_agent()}
+    cache = get_http_cache()
+    cached = await _lookup_async(cache, url, headers)
+    if cached is not None and cached.is_fresh():
+        return cached.text()
+    await http_rate_limiter.acquire_async(url)
+    client = get_async_http_client()
+    async with async_host_slot(url):
+        resp = await client.get(url, headers=_request_headers(headers, cached))
+    http_rate_limiter.observe(url, resp.status_code, resp.headers.get("Retry-After"))
+    if cached is not None and resp.status_code == 304:
+        return (await asyncio.to_thread(cache.revalidated, cached, resp.headers)).text()
+    resp.raise_for_status()
+    if cache is not None:
+        await asyncio.to_thread(
+            cache.store,
+            url,
+            headers,
+            resp.status_code,
+            resp.headers,
+            resp.content,
+            resp.encoding,
+        )
+    return resp.text
+
+
+async def _lookup_async(cache, url: str, headers: dict):
+    # Disk reads go to a thread, off the event loop
+    if cache is None:
+        return None
+    return await asyncio.to_thread(cache.lookup, url, headers)
+
+
+async def fetch_page_stream_async(
+    url: str,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    on_event: Optional[Callable[[str, object], None]] = None,
+    prune: Optional[PruneRules] = DEFAULT_PRUNE_RULES,
+) -> ParsedDocument:
+    """
+    `fetch_page_stream` for async endpoints. Chunks are downloaded on the
+    event loop and parsed in the CPU executor (see core.cpu_executor);
+    `on_event` is called from the executor threads.
+    """
+    headers = {"User-Agent": get_random_user_agent()}
+    cache = get_http_cache()
+    cached = await _lookup_async(cache, url, headers)
+    if cached is None or not cached.is_fresh():
+        await http_rate_limiter.acquire_async(url)
+        client = get_async_http_client()
+        async with async_host_slot(url):
+            async with client.stream(
+                "GET", url, headers=_request_headers(headers, cached)
+            ) as resp:
+                http_rate_limiter.observe(
+                    url, resp.status_code, resp.headers.get("Retry-After")
+                )
+                if cached is not None and resp.status_code == 304:
+                    cached = await asyncio.to_thread(
+                        cache.revalidated, cached, resp.headers
+                    )
+                else:
+                    resp.raise_for_status()
+                    parser = _stream_parser(url, resp, max_bytes, on_event, prune)
+                    chunks = [] if cache is not None else None
+                    async for chunk in resp.aiter_bytes():
+                        await run_cpu(parser.feed, chunk)
+                        if parser.truncated:
+                            break
+                        if chunks is not None:
+                            chunks.append(chunk)
+                    # Downloaded afresh: replaces any stale copy
+                    cached = None
+        if cached is None:
+            await asyncio.to_thread(
+                _store_streamed, cache, url, headers, resp, parser, chunks
+            )
+            return await run_cpu(parser.close)
+    parser = _stream_parser(url, cached, max_bytes, on_event, prune)
+    await run_cpu(parser.feed, cached.body)
+    return await run_cpu(parser.close)
+
+
+def _parse(html: str, url: str) -> Tuple[ParsedDocument, Optional[str]]:
+    doc = ParsedDocument(html, url=url, prune=DEFAULT_PRUNE_RULES)
+    return doc, detect_client_rendered(doc)
+
+
+def _remember_render(url: str, shell_after_render: Optional[str]) -> None:
+    # When the browser did not help either, plain fetches are as good
+    fetcher_memory.remember(
+        url, "httpx" if shell_after_render is not None else "playwright"
+    )
+
+
+def fetch_page_auto(url: str) -> Tuple[ParsedDocument, Optional[RenderedPage]]:
+    """
+    Fetch with httpx and render in the browser only when the page turns
+    out to be a client-rendered shell (see core.fetch_router). The fetcher
+    that worked is remembered per host, so later pages of a host that
+    needs the browser skip the httpx attempt, and hosts where rendering did
+    not help are not rendered again.
+
+    Returns the parsed page, which extraction can use as it is, and the
+    RenderedPage when the browser rendered it.
+    """
+    fetcher = fetcher_memory.get(url)
+    if fetcher != "playwright":
+        doc, shell = _parse(fetch_page_content(url), url)
+        if shell is None or fetcher == "httpx":
+            fetcher_memory.remember(url, "httpx")
+            return doc, None
+    rendered = render_page(url)
+    doc, shell = _parse(rendered.html, url)
+    _remember_render(url, shell)
+    return doc, rendered
+
+
+async def fetch_page_auto_async(
+    url: str,
+) -> Tuple[ParsedDocument, Optional[RenderedPage]]:
+    """`fetch_page_auto` for async endpoints; parsing runs in the CPU executor."""
+    fetcher = fetcher_memory.get(url)
+    if fetcher != "playwright":
+        html = await fetch_page_content_async(url)
+        doc, shell = await run_cpu(_parse, html, url)
+        if shell is None or fetcher == "httpx":
+            fetcher_memory.remember(url, "httpx")
+            return doc, None
+    rendered = await render_page_async(url)
+    doc, shell = await run_cpu(_parse, rendered.html, url)
+    _remember_render(url, shell)
+    return doc, rendered
 
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -31,51 +299,40 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def extract_html_tables(html: str, source_url: str = None):
-    soup = BeautifulSoup(html, "lxml")
-    raw_tables = soup.find_all("table")
+def extract_html_tables(source, source_url: str = None):
     results = []
-    for table in raw_tables:
-        try:
-            df = pd.read_html(str(table))[0]
-            df = clean_dataframe(df)
-            content_type = classify_table(df)
-            meta = profile_table(df, source_url=source_url, content_type=content_type)
-            meta["dataframe"] = df
-            results.append(meta)
-        except Exception:
-            continue
+    for df in extract_tables(source):
+        content_type = classify_table(df)
+        meta = profile_table(df, source_url=source_url, content_type=content_type)
+        meta["dataframe"] = df
+        results.append(meta)
     return results
 
 
-def extract_div_grids(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "lxml")
-    candidates = soup.find_all(
-        lambda tag: tag.name in ["div", "li"] and tag.get("class")
-    )
+def extract_div_grids(source) -> list[dict]:
+    # Runs on the backend-neutral index, so it works on bs4 and lxml trees
+    index = ParsedDocument.coerce(source).index
     class_groups = {}
-    for tag in candidates:
-        class_key = " ".join(sorted(tag.get("class", [])))
-        class_groups.setdefault(class_key, []).append(tag)
+    for i in sorted(index.by_tag.get("div", []) + index.by_tag.get("li", [])):
+        if index.class_keys[i]:
+            class_groups.setdefault(index.class_keys[i], []).append(i)
     best_group = max(class_groups.values(), key=len, default=[])
     if len(best_group) < 3:
         return []
     rows = []
     for row in best_group:
         row_data = {}
-        children = [c for c in row.children if isinstance(c, Tag)]
-        for idx, child in enumerate(children):
-            key = child.get("class")
-            col_name = " ".join(sorted(key)) if key else child.name or f"col{idx + 1}"
-            value = child.get_text(strip=True)
+        for idx, child in enumerate(index.children[row]):
+            col_name = index.class_keys[child] or index.tags[child] or f"col{idx + 1}"
+            value = index.text(child)
             if not value:
                 for attr in ["href", "src", "alt", "title"]:
-                    if child.has_attr(attr):
-                        value = child[attr]
+                    if index.get(child, attr) is not None:
+                        value = index.get(child, attr)
                         break
             row_data[col_name] = value
         if not row_data:
-            row_data["text"] = row.get_text(strip=True)
+            row_data["text"] = index.text(row)
         rows.append(row_data)
     return rows if any(len(r) > 1 for r in rows) else []
 
@@ -87,8 +344,8 @@ def extract_main_content(html: str, url: str = None) -> str:
 def extract_all(url: str, force_js=False) -> dict:
     method = "playwright" if force_js else "httpx"
     html = fetch_page_content(url, method=method)
-    soup = BeautifulSoup(html, "lxml")
-    detected_types = classify_content_type(soup)
+    doc = ParsedDocument(html, url=url)
+    detected_types = classify_content_type(doc)
     result = {
         "url": url,
         "content_types": [t.value for t in detected_types],
@@ -98,9 +355,9 @@ def extract_all(url: str, force_js=False) -> dict:
         "raw_html": html,
     }
     if ContentType.TABLE in detected_types:
-        result["tables"] = extract_html_tables(html, source_url=url)
+        result["tables"] = extract_html_tables(doc, source_url=url)
     if ContentType.DIV_GRID in detected_types:
-        result["div_tables"] = extract_div_grids(html)
+        result["div_tables"] = extract_div_grids(doc)
     if ContentType.ARTICLE in detected_types or ContentType.BLOG in detected_types:
         result["main_content"] = extract_main_content(html, url=url)
     return result
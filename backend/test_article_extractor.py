@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for single-run article extraction.
+trafilatura runs once per page, on the shared tree without changing it,
+and the result is a dict of article fields cached by page content.
+"""
+
+import lxml.html
+import trafilatura
+
+from core import article_extractor
+from core.article_extractor import ARTICLE_FIELDS, clear_article_cache, extract_article
+from core.document import ParsedDocument
+
+paragraph = (
+    "The city council voted on Tuesday to extend the riverside park by another "
+    "two kilometres, adding cycle lanes, benches and a small open-air stage. "
+)
+
+article_html = f"""
+<html><head>
+  <title>Riverside park to grow by two kilometres</title>
+  <meta name="author" content="Jane Doe">
+  <meta property="article:published_time" content="2024-05-14">
+</head><body>
+  <div class="nav">Home | News | Sport</div>
+  <article>
+    <h1>Riverside park to grow by two kilometres</h1>
+    {"".join(f"<p>{paragraph * 3}</p>" for _ in range(4))}
+  </article>
+  <div class="footer">Contact us</div>
+</body></html>
+"""
+
+
+def _counting(monkeypatch):
+    calls = []
+    original = trafilatura.bare_extraction
+
+    def bare_extraction(*args, **kwargs):
+        calls.append(args[0])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(article_extractor.trafilatura, "bare_extraction", bare_extraction)
+    return calls
+
+
+def test_single_run_on_shared_tree(monkeypatch):
+    clear_article_cache()
+    calls = _counting(monkeypatch)
+    doc = ParsedDocument(article_html, url="https://example.com/a", backend="lxml")
+    before = lxml.html.tostring(doc.tree)
+
+    article = extract_article(doc)
+    assert set(article) == set(ARTICLE_FIELDS)
+    assert article["title"] == "Riverside park to grow by two kilometres"
+    assert article["author"] == "Jane Doe"
+    assert article["date"] == "2024-05-14"
+    assert "riverside park" in article["text"]
+    assert calls == [doc.tree]
+    assert lxml.html.tostring(doc.tree) == before
+
+    # Same page again: served from the cache
+    again = ParsedDocument(article_html, url="https://example.com/a", backend="lxml")
+    assert extract_article(again) == article
+    assert len(calls) == 1
+
+
+def test_raw_html_and_empty_pages(monkeypatch):
+    clear_article_cache()
+    calls = _counting(monkeypatch)
+    article = extract_article(article_html)
+    assert "riverside park" in article["text"]
+    assert extract_article("<html><body></body></html>") == {"text": None}
+    assert len(calls) == 2
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the async fetch path and the CPU executor.
+Async fetches return what the sync ones do, and CPU work runs on the
+executor threads while the event loop stays free.
+"""
+
+import asyncio
+import threading
+import time
+
+from core.cpu_executor import run_cpu
+from core.http_client import aclose_http_client
+from services.universal_extractor import (
+    fetch_page_content,
+    fetch_page_content_async,
+    fetch_page_stream_async,
+)
+from test_http_client import _Handler, _serve
+
+
+def test_async_fetches_match_sync():
+    server, url = _serve()
+    _Handler.peers.clear()
+
+    async def fetch():
+        try:
+            pages = [await fetch_page_content_async(url) for _ in range(3)]
+            doc = await fetch_page_stream_async(url)
+            return pages, doc
+        finally:
+            await aclose_http_client()
+
+    try:
+        pages, doc = asyncio.run(fetch())
+        assert pages == [fetch_page_content(url)] * 3
+        assert doc.html == pages[0] and doc.is_lxml
+        # The async requests shared one kept-alive connection
+        assert len(set(_Handler.peers[:4])) == 1
+    finally:
+        server.shutdown()
+
+
+def test_cpu_work_leaves_the_loop_free():
+    def busy():
+        time.sleep(0.2)
+        return threading.current_thread().name
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        names = await asyncio.gather(*(run_cpu(busy) for _ in range(2)))
+        ticker.cancel()
+        return names, ticks
+
+    names, ticks = asyncio.run(main())
+    assert all(name.startswith("cpu") for name in names)
+    assert ticks >= 5
+
+
+if __name__ == "__main__":
+    test_async_fetches_match_sync()
+    test_cpu_work_leaves_the_loop_free()
+    print("async fetches and the CPU executor work")
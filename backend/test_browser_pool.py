@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared browser pool, driven by a stand-in browser.
+The browser is launched once, contexts are reused for their own host until
+their use limit or a crash, at most `size` pages are open at once, a dead
+browser is relaunched, and closing the pool shuts everything down (killing
+a browser that hangs).
+"""
+
+import asyncio
+import threading
+import time
+
+from services.browser_pool import BrowserPool
+
+
+class _Page:
+    def __init__(self, context):
+        self.context = context
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def crash(self):
+        self.handlers["crash"](self)
+
+    async def close(self):
+        pass
+
+
+class _Context:
+    def __init__(self, browser, options):
+        self.browser = browser
+        self.options = options
+        self.closed = False
+        self.cookie_clears = 0
+
+    async def new_page(self):
+        return _Page(self)
+
+    async def clear_cookies(self):
+        self.cookie_clears += 1
+
+    async def close(self):
+        self.closed = True
+
+
+class _Browser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+        self.hangs = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, user_agent=None, **options):
+        self.contexts.append(_Context(self, options))
+        return self.contexts[-1]
+
+    async def close(self):
+        if self.hangs:
+            await asyncio.Event().wait()
+        self.connected = False
+
+
+class _Playwright:
+    stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+def _pool(**kwargs):
+    browsers = []
+    playwright = _Playwright()
+
+    async def start():
+        return playwright
+
+    async def launch(_):
+        browsers.append(_Browser())
+        return browsers[-1]
+
+    pool = BrowserPool(launch=launch, start_playwright=start, **kwargs)
+    return pool, browsers, playwright
+
+
+async def _use(pool, crash=False, host=None):
+    async with pool.page(host) as page:
+        if crash:
+            page.crash()
+        return page.context
+
+
+def test_contexts_are_reused_until_their_limit():
+    pool, browsers, playwright = _pool(size=2, context_max_uses=3)
+    try:
+        used = [pool.run(_use(pool)) for _ in range(2)]
+
+        async def from_another_loop():
+            return await pool.run_async(_use(pool))
+
+        used.append(asyncio.run(from_another_loop()))
+        used.append(pool.run(_use(pool)))
+        assert len(browsers) == 1
+        assert used[0] is used[1] is used[2] and used[3] is not used[0]
+        assert used[0].closed and used[0].cookie_clears == 2
+        assert pool.health()["idle_contexts"] == 1
+    finally:
+        pool.close()
+    assert playwright.stopped and not browsers[0].connected
+
+
+def test_pages_in_use_are_bounded():
+    pool, _, _ = _pool(size=2)
+    peak = [0]
+    lock = threading.Lock()
+
+    async def hold():
+        async with pool.page():
+            with lock:
+                peak[0] = max(peak[0], pool.health()["pages_in_use"])
+            await asyncio.sleep(0.02)
+
+    try:
+        threads = [threading.Thread(target=pool.run, args=(hold(),)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 2
+        assert pool.health()["pages_in_use"] == 0
+    finally:
+        pool.close()
+
+
+def test_crashes_are_recovered():
+    pool, browsers, _ = _pool(size=1)
+    try:
+        crashed = pool.run(_use(pool, crash=True))
+        assert crashed.closed
+        assert pool.run(_use(pool)) is not crashed
+        # The browser died: the next page gets a new one and a new context
+        browsers[0].connected = False
+        context = pool.run(_use(pool))
+        assert context.browser is browsers[1]
+        health = pool.health()
+        assert health["connected"] and health["launches"] == 2
+    finally:
+        pool.close()
+
+
+def test_contexts_are_kept_per_host():
+    pool, browsers, _ = _pool(size=2)
+    try:
+        a = pool.run(_use(pool, host="a.example"))
+        b = pool.run(_use(pool, host="b.example"))
+        # Storage of one site never reaches another
+        assert a is not b
+        assert pool.run(_use(pool, host="a.example")) is a
+        assert a.options == {"service_workers": "block"}
+        # At most `size` idle contexts: the least recently used one goes
+        c = pool.run(_use(pool, host="c.example"))
+        assert b.closed and not a.closed and not c.closed
+        assert pool.health()["idle_contexts"] == 2
+    finally:
+        pool.close()
+
+
+def test_a_hung_browser_is_killed_on_close():
+    killed = []
+    pool, browsers, playwright = _pool(
+        close_timeout=0.1, kill=lambda *handles: killed.append(handles)
+    )
+    pool.run(_use(pool))
+    browsers[0].hangs = True
+    thread = pool._thread
+    start = time.monotonic()
+    pool.close()
+    assert time.monotonic() - start < 1
+    assert killed == [(playwright, browsers[0])]
+    assert not thread.is_alive()
+
+
+if __name__ == "__main__":
+    test_contexts_are_reused_until_their_limit()
+    test_pages_in_use_are_bounded()
+    test_crashes_are_recovered()
+    test_contexts_are_kept_per_host()
+    test_a_hung_browser_is_killed_on_close()
+    print("the browser pool reuses and recycles contexts")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Scaling tests for the DOM feature index.
+Building the index and running the grid strategies on it must stay linear
+in the page size, for wide listings as well as deeply nested markup, and
+the index must reproduce get_text(strip=True) for every element.
+"""
+
+import gc
+import time
+
+from core import grid_extractor
+from core.document import ParsedDocument
+from core.lxml_engine import get_text
+from test_lxml_engine import listing_html
+
+
+def _wide_page(nodes: int) -> str:
+    # Each card holds five elements: the card, a title, a price, a link and an image
+    cards = "".join(
+        f'<div class="card"><h2>Item {i}</h2><span class="price">${i}</span>'
+        f'<a href="/p/{i}">View</a><img src="/i/{i}.jpg" alt="item {i}"></div>'
+        for i in range(nodes // 5)
+    )
+    return f"<html><body><div class='grid'>{cards}</div></body></html>"
+
+
+def _deep_page(nodes: int, depth: int = 200) -> str:
+    # Repeated chains of divs nested `depth` levels deep, close to the
+    # parser's nesting limit; each level has its own class
+    chain = "".join(
+        f'<div class="level-{level}"> text {level} ' for level in range(depth)
+    ) + " tail </div>" * depth
+    return f"<html><body>{chain * (nodes // depth)}</body></html>"
+
+
+def _best_time(fn, repeat: int = 3) -> float:
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def _assert_linear(run, small: int = 10_000, large: int = 100_000):
+    # Ten times the nodes should cost about ten times as much; a quadratic
+    # walk would cost a hundred times as much
+    ratio = _best_time(lambda: run(large), repeat=1) / _best_time(lambda: run(small))
+    assert ratio < 30, f"{small} -> {large} nodes took {ratio:.1f}x longer"
+
+
+def _documents(make_page, backend: str) -> dict:
+    return {
+        nodes: ParsedDocument(make_page(nodes), backend=backend)
+        for nodes in (10_000, 100_000)
+    }
+
+
+def _run_strategies(doc: ParsedDocument):
+    doc.invalidate()
+    index = doc.index
+    grid_extractor._extract_by_tag_patterns(index)
+    grid_extractor._extract_by_parent_child_patterns(index)
+    grid_extractor._extract_specific_grid_patterns(index, 3, 2)
+    grid_extractor._extract_any_repeated_structure(index, 3, 2)
+
+
+def test_index_text_matches_get_text():
+    html = listing_html + _wide_page(500) + _deep_page(400)
+    for backend in ("bs4", "lxml"):
+        index = ParsedDocument(html, backend=backend).index
+        for i, node in enumerate(index.nodes):
+            expected = node.get_text(strip=True) if backend == "bs4" else get_text(node)
+            assert index.text(i) == expected
+            assert index.text_lengths[i] == len(expected)
+
+
+def test_index_scales_linearly():
+    for backend in ("bs4", "lxml"):
+        for make_page in (_wide_page, _deep_page):
+            documents = _documents(make_page, backend)
+            _assert_linear(lambda nodes: _run_strategies(documents[nodes]))
+
+
+def test_nesting_depth_does_not_add_cost():
+    # Per-element work must not grow with the number of ancestors, so a
+    # page of 200-level chains costs about as much as a flat listing
+    for backend in ("bs4", "lxml"):
+        wide = ParsedDocument(_wide_page(50_000), backend=backend)
+        deep = ParsedDocument(_deep_page(50_000), backend=backend)
+        ratio = _best_time(lambda: _run_strategies(deep)) / _best_time(
+            lambda: _run_strategies(wide)
+        )
+        assert ratio < 5, f"{backend}: deep page took {ratio:.1f}x longer"
+
+
+if __name__ == "__main__":
+    test_index_text_matches_get_text()
+    test_index_scales_linearly()
+    test_nesting_depth_does_not_add_cost()
+    print("DOM index scales linearly")
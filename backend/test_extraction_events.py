@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for extraction progress events.
+The events must carry every part of the result as it is returned at the
+end, and the early parts must come before the grid strategies.
+"""
+
+from core.extractor_router import FINAL_SECTIONS
+from core.serialization import dumps_json
+from test_lxml_engine import _random_page, _structured, fixtures
+
+
+def _events(html, **kwargs):
+    events = []
+    result = _structured(
+        html, on_event=lambda kind, payload: events.append((kind, payload)), **kwargs
+    )
+    return events, result
+
+
+def test_events_rebuild_the_result():
+    for html in fixtures + [_random_page(seed) for seed in range(5)]:
+        events, result = _events(html)
+        kinds = [kind for kind, _ in events]
+        assert kinds[0] == "content_types" and kinds[-1] == "done"
+        assert kinds.count("done") == 1
+        if "grid_strategy" in kinds:
+            early = [i for i, k in enumerate(kinds) if k in ("table", "json_ld", "article")]
+            assert max(early, default=-1) < kinds.index("grid_strategy")
+
+        rebuilt = {}
+        if "tables" in result:
+            rebuilt["tables"] = [p["table"] for kind, p in events if kind == "table"]
+        for kind, payload in events:
+            if kind in ("json_ld", "article"):
+                rebuilt.update(payload)
+            elif kind == "grid_strategy":
+                rebuilt.update(payload["fields"])
+        # The merged listings and the strategy report only come at the end
+        done = events[-1][1]
+        assert set(done) == set(FINAL_SECTIONS) & set(result)
+        rebuilt.update(done)
+        assert set(rebuilt) == set(result)
+        for key in result:
+            assert dumps_json(rebuilt[key]) == dumps_json(result[key]), key
+
+
+def test_events_follow_requested_sections_and_format():
+    for html in fixtures:
+        events, result = _events(html, sections=["tables"], table_format="columnar")
+        assert {kind for kind, _ in events} <= {"content_types", "table", "done"}
+        tables = [p["table"] for kind, p in events if kind == "table"]
+        assert tables == result.get("tables", [])
+        assert all("columns" in table for table in tables)
+
+
+if __name__ == "__main__":
+    test_events_rebuild_the_result()
+    test_events_follow_requested_sections_and_format()
+    print("extraction events carry the whole result")
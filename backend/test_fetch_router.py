@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for method "auto": client-rendered shells are told apart from pages
+with content, only shells are rendered in the browser, and the fetcher
+that worked is remembered per host, including when the browser did not help.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.document import ParsedDocument
+from core.fetch_router import (
+    FetcherMemory,
+    detect_client_rendered,
+    fetcher_memory,
+    visible_text_length,
+)
+from core.http_client import close_http_client
+from services import universal_extractor
+from services.playwright_scraper import RenderedPage
+from services.universal_extractor import fetch_page_auto
+
+SHELL = """<html><head><script src="/app.js"></script></head><body>
+<div id="__next"></div><noscript>Please enable JavaScript</noscript>
+</body></html>"""
+
+ROWS = "".join(f"<tr><td>Item {i}</td><td>{i}.99</td></tr>" for i in range(5))
+RENDERED = (
+    "<html><body><table><tr><th>Name</th><th>Price</th></tr>"
+    f"{ROWS}</table></body></html>"
+)
+
+STATIC = "<html><body><h1>Example Domain</h1><p>A small page.</p></body></html>"
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_shells_are_detected(backend):
+    def detect(html):
+        return detect_client_rendered(ParsedDocument(html, backend=backend))
+
+    assert "#__next" in detect(SHELL)
+    scripted = "<html><body><p>Loading</p><script>render()</script></body></html>"
+    assert "scripts" in detect(scripted)
+    # Content, or a small page without anything to render it, stays as it is
+    assert detect(RENDERED) is None
+    assert detect(STATIC) is None
+    text = "word " * 100
+    assert detect(f"<html><body><div id='root'><p>{text}</p></div></body>") is None
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_comments_are_not_visible_text(backend):
+    comments = "".join(f"<!-- build note {i}: {'x' * 40} -->" for i in range(10))
+    html = SHELL.replace("<noscript>", comments + "<noscript>")
+    doc = ParsedDocument(html, backend=backend)
+    assert visible_text_length(doc) == 0
+    assert "#__next" in detect_client_rendered(doc)
+
+
+def test_fetcher_memory_expires_and_is_bounded():
+    memory = FetcherMemory(ttl=0.05, max_hosts=2)
+    memory.remember("https://a.example/1", "playwright")
+    assert memory.get("https://A.example/other") == "playwright"
+    memory.remember("https://b.example/", "httpx")
+    memory.remember("https://c.example/", "httpx")
+    assert memory.get("https://a.example/") is None
+    time.sleep(0.06)
+    assert memory.get("https://b.example/") is None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    paths = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        body = (SHELL if self.path.startswith("/app") else STATIC).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_only_shells_are_rendered(monkeypatch):
+    rendered_urls = []
+
+    def render(url):
+        rendered_urls.append(url)
+        return RenderedPage(RENDERED, {"total_ms": 1.0})
+
+    monkeypatch.setattr(universal_extractor, "render_page", render)
+    fetcher_memory.clear()
+    _Handler.paths.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    static = f"http://127.0.0.1:{server.server_address[1]}"
+    # Another name for the same server, remembered separately
+    app = f"http://localhost:{server.server_address[1]}"
+    try:
+        doc, rendered = fetch_page_auto(static + "/")
+        assert rendered is None and "Example Domain" in doc.html
+        assert fetcher_memory.get(static) == "httpx"
+
+        doc, rendered = fetch_page_auto(app + "/app/1")
+        assert rendered is not None and doc.html == RENDERED
+        assert fetcher_memory.get(app) == "playwright"
+        # The host needs the browser: its next page skips the plain fetch
+        fetch_page_auto(app + "/app/2")
+        assert _Handler.paths == ["/", "/app/1"]
+        assert rendered_urls == [app + "/app/1", app + "/app/2"]
+
+        # Rendering did not help on this host: its shells are taken as they are
+        fetcher_memory.remember(app, "httpx")
+        doc, rendered = fetch_page_auto(app + "/app/3")
+        assert rendered is None and doc.html == SHELL
+        assert len(rendered_urls) == 2
+    finally:
+        fetcher_memory.clear()
+        close_http_client()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_shells_are_detected("bs4")
+    test_fetcher_memory_expires_and_is_bounded()
+    print("client-rendered shells are detected")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for schema-memoized field normalization.
+The compiled synonym matcher must map every column name the way checking
+the synonym lists one after another does.
+"""
+
+import json
+import random
+
+from core import field_normalizer
+from core.field_normalizer import (
+    DEFAULT_FIELD_SYNONYMS,
+    SynonymMatcher,
+    load_synonyms,
+    normalize_field_name,
+    normalize_fields,
+)
+
+
+def _reference_name(k: str, synonyms=DEFAULT_FIELD_SYNONYMS) -> str:
+    k = k.lower()
+    for norm, variants in synonyms.items():
+        if any(v in k for v in variants):
+            return norm
+    return k
+
+
+def test_matches_reference_mapping():
+    words = ["Product", "Name", "Price", "$", "avg score", "Release", "Date", "Beds",
+             "bathrooms", "City", "id", "sku", "Notes", "ITEM NAME", "job", "review"]
+    rng = random.Random(0)
+    names = ["".join(rng.sample(words, rng.randint(1, 3))) for _ in range(500)]
+    for name in names + words:
+        assert normalize_field_name(name) == _reference_name(name)
+
+
+def test_overlapping_synonyms_follow_field_order():
+    synonyms = {"short": ["ab"], "long": ["abc", "b"]}
+    matcher = SynonymMatcher(synonyms)
+    for name in ("abc", "xbc", "zab", "ab", "b", "c"):
+        expected = _reference_name(name, synonyms)
+        assert (matcher.match(name) or name) == expected
+
+
+def test_rows_are_renamed_per_schema():
+    rows = [{"Product Name": f"Item {i}", "Cost": i, "Name": "x"} for i in range(3)]
+    rows.append({"City": "Paris", "SKU": "A1"})
+    expected = [{_reference_name(k): v for k, v in row.items()} for row in rows]
+    assert normalize_fields(rows) == expected
+    assert list(normalize_fields(rows)[0]) == ["title", "price"]
+
+
+def test_synonyms_from_config(tmp_path, monkeypatch):
+    path = tmp_path / "synonyms.json"
+    path.write_text(json.dumps({"brand": ["maker", "brand"]}))
+    monkeypatch.setenv("FIELD_SYNONYMS_FILE", str(path))
+    synonyms = load_synonyms()
+    try:
+        field_normalizer.set_synonyms(synonyms)
+        assert normalize_fields([{"Maker": "Acme", "Price": 3}]) == [
+            {"brand": "Acme", "price": 3}
+        ]
+    finally:
+        field_normalizer.set_synonyms(DEFAULT_FIELD_SYNONYMS)
+    assert normalize_field_name("Price") == "price"
+
+
+if __name__ == "__main__":
+    test_matches_reference_mapping()
+    test_overlapping_synonyms_follow_field_order()
+    test_rows_are_renamed_per_schema()
+    print("field normalization matches the synonym lists")
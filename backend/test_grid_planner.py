@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for the cost-aware grid strategy planner.
+Strategies run cheapest first, stop once a grid is good enough (but never
+drop a section) and are reported with their scores and run times.
+"""
+
+import pandas as pd
+import pytest
+
+from core import grid_planner
+from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.extractor_router import extract_structured_content
+from core.grid_planner import (
+    GridStrategy,
+    StrategyCosts,
+    plan_grid_extraction,
+    score_grid,
+)
+from test_lxml_engine import listing_html
+
+
+def _strategy(name, df, calls, **kwargs):
+    def run(doc):
+        calls.append(name)
+        return df, ({name: df.to_dict(orient="records")} if not df.empty else {})
+
+    return GridStrategy(name, run, **kwargs)
+
+
+good = pd.DataFrame({"title": [f"Item {i}" for i in range(10)], "price": list(range(10))})
+sparse = pd.DataFrame({"title": ["A", None, None], "price": [None, None, 3]})
+
+
+def test_score_grid():
+    assert score_grid(pd.DataFrame()) == 0.0
+    assert score_grid(good) == 1.0
+    assert 0 < score_grid(sparse) < score_grid(good)
+
+
+def test_cheapest_first_and_early_stop():
+    costs = StrategyCosts()
+    costs.record("slow", 1.0)
+    costs.record("fast", 0.01)
+    calls = []
+    strategies = [
+        _strategy("slow", good, calls),
+        _strategy("fast", good, calls),
+        _strategy("fallback", good, calls, fallback=True),
+    ]
+    doc = ParsedDocument("<html></html>")
+    grid_data, report = plan_grid_extraction(
+        doc, [], threshold=0.8, strategies=strategies, costs=costs
+    )
+    assert calls == ["fast"]
+    assert list(grid_data) == ["fast"]
+    assert [entry["strategy"] for entry in report["ran"]] == ["fast"]
+    assert report["ran"][0]["rows"] == 10 and report["ran"][0]["score"] == 1.0
+    assert report["skipped"] == ["slow", "fallback"]
+
+
+def test_low_quality_runs_everything_and_fallback_only_when_empty():
+    calls = []
+    strategies = [
+        _strategy("first", sparse, calls),
+        _strategy("second", sparse, calls, applies=lambda types: ContentType.TABLE in types),
+        _strategy("fallback", good, calls, fallback=True),
+    ]
+    doc = ParsedDocument("<html></html>")
+    grid_data, report = plan_grid_extraction(
+        doc, [ContentType.TABLE], threshold=0.8, strategies=strategies, costs=StrategyCosts()
+    )
+    assert calls == ["first", "second"]
+    assert list(grid_data) == ["first", "second"]
+    assert report["skipped"] == ["fallback"]
+    assert report["best_score"] == score_grid(sparse)
+
+    calls.clear()
+    strategies[0] = _strategy("first", pd.DataFrame(), calls)
+    grid_data, report = plan_grid_extraction(
+        doc, [], threshold=0.8, strategies=strategies, costs=StrategyCosts()
+    )
+    assert calls == ["first", "fallback"]
+    assert list(grid_data) == ["fallback"]
+
+
+def test_default_strategies_on_a_listing_page():
+    for backend in ("bs4", "lxml"):
+        doc = ParsedDocument(listing_html, backend=backend)
+        grid_data, report = plan_grid_extraction(doc, [ContentType.DIV_GRID], threshold=1.1)
+        assert {entry["strategy"] for entry in report["ran"]} == {
+            "legacy", "universal", "advanced"
+        }
+        assert report["skipped"] == ["lenient"]
+        assert all(entry["seconds"] >= 0 for entry in report["ran"])
+
+
+def test_sections_do_not_depend_on_earlier_run_times():
+    doc = ParsedDocument(listing_html)
+    keys = []
+    for slowest in ("legacy", "universal", "advanced"):
+        # A history in which every other strategy looked cheaper
+        costs = StrategyCosts()
+        for name in ("legacy", "universal", "advanced"):
+            costs.record(name, 1.0 if name == slowest else 0.01)
+        grid_data, _ = plan_grid_extraction(
+            doc, [ContentType.DIV_GRID], threshold=0.0, costs=costs
+        )
+        keys.append(sorted(grid_data))
+    assert keys[0] == keys[1] == keys[2]
+    assert {"universal_grid", "advanced_grid"} <= set(keys[0])
+
+
+def test_requested_sections_are_never_stopped_early(monkeypatch):
+    costs = StrategyCosts()
+    costs.record("advanced", 0.01)
+    costs.record("universal", 1.0)
+    monkeypatch.setattr(grid_planner, "STRATEGY_COSTS", costs)
+    monkeypatch.setattr(grid_planner, "QUALITY_THRESHOLD", 0.0)
+    result = extract_structured_content(
+        listing_html, sections=["universal_grid", "advanced_grid", "grid_strategies"]
+    )
+    ran = [entry["strategy"] for entry in result["grid_strategies"]["ran"]]
+    assert ran == ["advanced", "universal"]
+
+    doc = ParsedDocument(listing_html)
+    requested = ["universal_grid", "advanced_grid"]
+    grid_data, report = plan_grid_extraction(
+        doc, [], threshold=0.0, costs=costs, sections=requested
+    )
+    assert set(requested) <= set(grid_data)
+    assert [entry["strategy"] for entry in report["ran"]] == ["advanced", "universal"]
+
+    # Only the combined listings asked for: the first good grid is enough
+    grid_data, report = plan_grid_extraction(
+        doc, [], threshold=0.0, costs=costs, sections=["listings", "advanced_grid"]
+    )
+    assert [entry["strategy"] for entry in report["ran"]] == ["advanced"]
+    assert report["skipped"] == ["universal", "lenient"]
+
+
+def test_shared_rows_are_built_before_the_timed_runs():
+    def run(doc):
+        # Already built by the planner, so not part of this run's time
+        doc.cached("grid_rows", lambda: pytest.fail("grid rows built in a run"))
+        return good, {"first": []}
+
+    doc = ParsedDocument(listing_html)
+    plan_grid_extraction(doc, [], strategies=[GridStrategy("first", run)])
+
+
+if __name__ == "__main__":
+    test_score_grid()
+    test_cheapest_first_and_early_stop()
+    test_low_quality_runs_everything_and_fallback_only_when_empty()
+    test_default_strategies_on_a_listing_page()
+    test_sections_do_not_depend_on_earlier_run_times()
+    test_shared_rows_are_built_before_the_timed_runs()
+    print("grid planner runs the cheapest good-enough strategies")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests for the disk-backed HTTP cache.
+Fresh pages are served from disk, stale ones are revalidated with their
+ETag and not downloaded again on 304, uncacheable responses are not kept,
+unknown charsets are read as utf-8, and the cache stays under its size
+cap by evicting the least recently used pages.
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import http_cache
+from core.http_cache import CachedResponse, HttpCache
+from core.http_client import aclose_http_client, close_http_client
+from services.universal_extractor import (
+    fetch_page_content,
+    fetch_page_content_async,
+    fetch_page_stream,
+    fetch_page_stream_async,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cache_control = "max-age=60"
+    vary = None
+    charset = "utf-8"
+    requests = []  # (path, If-None-Match) of every request
+    bodies_sent = [0]
+
+    def do_GET(self):
+        etag = f'"{self.path}"'
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", self.cache_control)
+            self.end_headers()
+            return
+        body = f"<html><body><p>page {self.path}</p></body></html>".encode()
+        self.bodies_sent[0] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", f"text/html; charset={self.charset}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", self.cache_control)
+        self.send_header("ETag", etag)
+        if self.vary:
+            self.send_header("Vary", self.vary)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "_cache", HttpCache(str(tmp_path), 1 << 20))
+    monkeypatch.setattr(_Handler, "cache_control", "max-age=60")
+    monkeypatch.setattr(_Handler, "vary", None)
+    monkeypatch.setattr(_Handler, "charset", "utf-8")
+    _Handler.requests.clear()
+    _Handler.bodies_sent[0] = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    close_http_client()
+    server.shutdown()
+
+
+def test_fresh_pages_come_from_disk(origin):
+    page = fetch_page_content(origin + "/a")
+    assert fetch_page_content(origin + "/a") == page
+    assert fetch_page_stream(origin + "/a").html == page
+    assert len(_Handler.requests) == 1
+
+
+def test_stale_pages_are_revalidated(origin, monkeypatch):
+    monkeypatch.setattr(_Handler, "cache_control", "no-cache")
+    page = fetch_page_content(origin + "/b")
+    assert fetch_page_content(origin + "/b") == page
+    assert fetch_page_stream(origin + "/b").html == page
+
+    async def fetch():
+        try:
+            return await fetch_page_content_async(origin + "/b")
+        finally:
+            await aclose_http_client()
+
+    assert asyncio.run(fetch()) == page
+    # Every request asked, but the body was only sent once
+    assert _Handler.requests == [("/b", None)] + [("/b", '"/b"')] * 3
+    assert _Handler.bodies_sent[0] == 1
+
+
+@pytest.mark.parametrize(
+    "cache_control, vary",
+    [("no-store", None), ("private, max-age=60", None), ("max-age=60", "*")],
+)
+def test_uncacheable_responses_are_not_kept(origin, monkeypatch, cache_control, vary):
+    monkeypatch.setattr(_Handler, "cache_control", cache_control)
+    monkeypatch.setattr(_Handler, "vary", vary)
+    fetch_page_content(origin + "/c")
+    fetch_page_content(origin + "/c")
+    assert _Handler.bodies_sent[0] == 2
+
+
+def test_variants_and_rotated_user_agents(origin, monkeypatch):
+    monkeypatch.setattr(_Handler, "vary", "User-Agent, Accept-Language")
+    fetch_page_content(origin + "/d")
+    fetch_page_content(origin + "/d")
+    assert _Handler.bodies_sent[0] == 1
+    cache = http_cache.get_http_cache()
+    assert cache.lookup(origin + "/d", {"Accept-Language": "fr"}) is None
+
+
+def test_variants_are_kept_side_by_side(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=1 << 20)
+    headers = {"Cache-Control": "max-age=60", "Vary": "Accept-Language"}
+    for language in ("en", "fr"):
+        request = {"Accept-Language": language}
+        body = f"hello in {language}".encode()
+        cache.store("http://x/v", request, 200, headers, body, "utf-8")
+    assert cache.lookup("http://x/v", {"Accept-Language": "en"}).body == b"hello in en"
+    assert cache.lookup("http://x/v", {"Accept-Language": "fr"}).body == b"hello in fr"
+    assert cache.lookup("http://x/v", {"Accept-Language": "de"}) is None
+    # A new process finds the Vary names of the URL on disk
+    reopened = HttpCache(str(tmp_path), max_bytes=1 << 20)
+    french = reopened.lookup("http://x/v", {"accept-language": "fr"})
+    assert french.body == b"hello in fr"
+
+
+def test_unknown_charsets_fall_back_to_utf8(origin, monkeypatch):
+    monkeypatch.setattr(_Handler, "charset", "x-unknown-enc")
+    page = fetch_page_stream(origin + "/e").html
+    assert "page /e" in page
+    # The cached copy is stored with the charset it was decoded with
+    assert fetch_page_stream(origin + "/e").html == page
+    assert fetch_page_content(origin + "/e") == page
+    assert _Handler.bodies_sent[0] == 1
+
+    async def fetch():
+        try:
+            return (await fetch_page_stream_async(origin + "/f")).html
+        finally:
+            await aclose_http_client()
+
+    assert "page /f" in asyncio.run(fetch())
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=250)
+    headers = {"Cache-Control": "max-age=60"}
+    for name in "abc":
+        cache.store(f"http://x/{name}", {}, 200, headers, b"x" * 100, "utf-8")
+        if name == "b":
+            # Touch "a": "b" becomes the least recently used page
+            time.sleep(0.01)
+            assert cache.lookup("http://x/a", {}) is not None
+    assert cache.total_bytes() == 200
+    assert cache.lookup("http://x/b", {}) is None
+    # The index is rebuilt from disk by a new process
+    reopened = HttpCache(str(tmp_path), max_bytes=250)
+    assert reopened.total_bytes() == 200
+    assert reopened.lookup("http://x/c", {}).body == b"x" * 100
+
+
+def test_age_counts_towards_freshness(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=1 << 20)
+    headers = {"Cache-Control": "max-age=60", "Age": "59"}
+    cache.store("http://x/old", {}, 200, headers, b"old", "utf-8")
+    entry = cache.lookup("http://x/old", {})
+    assert entry.is_fresh(entry.stored_at + 0.5)
+    assert not entry.is_fresh(entry.stored_at + 30)
+    # Revalidated without an Age: fresh for the whole max-age again
+    entry = cache.revalidated(entry, {"Cache-Control": "max-age=60"})
+    assert entry.is_fresh(entry.stored_at + 30)
+
+
+def test_freshness_lifetime():
+    now = time.time()
+
+    def entry(**headers):
+        return CachedResponse("k", "u", headers, "utf-8", now, 0)
+
+    shared = entry(**{"cache-control": "max-age=10, s-maxage=30"})
+    assert shared.freshness_lifetime() == 30
+    assert entry(**{"cache-control": "max-age=10"}).is_fresh(now + 9)
+    assert not entry(**{"cache-control": "max-age=10", "age": "5"}).is_fresh(now + 6)
+    expires = entry(date=formatdate(now), expires=formatdate(now + 60))
+    assert expires.freshness_lifetime() == 60
+    assert entry(expires="0").freshness_lifetime() == 0
+    # A tenth of the time since the last change
+    modified = entry(**{"last-modified": formatdate(now - 1000)})
+    assert modified.freshness_lifetime() == pytest.approx(100, abs=1)
+    assert entry(etag='"v1"').freshness_lifetime() == 0
+
+
+if __name__ == "__main__":
+    test_freshness_lifetime()
+    print("cache freshness rules hold")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared HTTP client.
+Requests to one host reuse a kept-alive connection, at most
+HTTP_MAX_CONNECTIONS_PER_HOST requests per host are in flight (slots are
+only kept while in use), and the client can be closed and started again.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core import http_client
+from core.http_client import (
+    async_host_slot,
+    close_http_client,
+    get_http_client,
+    host_slot,
+)
+from services.universal_extractor import fetch_page_content
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open
+    peers = []
+
+    def do_GET(self):
+        self.peers.append(self.client_address)
+        body = b"<html><body><p>ok</p></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_connections_are_kept_alive():
+    server, url = _serve()
+    _Handler.peers.clear()
+    try:
+        for _ in range(5):
+            assert "ok" in fetch_page_content(url)
+        # Every request came in over the same connection
+        assert len(set(_Handler.peers)) == 1
+        client = get_http_client()
+        assert get_http_client() is client
+        close_http_client()
+        assert client.is_closed
+        assert get_http_client() is not client
+    finally:
+        close_http_client()
+        server.shutdown()
+
+
+def test_requests_per_host_are_limited(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_MAX_CONNECTIONS_PER_HOST", 2)
+    monkeypatch.setattr(http_client, "_host_slots", {})
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def request(url):
+        with host_slot(url):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    urls = ["http://a.example/1"] * 6
+    threads = [threading.Thread(target=request, args=(url,)) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 2
+    # Slots are dropped once nobody uses them
+    assert http_client._host_slots == {}
+
+
+def test_host_slots_are_only_kept_while_in_use(monkeypatch):
+    monkeypatch.setattr(http_client, "_async_host_slots", {})
+
+    async def run():
+        async with async_host_slot("http://a.example/"):
+            async with async_host_slot("http://a.example/"):
+                assert http_client._async_host_slots["a.example"][1] == 2
+            assert set(http_client._async_host_slots) == {"a.example"}
+        for i in range(100):
+            async with async_host_slot(f"http://{i}.example/"):
+                pass
+
+    asyncio.run(run())
+    assert http_client._async_host_slots == {}
+
+
+if __name__ == "__main__":
+    test_connections_are_kept_alive()
+    print("the shared HTTP client keeps connections alive")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for embedded hydration state: JSON shipped in the page for its
+scripts is found, and its record collections come out as tables without
+rendering the page.
+"""
+
+import json
+
+import pytest
+
+from core.content_classifier import classify_content_type
+from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.extractor_router import extract_structured_content
+from core.fetch_router import detect_client_rendered
+from core.hydration import find_state_blobs, hydration_tables
+
+PRODUCTS = [
+    {
+        "id": i,
+        "name": f"Laptop {i}",
+        "price": {"amount": 999 + i, "currency": "USD"},
+        "tags": [{"label": "new"}, {"label": "sale"}],
+    }
+    for i in range(4)
+]
+
+NEXT_DATA = {
+    "props": {"pageProps": {"products": PRODUCTS, "title": "Laptops"}},
+    "page": "/laptops",
+    "query": {},
+    "buildId": "abc",
+}
+
+NEXT_PAGE = f"""<html><head><title>Laptops</title></head><body>
+<div id="__next"></div>
+<script id="__NEXT_DATA__" type="application/json">{json.dumps(NEXT_DATA)}</script>
+<script src="/_next/static/chunks/main.js"></script>
+</body></html>"""
+
+
+def _page(script: str) -> str:
+    return f"<html><body><div id='app'></div><script>{script}</script></body></html>"
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_next_data_products_become_a_table(backend):
+    doc = ParsedDocument(NEXT_PAGE, backend=backend)
+    assert ContentType.HYDRATION_STATE in classify_content_type(doc)
+
+    tables = hydration_tables(doc)
+    assert [(t["source"], t["path"]) for t in tables] == [
+        ("__NEXT_DATA__", "props.pageProps.products")
+    ]
+    rows = tables[0]["rows"]
+    assert len(rows) == 4
+    assert rows[0]["name"] == "Laptop 0"
+    assert rows[0]["price_amount"] == 999
+    # The tags inside each product are not a table of their own
+    assert all(t["path"] != "props.pageProps.products[0].tags" for t in tables)
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml"])
+def test_window_assignments_are_decoded(backend):
+    state = {"catalog": {"items": PRODUCTS}}
+    assigned = _page(f"window.__INITIAL_STATE__ = {json.dumps(state)};")
+    parsed = _page(
+        f'window["__NUXT__"] = JSON.parse({json.dumps(json.dumps(state))});'
+    )
+
+    for html, name in ((assigned, "__INITIAL_STATE__"), (parsed, "__NUXT__")):
+        doc = ParsedDocument(html, backend=backend)
+        assert find_state_blobs(doc) == [(name, state)]
+        assert [t["path"] for t in hydration_tables(doc)] == ["catalog.items"]
+
+
+def test_scripts_are_found_through_the_index(monkeypatch):
+    doc = ParsedDocument(NEXT_PAGE)
+    doc.index
+
+    def walk(*args, **kwargs):
+        raise AssertionError("the tree was walked again")
+
+    # Classification and extraction reuse the index instead
+    monkeypatch.setattr(doc.soup, "find_all", walk)
+    assert ContentType.HYDRATION_STATE in classify_content_type(doc)
+    assert [name for name, _ in find_state_blobs(doc)] == ["__NEXT_DATA__"]
+
+
+def test_javascript_that_is_not_json_is_skipped():
+    html = _page(
+        "window.__STATE__ = {items: [1, 2, 3]};"
+        "window.config = loadConfig();"
+        "var x = 1;"
+    )
+    doc = ParsedDocument(html)
+    assert find_state_blobs(doc) == []
+    assert hydration_tables(doc) == []
+    # Not JSON at all
+    broken = '<script id="data" type="application/json">{not json</script>'
+    assert find_state_blobs(f"<html><body>{broken}</body></html>") == []
+
+
+def test_normalized_stores_are_split_by_typename():
+    store = {
+        "ROOT_QUERY": {"__typename": "Query", "products": []},
+        **{
+            f"Product:{i}": {"__typename": "Product", "id": i, "name": f"P{i}"}
+            for i in range(3)
+        },
+        **{
+            f"Review:{i}": {"__typename": "Review", "id": i, "stars": i + 1}
+            for i in range(5)
+        },
+    }
+    html = _page(f"window.__APOLLO_STATE__ = {json.dumps(store)};")
+    tables = hydration_tables(html)
+    assert [(t["path"], len(t["rows"])) for t in tables] == [
+        ("[Review]", 5),
+        ("[Product]", 3),
+    ]
+    assert hydration_tables(html, max_tables=1)[0]["path"] == "[Review]"
+
+
+def test_state_tables_section_and_auto_fetch():
+    result = extract_structured_content(NEXT_PAGE, sections=["state_tables"])
+    assert set(result) == {"state_tables"}
+    assert result["state_tables"][0]["rows"][3]["name"] == "Laptop 3"
+
+    columnar = extract_structured_content(
+        NEXT_PAGE, sections=["state_tables"], table_format="columnar"
+    )
+    assert columnar["state_tables"][0]["rows"]["rows"] == 4
+
+    # An app shell with its data embedded needs no browser, one without does
+    assert detect_client_rendered(ParsedDocument(NEXT_PAGE)) is None
+    empty = NEXT_PAGE.replace(json.dumps(NEXT_DATA), json.dumps({"page": "/"}))
+    assert "#__next" in detect_client_rendered(ParsedDocument(empty))
+
+
+if __name__ == "__main__":
+    test_next_data_products_become_a_table("bs4")
+    test_window_assignments_are_decoded("bs4")
+    test_normalized_stores_are_split_by_typename()
+    test_state_tables_section_and_auto_fetch()
+    print("embedded state is extracted")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the iterative JSON-LD normalizer.
+Small payloads must normalize exactly as the recursive version did, while
+deep and wide catalogs stay within the depth and column limits.
+"""
+
+import json
+
+from core.jsonld import (
+    flatten_dict,
+    jsonld_items,
+    normalize_jsonld_items,
+    parse_json_ld,
+    select_columns,
+)
+
+
+def _reference_flatten(d, parent_key="", sep="_"):
+    items = []
+    for k, v in d.items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if isinstance(v, dict):
+            items.extend(_reference_flatten(v, new_key, sep=sep).items())
+        elif isinstance(v, list):
+            if all(isinstance(i, dict) for i in v):
+                for idx, subdict in enumerate(v):
+                    items.extend(
+                        _reference_flatten(subdict, f"{new_key}{sep}{idx}", sep=sep).items()
+                    )
+            else:
+                items.append((new_key, ", ".join(str(i) for i in v)))
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def _reference_items(blocks):
+    flat = [b for b in blocks if isinstance(b, dict)]
+    return [
+        item
+        for block in flat
+        for item in (
+            block.get("itemListElement", []) if block.get("@type") == "ItemList" else [block]
+        )
+        if isinstance(item, dict)
+        and (item.get("@type") != "ListItem" or "item" not in item or isinstance(item["item"], dict))
+    ] + [
+        item["item"]
+        for block in flat
+        if block.get("@type") == "ItemList"
+        for item in block.get("itemListElement", [])
+        if isinstance(item, dict) and "item" in item and isinstance(item["item"], dict)
+    ]
+
+
+product = {
+    "@type": "Product",
+    "name": "Desk",
+    "image": ["a.jpg", "b.jpg"],
+    "brand": {"@type": "Brand", "name": "Acme"},
+    "offers": [
+        {"@type": "Offer", "price": 120, "seller": {"name": "Shop", "address": {"city": "Oslo"}}},
+        {"@type": "Offer", "price": 110},
+    ],
+    "review": [],
+}
+
+blocks = [
+    product,
+    {"@type": "ItemList", "itemListElement": [
+        {"@type": "ListItem", "position": 1, "item": {"@type": "Product", "name": "Chair"}},
+        {"@type": "ListItem", "position": 2, "item": "https://example.com/lamp"},
+        {"@type": "ListItem", "position": 3, "url": "https://example.com/rug"},
+        {"@type": "Product", "name": "Shelf"},
+        "junk",
+    ]},
+    {"@type": "WebPage", "name": "-"},
+    ["not", "a", "block"],
+]
+
+
+def test_matches_recursive_version():
+    assert flatten_dict(product) == _reference_flatten(product)
+    assert list(flatten_dict(product)) == list(_reference_flatten(product))
+    assert jsonld_items(blocks) == _reference_items(blocks)
+
+
+def _chain(depth):
+    root = {"name": "root"}
+    node = root
+    for _ in range(depth):
+        node["child"] = {"value": 1}
+        node = node["child"]
+    return root
+
+
+def test_depth_limit_keeps_deep_objects_as_json():
+    flat = flatten_dict(_chain(50), max_depth=3)
+    assert flat["name"] == "root"
+    assert flat["child_child_child_value"] == 1
+    assert json.loads(flat["child_child_child_child"])["value"] == 1
+    assert len(flat) == 5
+    # Far deeper than the recursion limit
+    assert len(flatten_dict(_chain(5000), max_depth=10**6)) == 5001
+
+
+def test_wide_items_keep_schema_org_columns_first():
+    item = {f"extra{i}": i for i in range(50)}
+    item.update({"name": "Desk", "offers": {"price": 120}, "@type": "Product"})
+    row = select_columns(flatten_dict(item), max_columns=4)
+    assert list(row) == ["extra0", "name", "offers_price", "@type"]
+    rows = normalize_jsonld_items([item, {"name": "-"}], max_columns=10)
+    assert len(rows) == 1 and len(rows[0]) == 10
+
+
+def test_parse_json_ld():
+    assert parse_json_ld('{"a": [1, 2.5, "x"]}') == {"a": [1, 2.5, "x"]}
+    # Accepted by the standard library, rejected by orjson
+    assert parse_json_ld('{"a": NaN}')["a"] != 0
+
+
+if __name__ == "__main__":
+    test_matches_recursive_version()
+    test_depth_limit_keeps_deep_objects_as_json()
+    test_wide_items_keep_schema_org_columns_first()
+    test_parse_json_ld()
+    print("JSON-LD normalization is bounded and unchanged for small payloads")
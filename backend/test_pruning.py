@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for parse-time pruning of unwanted blocks.
+Dropping blocks while the tree is built must leave exactly the tree that
+building everything and decomposing the matches afterwards leaves.
+"""
+
+from bs4 import BeautifulSoup
+
+from core.document import ParsedDocument
+from core.dom_index import DomIndex
+from core.filter_engine import remove_unwanted_blocks
+from core.pruning import DEFAULT_PRUNE_RULES, UNWANTED_CLASSES, PruneRules
+from test_lxml_engine import _random_page, fixtures
+
+news_html = """
+<html><body>
+  <div class="header">Site <a href="/">Home</a></div>
+  <div class="story">Lead <div class="ad">Buy now</div> text <p>more</p></div>
+  <div id="cookie-banner">We use cookies</div>
+  <aside>Related</aside>
+  <div class="footer">Contact</div>
+</body></html>
+"""
+
+
+def _decomposed(html: str) -> BeautifulSoup:
+    soup = BeautifulSoup(html, "lxml")
+    for cls in UNWANTED_CLASSES:
+        for tag in soup.select(f".{cls}"):
+            tag.decompose()
+    return soup
+
+
+def _texts(root) -> list:
+    index = DomIndex.build(root)
+    return [(index.tags[i], index.text(i)) for i in range(len(index))]
+
+
+def test_parse_time_pruning_matches_decompose():
+    for html in fixtures + [news_html] + [_random_page(seed) for seed in range(150)]:
+        expected = _decomposed(html)
+        soup = ParsedDocument(html, backend="bs4", prune=DEFAULT_PRUNE_RULES).soup
+        tree = ParsedDocument(html, backend="lxml", prune=DEFAULT_PRUNE_RULES).tree
+        assert str(soup) == str(expected)
+        assert _texts(soup) == _texts(expected) == _texts(tree)
+
+
+def test_custom_rules():
+    rules = PruneRules(classes=["ad"], tags=["aside"], ids=["cookie-banner"])
+    for backend in ("bs4", "lxml"):
+        doc = ParsedDocument(news_html, backend=backend, prune=rules)
+        assert doc.index.text(0) == "SiteHomeLeadtextmoreContact"
+        assert doc.pruned is rules
+
+
+def test_remove_unwanted_blocks_skips_pruned_documents():
+    for backend in ("bs4", "lxml"):
+        pruned = ParsedDocument(news_html, backend=backend, prune=DEFAULT_PRUNE_RULES)
+        index = pruned.index
+        remove_unwanted_blocks(pruned)
+        assert pruned.index is index
+
+        doc = ParsedDocument(news_html, backend=backend)
+        remove_unwanted_blocks(doc)
+        assert _texts(doc.root) == _texts(pruned.root)
+
+
+if __name__ == "__main__":
+    test_parse_time_pruning_matches_decompose()
+    test_custom_rules()
+    test_remove_unwanted_blocks_skips_pruned_documents()
+    print("parse-time pruning matches decompose")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-host token-bucket rate limiter.
+Hosts are limited independently, waiting never holds the lock,
+throttled responses hold back only their own host, and idle hosts are
+forgotten.
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from core.network_utils import (
+    HostRateLimiter,
+    SimpleRateLimiter,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def test_bucket_reservations_queue_up():
+    bucket = TokenBucket(rate=10, capacity=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.09 < waits[2] <= 0.1 and 0.19 < waits[3] <= 0.2
+    bucket.block_for(5)
+    assert bucket.reserve() > 4.9
+
+
+def test_callers_are_spread_out_after_a_block():
+    bucket = TokenBucket(rate=5, capacity=5)
+    bucket.block_for(2)
+    waits = [bucket.reserve() for _ in range(12)]
+    # One at the end of the block, then one per 1/rate: no burst
+    for i, wait in enumerate(waits):
+        assert 2 + i * 0.2 - 0.05 < wait <= 2 + i * 0.2
+
+
+def test_hosts_are_limited_independently():
+    limiter = HostRateLimiter(rate=10, burst=1)
+    limiter.acquire("https://a.example/1")
+    start = time.monotonic()
+    limiter.acquire("https://b.example/1")
+    assert time.monotonic() - start < 0.05
+    limiter.acquire("https://a.example/2")
+    assert time.monotonic() - start >= 0.08
+
+
+def test_waiting_does_not_hold_the_lock():
+    limiter = SimpleRateLimiter(max_calls=1, period=0.3)
+    limiter.acquire()
+    sleeper = threading.Thread(target=limiter.acquire)
+    sleeper.start()
+    time.sleep(0.05)
+    # The lock is free while the other thread sleeps
+    assert limiter.bucket.lock.acquire(timeout=0.01)
+    limiter.bucket.lock.release()
+    sleeper.join()
+
+
+def test_async_acquire_leaves_the_loop_free():
+    limiter = HostRateLimiter(rate=5, burst=1)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        for _ in range(2):
+            await limiter.acquire_async("https://a.example/")
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+
+
+def test_throttled_host_backs_off():
+    limiter = HostRateLimiter(rate=100, burst=10, backoff=0.5, max_backoff=2)
+    limiter.observe("https://slow.example/a", 429, "30")
+    assert limiter.bucket("https://slow.example/b").reserve() > 1.9  # capped
+    assert limiter.bucket("https://fast.example/").reserve() == 0.0
+
+    limiter.observe("https://other.example/", 503)
+    first = limiter.bucket("https://other.example/").reserve()
+    limiter.observe("https://other.example/", 429)
+    second = limiter.bucket("https://other.example/").reserve()
+    # The second reservation queues behind the first after the new block
+    assert 0.4 < first <= 0.5 and 0.9 < second <= 1.01
+    limiter.observe("https://other.example/", 200)
+    assert limiter._throttled == {"slow.example": 1}
+
+
+def test_idle_hosts_are_forgotten():
+    limiter = HostRateLimiter(rate=1000, burst=1, max_hosts=2)
+    limiter.observe("https://slow.example/", 429, "30")
+    for i in range(10):
+        limiter.bucket(f"https://{i}.example/").reserve()
+    time.sleep(0.01)
+    limiter.bucket("https://last.example/")
+    # The blocked host is kept, however long ago it was used
+    assert set(limiter._buckets) == {"slow.example", "last.example"}
+    assert limiter.bucket("https://slow.example/").reserve() > 29
+    assert limiter._throttled == {"slow.example": 1}
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 55 < parse_retry_after(format_datetime(later, usegmt=True)) <= 60
+
+
+if __name__ == "__main__":
+    test_bucket_reservations_queue_up()
+    test_callers_are_spread_out_after_a_block()
+    test_hosts_are_limited_independently()
+    test_waiting_does_not_hold_the_lock()
+    test_async_acquire_leaves_the_loop_free()
+    test_throttled_host_backs_off()
+    test_idle_hosts_are_forgotten()
+    test_parse_retry_after()
+    print("per-host rate limiting works")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for browser rendering with a render profile, driven by a stand-in
+page. Blocked resource types and URL patterns are aborted (never the page
+itself), the page waits for its DOM to settle instead of a fixed sleep,
+and the render timing is reported.
+"""
+
+import pytest
+
+from core.network_utils import HostRateLimiter
+from services import browser_pool, playwright_scraper
+from services.browser_pool import BrowserPool
+from services.playwright_scraper import (
+    DEFAULT_RENDER_PROFILE,
+    RenderProfile,
+    render_page,
+)
+
+# (resource type, URL, navigation request) the stand-in page loads
+_REQUESTS = [
+    ("document", "https://shop.example/", True),
+    ("script", "https://shop.example/app.js", False),
+    ("image", "https://shop.example/hero.jpg", False),
+    ("font", "https://fonts.example/a.woff2", False),
+    ("script", "https://www.googletagmanager.com/gtm.js", False),
+]
+
+
+class _Request:
+    def __init__(self, resource_type, url, navigation):
+        self.resource_type = resource_type
+        self.url = url
+        self.navigation = navigation
+
+    def is_navigation_request(self):
+        return self.navigation
+
+
+class _Route:
+    def __init__(self, request, outcomes):
+        self.request = request
+        self.outcomes = outcomes
+
+    async def abort(self):
+        self.outcomes[self.request.url] = "aborted"
+
+    async def continue_(self):
+        self.outcomes[self.request.url] = "loaded"
+
+
+class _Response:
+    def __init__(self, url):
+        throttled = "throttled" in url
+        self.status = 429 if throttled else 200
+        self.headers = {"retry-after": "30"} if throttled else {}
+
+
+class _Page:
+    def __init__(self):
+        self.handler = None
+        self.outcomes = {}
+        self.scripts = []
+
+    def on(self, event, handler):
+        pass
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    async def goto(self, url, timeout=None, wait_until=None):
+        self.wait_until = wait_until
+        for request in _REQUESTS:
+            if self.handler is None:
+                self.outcomes[request[1]] = "loaded"
+            else:
+                await self.handler(_Route(_Request(*request), self.outcomes))
+        return _Response(url)
+
+    async def evaluate(self, script, arg=None):
+        self.scripts.append((script, arg))
+        if arg is not None:
+            return {"settled": True, "ms": 12.5}
+
+    async def content(self):
+        return "<html><body>rendered</body></html>"
+
+    async def close(self):
+        pass
+
+
+class _Context:
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def new_page(self):
+        self.pages.append(_Page())
+        return self.pages[-1]
+
+    async def clear_cookies(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    pages = []
+
+    class Browser:
+        def is_connected(self):
+            return True
+
+        async def new_context(self, user_agent=None, **options):
+            return _Context(pages)
+
+        async def close(self):
+            pass
+
+    class Playwright:
+        async def stop(self):
+            pass
+
+    async def launch(_):
+        return Browser()
+
+    async def start():
+        return Playwright()
+
+    pool = BrowserPool(launch=launch, start_playwright=start)
+    monkeypatch.setattr(browser_pool, "_pool", pool)
+    yield pages
+    pool.close()
+
+
+def test_blocked_requests_are_aborted(pages):
+    rendered = render_page("https://shop.example/")
+    assert rendered.html == "<html><body>rendered</body></html>"
+    assert pages[0].outcomes == {
+        "https://shop.example/": "loaded",
+        "https://shop.example/app.js": "loaded",
+        "https://shop.example/hero.jpg": "aborted",
+        "https://fonts.example/a.woff2": "aborted",
+        "https://www.googletagmanager.com/gtm.js": "aborted",
+    }
+    # Client-rendered pages are only read once their data requests are done
+    assert pages[0].wait_until == "networkidle"
+    assert rendered.timing["blocked_requests"] == 3
+    assert rendered.timing["settled"] is True
+    assert set(rendered.timing) == {
+        "navigate_ms", "settle_ms", "total_ms", "settled", "blocked_requests"
+    }
+    assert rendered.server_timing().startswith("navigate;dur=")
+
+
+def test_profiles_are_configurable(pages):
+    profile = RenderProfile(
+        blocked_url_patterns=["/app.js"],
+        wait_until="load",
+        quiet_ms=200,
+        max_wait_ms=1000,
+        scroll=False,
+    )
+    rendered = render_page("https://shop.example/", profile=profile)
+    assert rendered.timing["blocked_requests"] == 1
+    assert pages[0].wait_until == "load"
+    # No scrolling, only the settle wait with the profile's budget
+    assert [arg for _, arg in pages[0].scripts] == [[200, 1000]]
+
+    render_page("https://shop.example/", profile=RenderProfile())
+    assert set(pages[1].outcomes.values()) == {"loaded"}
+
+
+def test_renders_go_through_the_host_limiter(pages, monkeypatch):
+    limiter = HostRateLimiter(rate=100, burst=10, max_backoff=5)
+    monkeypatch.setattr(playwright_scraper, "host_rate_limiter", limiter)
+    render_page("https://throttled.example/")
+    render_page("https://shop.example/")
+    # A 429 from the browser holds back that host for later fetches
+    assert limiter.bucket("https://throttled.example/x").reserve() > 4.9
+    assert limiter.bucket("https://shop.example/x").reserve() == 0.0
+
+
+def test_default_profile_blocks():
+    assert DEFAULT_RENDER_PROFILE.blocks("media", "https://a.example/v.mp4")
+    assert DEFAULT_RENDER_PROFILE.blocks("xhr", "https://x.doubleclick.net/p")
+    assert not DEFAULT_RENDER_PROFILE.blocks("xhr", "https://a.example/api")
+
+
+if __name__ == "__main__":
+    test_default_profile_blocks()
+    print("the default render profile blocks media and trackers")
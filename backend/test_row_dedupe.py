@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for fingerprint-based row deduplication.
+Exact duplicates are found regardless of column naming and spacing, but
+not across value order; near-duplicates only below a similarity threshold
+of 1, which is the default.
+"""
+
+from core.row_dedupe import dedupe_rows, exact_fingerprint, row_tokens, simhash
+
+description = "Solid oak writing desk with two drawers and brass handles, 120 cm wide"
+
+
+def test_exact_duplicates_ignore_naming_and_spacing():
+    rows = [
+        {"title": "Oak  Desk", "price": "$120"},
+        {"Product Name": "oak desk", "Price": " $120 "},
+        {"home": "Arsenal", "away": "Chelsea"},
+        {"home": "Chelsea", "away": "Arsenal"},
+        {"title": "", "price": None},
+        {},
+    ]
+    kept, report = dedupe_rows(rows)
+    assert kept == [rows[0], rows[2], rows[3], rows[4]]
+    assert report == {"threshold": 1.0, "exact_duplicates": 2, "near_duplicates": 0}
+
+
+def test_rows_differing_in_one_value_are_kept_by_default():
+    rows = [{"title": description, "price": f"${100 + i}"} for i in range(200)]
+    kept, report = dedupe_rows(rows)
+    assert kept == rows and report["near_duplicates"] == 0
+
+
+def test_near_duplicates_below_threshold():
+    rows = [
+        {"text": description, "price": "$120"},
+        {"text": description + " in stock", "price": "$120"},
+        {"text": "Pine bookshelf with five shelves, 180 cm tall", "price": "$95"},
+    ]
+    a, b = (simhash(row_tokens(row)) for row in rows[:2])
+    assert bin(a ^ b).count("1") <= 8
+    kept, report = dedupe_rows(rows, threshold=0.85)
+    assert kept == [rows[0], rows[2]]
+    assert report["near_duplicates"] == 1
+    kept, report = dedupe_rows(rows, threshold=1.0)
+    assert kept == rows
+    assert report["near_duplicates"] == 0
+
+
+def test_fingerprints_are_stable():
+    tokens = row_tokens({"title": "Desk", "price": 120})
+    assert tokens == ["desk", "120"]
+    assert exact_fingerprint(tokens) != exact_fingerprint(list(reversed(tokens)))
+    assert simhash(tokens) == simhash(["desk", "120"])
+    assert exact_fingerprint(tokens) < 2**64 and simhash(tokens) < 2**64
+
+
+if __name__ == "__main__":
+    test_exact_duplicates_ignore_naming_and_spacing()
+    test_rows_differing_in_one_value_are_kept_by_default()
+    test_near_duplicates_below_threshold()
+    test_fingerprints_are_stable()
+    print("row deduplication drops exact and near duplicates")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for opt-in result sections.
+Only the requested sections are computed and returned, and they hold the
+same values as in a full extraction.
+"""
+
+import pytest
+
+from core.content_types import ContentType
+from core.document import ParsedDocument
+from core.grid_planner import StrategyCosts, plan_grid_extraction
+from core.sections import RESULT_SECTIONS, resolve_sections
+from test_lxml_engine import _structured, fixtures, listing_html
+
+
+def test_resolve_sections():
+    assert resolve_sections() == frozenset(RESULT_SECTIONS)
+    assert resolve_sections(["tables", "listings"], ["listings"]) == {"tables"}
+    assert "raw_html" not in resolve_sections(exclude=["raw_html"])
+    with pytest.raises(ValueError):
+        resolve_sections(["tabels"])
+
+
+def test_only_requested_sections_are_returned():
+    for html in fixtures:
+        full = _structured(html)
+        for sections in (["tables"], ["json_ld"], ["json_ld", "normalized_jsonld"], ["raw_html"]):
+            result = _structured(html, sections=sections)
+            assert set(result) == set(sections) & set(full)
+            assert all(result[key] == full[key] for key in result)
+        assert "raw_html" not in _structured(html, sections=resolve_sections(exclude=["raw_html"]))
+
+
+def test_unrequested_grid_strategies_are_skipped():
+    doc = ParsedDocument(listing_html)
+    _, report = plan_grid_extraction(
+        doc, [ContentType.DIV_GRID], threshold=1.1, costs=StrategyCosts(), sections=["advanced_grid"]
+    )
+    assert [entry["strategy"] for entry in report["ran"]] == ["advanced"]
+    assert sorted(report["skipped"]) == ["legacy", "lenient", "universal"]
+
+    result = _structured(listing_html, sections=["tables"])
+    assert list(result) == ["tables"]
+
+
+if __name__ == "__main__":
+    test_resolve_sections()
+    test_only_requested_sections_are_returned()
+    test_unrequested_grid_strategies_are_skipped()
+    print("only the requested sections are extracted")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for single-pass JSON encoding of extraction results.
+NaN and infinities must come out as null, and the encoding must match what
+the standard library produces for the same (cleaned) data.
+"""
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.serialization import dumps_json
+from test_lxml_engine import _structured, fixtures
+
+
+def _nan_to_none(obj):
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_nan_to_none(v) for v in obj]
+    if isinstance(obj, float) and (math.isnan(obj) or math.isinf(obj)):
+        return None
+    return obj
+
+
+def test_missing_values_become_null():
+    data = {
+        "price": float("nan"),
+        "rows": [float("inf"), -float("inf"), np.float64("nan"), pd.NaT, pd.NA],
+        "count": np.int64(3),
+        "values": np.array([1.5, np.nan]),
+    }
+    assert json.loads(dumps_json(data)) == {
+        "price": None,
+        "rows": [None, None, None, None, None],
+        "count": 3,
+        "values": [1.5, None],
+    }
+
+
+def test_results_encode_like_json_dumps():
+    for html in fixtures:
+        result = _structured(html)
+        expected = json.dumps(_nan_to_none(result), allow_nan=False)
+        assert json.loads(dumps_json(result)) == json.loads(expected)
+
+
+if __name__ == "__main__":
+    test_missing_values_become_null()
+    test_results_encode_like_json_dumps()
+    print("extraction results encode in one pass")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming parse mode.
+Chunked parsing must build the same tree as a one-shot parse, report
+JSON-LD and tables as soon as they close, and honour the byte cap.
+"""
+
+from lxml import etree
+
+from core.document import parse_lxml
+from core.stream_parser import StreamingParser
+from test_lxml_engine import _structured, fixtures, listing_html
+
+
+def _stream(html: str, chunk_size: int = 7, **kwargs) -> StreamingParser:
+    parser = StreamingParser(url="https://example.com", **kwargs)
+    data = html.encode("utf-8")
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser
+
+
+def test_chunked_parse_matches_full_parse():
+    pages = fixtures + ["", "<p>café – über</p>"]
+    for html in pages:
+        doc = _stream(html).close()
+        assert doc.is_lxml and doc.html == html
+        assert etree.tostring(doc.tree) == etree.tostring(parse_lxml(html))
+    for html in fixtures:
+        assert _structured(_stream(html).close()) == (
+            _structured(html, url="https://example.com", backend="lxml")
+        )
+
+
+def test_events_arrive_before_the_page_ends():
+    seen = []
+    parser = StreamingParser(on_event=lambda kind, payload: seen.append(kind))
+    data = listing_html.encode("utf-8")
+    table_end = data.index(b"</table>") + len(b"</table>")
+
+    parser.feed(data[:table_end + 1])
+    assert seen == ["json_ld", "table"]
+    assert list(parser.events[1][1].columns) == ["Model", "Price"]
+
+    parser.feed(data[table_end + 1:])
+    parser.close()
+    assert seen == ["json_ld", "table"]
+
+
+def test_byte_cap_truncates_the_body():
+    html = "<html><body>" + "<p>filler</p>" * 1000 + "<table><tr><td>1</td></tr></table></body></html>"
+    seen = []
+    parser = _stream(
+        html,
+        chunk_size=1000,
+        max_bytes=2048,
+        on_event=lambda kind, payload: seen.append(kind),
+    )
+    doc = parser.close()
+    assert parser.truncated and parser.bytes_read == 2048
+    assert len(doc.html) == 2048
+    assert "table" not in seen
+
+
+def test_nothing_is_parsed_early_without_a_callback():
+    parser = _stream(listing_html)
+    doc = parser.close()
+    assert parser.events == []
+    assert len(doc.tree.xpath("//table")) == 1
+
+
+if __name__ == "__main__":
+    test_chunked_parse_matches_full_parse()
+    test_events_arrive_before_the_page_ends()
+    test_byte_cap_truncates_the_body()
+    test_nothing_is_parsed_early_without_a_callback()
+    print("streaming parser matches the one-shot parse")
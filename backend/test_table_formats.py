@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar and Arrow table formats.
+Both must hold exactly the rows of the default record layout, and the
+format can be picked from the Accept header.
+"""
+
+import base64
+import json
+
+import pandas as pd
+import pyarrow as pa
+
+from core.serialization import dumps_json
+from core.table_formats import (
+    JSON_MEDIA_TYPES,
+    ROW_SECTIONS,
+    accepts,
+    frame_to_table,
+    negotiate_table_format,
+    records_to_table,
+)
+from test_lxml_engine import _random_page, _structured, fixtures
+
+
+def _columnar_rows(table: dict) -> list:
+    return [dict(zip(table["columns"], row)) for row in zip(*table["data"])]
+
+
+def _arrow_rows(encoded: str) -> list:
+    reader = pa.ipc.open_stream(base64.b64decode(encoded))
+    return reader.read_all().to_pylist()
+
+
+def _decoded(result) -> dict:
+    # Compare what the client receives: NaN is null once encoded
+    return json.loads(dumps_json(result))
+
+
+def test_frame_layouts_hold_the_same_rows():
+    df = pd.DataFrame(
+        [["Desk", 120.0, "Oak", 2], ["Chair", None, "Pine", 3]],
+        columns=["Product Name", "Price", "Wood", "Name"],
+    )
+    records = frame_to_table(df)
+    columnar = frame_to_table(df, "columnar")
+    assert columnar["columns"] == ["title", "price", "wood"]
+    assert columnar["rows"] == 2
+    assert _decoded(_columnar_rows(columnar)) == _decoded(records)
+    assert _decoded(_arrow_rows(frame_to_table(df, "arrow"))) == _decoded(records)
+
+
+def test_records_with_missing_and_mixed_values():
+    records = [{"a": 1, "b": "x"}, {"b": 2, "c": None}]
+    columnar = records_to_table(records, "columnar")
+    assert columnar["columns"] == ["a", "b", "c"]
+    assert columnar["data"] == [[1, None], ["x", 2], [None, None]]
+    # Mixed columns come back as text in Arrow
+    assert _arrow_rows(records_to_table(records, "arrow")) == [
+        {"a": 1, "b": "x", "c": None},
+        {"a": None, "b": "2", "c": None},
+    ]
+
+
+def test_extraction_formats_match_records():
+    for html in fixtures + [_random_page(seed) for seed in range(5)]:
+        records = _decoded(_structured(html))
+        columnar = _decoded(_structured(html, table_format="columnar"))
+        arrow = _structured(html, table_format="arrow")
+        assert list(columnar) == list(arrow) == list(records)
+        for key in ("tables",) + ROW_SECTIONS:
+            if key not in records:
+                continue
+            if key == "tables":
+                tables = zip(records[key], columnar[key], arrow[key])
+            else:
+                tables = [(records[key], columnar[key], arrow[key])]
+            for rows, table, encoded in tables:
+                # Rows lacking a column get None for it
+                padded = [{name: row.get(name) for name in table["columns"]} for row in rows]
+                assert _columnar_rows(table) == padded
+                assert len(_arrow_rows(encoded)) == len(rows)
+
+
+def test_negotiate_table_format():
+    assert negotiate_table_format(None) == "records"
+    assert negotiate_table_format("application/json") == "records"
+    assert (
+        negotiate_table_format("application/vnd.sift.arrow+json;q=0.9, */*")
+        == "arrow"
+    )
+    assert negotiate_table_format("application/vnd.sift.columnar+json") == "columnar"
+    assert (
+        negotiate_table_format("application/vnd.sift.columnar+json;q=0, */*")
+        == "records"
+    )
+    # Responses are JSON, so a bare Arrow stream cannot be sent
+    assert negotiate_table_format("application/vnd.apache.arrow.stream") == "records"
+    assert not accepts("application/vnd.apache.arrow.stream", JSON_MEDIA_TYPES)
+    assert not accepts("application/json;q=0, text/html", JSON_MEDIA_TYPES)
+    assert accepts("application/vnd.apache.arrow.stream, */*;q=0.1", JSON_MEDIA_TYPES)
+    assert accepts(None, JSON_MEDIA_TYPES) and accepts("", JSON_MEDIA_TYPES)
+
+
+if __name__ == "__main__":
+    test_frame_layouts_hold_the_same_rows()
+    test_records_with_missing_and_mixed_values()
+    test_extraction_formats_match_records()
+    test_negotiate_table_format()
+    print("table formats hold the same rows as records")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the native HTML table parser.
+Layouts must match what pd.read_html produced before, with multi-row
+headers flattened, and both parser backends must give the same frames.
+"""
+
+from io import StringIO
+
+import pandas as pd
+
+from core.document import ParsedDocument
+from core.table_extractor import clean_dataframe, extract_tables
+
+simple_html = """
+<table>
+  <thead><tr><th>Model</th><th>Price</th><th>Stock</th></tr></thead>
+  <tbody>
+    <tr><td>A1</td><td>1,234</td><td>3</td></tr>
+    <tr><td>B2 <b>Pro</b></td><td>20.5</td><td>N/A</td></tr>
+  </tbody>
+  <tfoot><tr><td>Total</td><td>1,254.5</td><td>3</td></tr></tfoot>
+</table>
+"""
+
+spans_html = """
+<table>
+  <tr><th>Year</th><th>Team</th><th>Result</th></tr>
+  <tr><td rowspan="2">2020</td><td colspan="2">Cancelled</td></tr>
+  <tr><td>Lions</td><td>Won</td></tr>
+  <tr><td>2021</td><td>Bears</td></tr>
+</table>
+"""
+
+multi_header_html = """
+<table>
+  <thead>
+    <tr><th rowspan="2">Name</th><th colspan="2">Score</th><th></th></tr>
+    <tr><th>Min</th><th>Max</th><th></th></tr>
+  </thead>
+  <tbody>
+    <tr><td>a</td><td>1</td><td>3</td><td>x</td></tr>
+    <tr><td>b</td><td></td><td>4</td><td>y</td></tr>
+  </tbody>
+</table>
+"""
+
+nested_html = """
+<table>
+  <tr><td>outer<table><tr><td>inner</td><td>cell</td></tr></table></td><td>2</td></tr>
+  <tr style="display: none"><td>hidden</td><td>9</td></tr>
+</table>
+"""
+
+breaks_html = """
+<table>
+  <tr><th>Home<br>team</th><th>Score</th></tr>
+  <tr><td>line1<br>line2</td><td>1<br/><i>-</i>0</td></tr>
+</table>
+"""
+
+
+def _parse(html: str, backend: str) -> pd.DataFrame:
+    return extract_tables(ParsedDocument(html, backend=backend))[0]
+
+
+def test_matches_read_html():
+    for html in (simple_html, spans_html, breaks_html):
+        expected = clean_dataframe(pd.read_html(StringIO(html))[0])
+        for backend in ("bs4", "lxml"):
+            df = _parse(html, backend)
+            assert list(df.columns) == list(expected.columns)
+            assert df.equals(expected)
+
+
+def test_spans_and_missing_values():
+    df = _parse(spans_html, "bs4")
+    assert df.to_dict(orient="records") == [
+        {"Year": 2020, "Team": "Cancelled", "Result": "Cancelled"},
+        {"Year": 2020, "Team": "Lions", "Result": "Won"},
+        {"Year": 2021, "Team": "Bears", "Result": None},
+    ]
+
+    df = _parse(simple_html, "lxml")
+    assert df["Price"].tolist() == [1234.0, 20.5, 1254.5]
+    assert df["Model"].tolist() == ["A1", "B2 Pro", "Total"]
+    assert df["Stock"].isna().tolist() == [False, True, False]
+
+
+def test_multi_row_headers_are_flattened():
+    for backend in ("bs4", "lxml"):
+        df = _parse(multi_header_html, backend)
+        assert list(df.columns) == ["Name", "Score Min", "Score Max", "Unnamed: 3"]
+        assert df["Score Max"].tolist() == [3, 4]
+
+
+def test_nested_and_hidden_rows():
+    for backend in ("bs4", "lxml"):
+        outer, inner = extract_tables(ParsedDocument(nested_html, backend=backend))
+        assert list(outer.columns) == ["0", "1"]
+        assert outer.to_dict(orient="records") == [{"0": "outerinnercell", "1": 2}]
+        assert inner.to_dict(orient="records") == [{"0": "inner", "1": "cell"}]
+
+
+def test_line_breaks_separate_words():
+    for backend in ("bs4", "lxml"):
+        df = _parse(breaks_html, backend)
+        assert list(df.columns) == ["Home team", "Score"]
+        assert df.to_dict(orient="records") == [
+            {"Home team": "line1 line2", "Score": "1 -0"}
+        ]
+
+
+if __name__ == "__main__":
+    test_matches_read_html()
+    test_spans_and_missing_values()
+    test_multi_row_headers_are_flattened()
+    test_nested_and_hidden_rows()
+    test_line_breaks_separate_words()
+    print("table parser matches pd.read_html layouts")